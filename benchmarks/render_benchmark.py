@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+
+import itertools
+import json
+import math
+import os
+import random as rd
+import shutil
+import subprocess as sp
+import sys
+import tempfile
+import wave
+from datetime import datetime
+from typing import Annotated, Optional
+
+import numpy as np
+import PIL.Image as Image
+import PIL.ImageDraw as ImageDraw
+import typer
+from rich.console import Console
+from rich.table import Table
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.cli_helpers import AliasGroup
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+ASSETS_DIR = os.path.join(ROOT_DIR, "build", "benchmark", "assets")
+SAMPLE_RATE = 44100
+
+app: typer.Typer = typer.Typer(
+    name="render-benchmark",
+    help="[purple]Benchmark[/purple] the [bold cyan]MoviepyAPI[/bold cyan] renderer with synthetic assets. :stopwatch:",
+    rich_markup_mode="rich",
+    cls=AliasGroup,
+    context_settings={
+        "help_option_names": ["-h", "--help", "-?"],
+    },
+)
+
+
+def generate_picture(
+    path: str, size: tuple[int, int], kind: str, rng: np.random.Generator
+) -> str:
+    width, height = size
+    if kind == "noise":
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    else:
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[:] = rng.integers(0, 256, 3, dtype=np.uint8)
+    Image.fromarray(pixels).save(path, "jpeg", quality=90)
+    return path
+
+
+def generate_audio(
+    path: str, duration: float, kind: str, rng: np.random.Generator
+) -> str:
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    if kind == "speech":
+        # Voiced harmonics with a ~4Hz syllable envelope roughly mimic a voiceover
+        pitch = rng.uniform(100, 220)
+        signal = sum(
+            np.sin(2 * math.pi * pitch * harmonic * t) / harmonic
+            for harmonic in range(1, 6)
+        )
+        envelope = np.clip(np.sin(2 * math.pi * rng.uniform(3, 5) * t), 0, 1) ** 0.5
+        signal = signal * envelope + rng.normal(0, 0.02, t.shape)
+    else:
+        signal = np.sin(2 * math.pi * rng.uniform(220, 880) * t)
+    signal = (signal / max(np.abs(signal).max(), 1e-9) * 0.5 * 32767).astype(np.int16)
+
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(signal.tobytes())
+    return path
+
+
+def generate_overlay(path: str, size: tuple[int, int]) -> str:
+    overlay = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.rounded_rectangle(
+        (0, 0, size[0] - 1, size[1] - 1), radius=size[1] // 4, fill=(220, 20, 60, 200)
+    )
+    overlay.save(path, "png")
+    return path
+
+
+def generate_assets(
+    resolution_name: str,
+    segments: int,
+    segment_length: float,
+    upscale: float,
+    seed: int,
+) -> dict[str, str | list[str]]:
+    from src.fooocus_api import Resolution
+
+    resolution = Resolution[resolution_name].value[0]
+    size = (int(resolution[0] * upscale), int(resolution[1] * upscale))
+    assets_dir = os.path.join(
+        ASSETS_DIR, f"{resolution_name}_{upscale}_{segments}_{segment_length}_{seed}"
+    )
+    os.makedirs(assets_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    pictures, audios = [], []
+    for index in range(segments):
+        kind = "noise" if index % 2 else "solid"
+        pictures.append(
+            generate_picture(os.path.join(assets_dir, f"{index}.jpeg"), size, kind, rng)
+        )
+        audios.append(
+            generate_audio(
+                os.path.join(assets_dir, f"{index}.wav"),
+                segment_length,
+                "speech" if index % 2 == 0 else "tone",
+                rng,
+            )
+        )
+
+    return {
+        "pictures": pictures,
+        "audios": audios,
+        "overlay": generate_overlay(
+            os.path.join(assets_dir, "overlay.png"), (size[0] // 2, size[1] // 8)
+        ),
+    }
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+@app.command(
+    name="run-one",
+    help="[purple]Render[/purple] a single benchmark case (used internally by [italic]run[/italic]). :clapper:",
+    hidden=True,
+)
+def run_one(
+    case: Annotated[
+        str,
+        typer.Argument(
+            ...,
+            help="Specify the [purple]benchmark case[/purple] as JSON. :scroll:",
+            show_default=False,
+        ),
+    ],
+):
+    case_config = json.loads(case)
+    rd.seed(case_config["seed"])
+    np.random.seed(case_config["seed"])
+
+    from config.config import SessionID, SettingsManager
+    from src.moviepy_api import MoviepyAPI, Overlay, SubtitleOptions
+
+    settings_manager = SettingsManager(session_id=SessionID.TEMP)
+    moviepy_api = MoviepyAPI(verbose=False)
+    assets = generate_assets(
+        case_config["resolution"],
+        case_config["segments"],
+        case_config["segment_length"],
+        case_config["upscale"],
+        case_config["seed"],
+    )
+
+    # The video goes to its own directory instead of output/, and the temporary
+    # session it was indexed as is cleaned up afterwards
+    render_dir = tempfile.mkdtemp(prefix="render-", dir=os.path.dirname(ASSETS_DIR))
+    try:
+        stats = moviepy_api.generate_video(
+            audio_paths=assets["audios"],  # type: ignore
+            picture_paths=assets["pictures"],  # type: ignore
+            overlays=[
+                Overlay(
+                    assets["overlay"],  # type: ignore
+                    start_sec=min(2, case_config["segment_length"]),
+                    rel_position=("center", "top"),
+                    is_transparent=True,
+                )
+            ],
+            metadata={
+                "artist": "QuickClipAI Benchmark",
+                "title": f"benchmark-{os.getpid()}",
+                "description": "Synthetic render benchmark",
+                "comment": ["benchmark"],
+                "genre": "28",
+            },
+            max_length=math.ceil(
+                case_config["segments"] * case_config["segment_length"]
+            )
+            + 1,
+            fps=case_config["fps"],
+            num_threads=case_config["num_threads"],
+            subtitle_options=(
+                SubtitleOptions(
+                    font_path=os.path.join(
+                        settings_manager.assets_dir,
+                        "project",
+                        "fonts",
+                        "TheBoldFont.ttf",
+                    ),
+                    font_size=90,
+                    stroke_width=10,
+                    rel_height_pos=0.3,
+                )
+                if case_config["captions"]
+                else None
+            ),
+            output_dir=render_dir,
+        ).to_dict()
+    finally:
+        shutil.rmtree(render_dir, ignore_errors=True)
+        shutil.rmtree(moviepy_api.build_dir, ignore_errors=True)
+        settings_manager.session_index.remove(settings_manager.session_id)
+        # Brings back the index row of a real temporary video, if there is one
+        settings_manager.session_index.rebuild()
+
+    frames = sum(
+        stage["frames"] for stage in stats["stages"] if "encode" in stage["name"]
+    )
+    typer.echo(
+        json.dumps(
+            {
+                "case": case_config,
+                "wall_time": stats["wall_time"],
+                "cpu_time": stats["cpu_time"],
+                "fps": (
+                    round(frames / stats["wall_time"], 2) if stats["wall_time"] else 0
+                ),
+                "peak_rss_mb": peak_rss_mb(),
+                "stages": stats["stages"],
+                "host": stats["host"],
+            }
+        )
+    )
+
+
+def parse_list(value: str, cast) -> list:
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+@app.command(
+    name="run",
+    help="[purple]Run[/purple] the benchmark matrix and store the results. :stopwatch:",
+)
+def run(
+    num_threads: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--num-threads",
+            "-nt",
+            help="Specify the [purple]thread counts[/purple] to benchmark (comma separated). :thread:",
+        ),
+    ] = "2,4",
+    fps: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--fps",
+            help="Specify the [purple]frame rates[/purple] to benchmark (comma separated). :film_frames:",
+        ),
+    ] = "30",
+    resolutions: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--resolutions",
+            "-r",
+            help="Specify the Fooocus [purple]resolutions[/purple] of the synthetic pictures (comma separated). :frame_photo:",
+        ),
+    ] = "RES_768x1344",
+    segments: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--segments",
+            "-s",
+            help="Specify the [purple]segment counts[/purple] to benchmark (comma separated). :1234:",
+        ),
+    ] = "3,6",
+    captions: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--captions",
+            "-c",
+            help="Specify the [purple]caption modes[/purple] to benchmark ('off', 'on' or 'off,on'). :speech_balloon:",
+        ),
+    ] = "off",
+    segment_length: Annotated[
+        float,
+        typer.Option(
+            ...,
+            "--segment-length",
+            "-sl",
+            help="Specify the [purple]audio length[/purple] of each segment in seconds. :stopwatch:",
+        ),
+    ] = 5,
+    upscale: Annotated[
+        float,
+        typer.Option(
+            ...,
+            "--upscale",
+            "-u",
+            help="Specify the [purple]upscale factor[/purple] applied to the synthetic pictures. :mag:",
+        ),
+    ] = 1.5,
+    seed: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--seed",
+            help="Specify the [purple]seed[/purple] for the synthetic assets and the picture motion. :seedling:",
+        ),
+    ] = 0,
+    repeat: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--repeat",
+            help="Specify how many times each case is [purple]repeated[/purple]. :repeat:",
+        ),
+    ] = 1,
+    label: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--label",
+            "-l",
+            help="Specify a [purple]label[/purple] for the result file (e.g. a version or host name). :label:",
+            show_default=False,
+        ),
+    ] = None,
+):
+    matrix = itertools.product(
+        parse_list(resolutions, str),
+        parse_list(segments, int),
+        parse_list(fps, int),
+        parse_list(num_threads, int),
+        parse_list(captions, lambda mode: mode.lower() in ("on", "true", "1")),
+    )
+    results = []
+    for resolution, segment_count, frame_rate, threads, with_captions in matrix:
+        case = {
+            "resolution": resolution,
+            "segments": segment_count,
+            "segment_length": segment_length,
+            "upscale": upscale,
+            "fps": frame_rate,
+            "num_threads": threads,
+            "captions": with_captions,
+            "seed": seed,
+        }
+        for _ in range(repeat):
+            typer.echo(f"Running {json.dumps(case)}...")
+            process = sp.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "run-one",
+                    json.dumps(case),
+                ],
+                cwd=ROOT_DIR,
+                stdout=sp.PIPE,
+                text=True,
+            )
+            if process.returncode != 0:
+                typer.echo(f"Case failed with exit code {process.returncode}.")
+                continue
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            typer.echo(
+                f"{result['fps']} fps | {result['wall_time']}s | {result['peak_rss_mb']} MB"
+            )
+            results.append(result)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_file = os.path.join(
+        RESULTS_DIR,
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}{f'-{label}' if label else ''}.json",
+    )
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({"label": label, "results": results}, f, indent=4)
+    typer.echo(f"Results saved as: {result_file}")
+
+
+def case_key(case: dict) -> str:
+    return (
+        f"{case['resolution']} | {case['segments']} seg | {case['fps']} fps | "
+        f"{case['num_threads']} thr | captions {'on' if case['captions'] else 'off'}"
+    )
+
+
+def load_results(path: str) -> dict[str, list[dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        results = json.load(f)["results"]
+
+    grouped: dict[str, list[dict]] = {}
+    for result in results:
+        grouped.setdefault(case_key(result["case"]), []).append(result)
+    return grouped
+
+
+@app.command(
+    name="compare, diff",
+    help="[purple]Compare[/purple] two stored benchmark runs. :bar_chart:",
+)
+def compare(
+    baseline: Annotated[
+        str,
+        typer.Argument(
+            ...,
+            help="Specify the [purple]baseline[/purple] result file. :page_facing_up:",
+            show_default=False,
+        ),
+    ],
+    candidate: Annotated[
+        str,
+        typer.Argument(
+            ...,
+            help="Specify the [purple]candidate[/purple] result file. :page_facing_up:",
+            show_default=False,
+        ),
+    ],
+):
+    def mean(results: list[dict], key: str) -> float | None:
+        values = [result[key] for result in results if result[key] is not None]
+        return sum(values) / len(values) if values else None
+
+    def delta(old: float | None, new: float | None) -> str:
+        if old is None or new is None:
+            return "-"
+        change = (new - old) / old * 100 if old else 0
+        return f"{old:.2f} → {new:.2f} ({change:+.1f}%)"
+
+    baseline_results = load_results(baseline)
+    candidate_results = load_results(candidate)
+
+    table = Table(title="Render Benchmark")
+    table.add_column("Case", style="cyan")
+    table.add_column("FPS", style="green")
+    table.add_column("Wall Time (in s)", style="magenta")
+    table.add_column("Peak RSS (in MB)", style="yellow")
+    for key in sorted(set(baseline_results) & set(candidate_results)):
+        old, new = baseline_results[key], candidate_results[key]
+        table.add_row(
+            key,
+            delta(mean(old, "fps"), mean(new, "fps")),
+            delta(mean(old, "wall_time"), mean(new, "wall_time")),
+            delta(mean(old, "peak_rss_mb"), mean(new, "peak_rss_mb")),
+        )
+    Console().print(table)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+
+import json
+import os
+import shlex
+import statistics
+import subprocess as sp
+import sys
+import time
+from datetime import datetime
+from typing import Annotated, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from src.cli_helpers import AliasGroup
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+DEFAULT_COMMANDS = (
+    "--help",
+    "settings show",
+    "settings get last_session_id",
+    "topics list",
+    "hashtags science,space",
+)
+HEAVY_MODULES = (
+    "captametropolis",
+    "elevenlabs",
+    "g4f",
+    "googleapiclient",
+    "gradio_client",
+    "moviepy",
+    "numpy",
+    "PIL",
+    "selenium",
+)
+
+app: typer.Typer = typer.Typer(
+    name="startup-benchmark",
+    help="[purple]Benchmark[/purple] the [bold cyan]CLI startup[/bold cyan] time and import cost per command. :stopwatch:",
+    rich_markup_mode="rich",
+    cls=AliasGroup,
+    context_settings={
+        "help_option_names": ["-h", "--help", "-?"],
+    },
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    # "import time: self [us] | cumulative | imported package"
+    modules: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def run_command(command: str) -> dict:
+    started = time.perf_counter()
+    process = sp.run(
+        [sys.executable, "-X", "importtime", os.path.join(ROOT_DIR, "main.py")]
+        + shlex.split(command),
+        cwd=ROOT_DIR,
+        # Measure the command itself, not a running daemon
+        env={**os.environ, "QUICKCLIP_NO_DAEMON": "1"},
+        stdout=sp.DEVNULL,
+        stderr=sp.PIPE,
+        text=True,
+    )
+    wall_time = time.perf_counter() - started
+    modules = parse_importtime(process.stderr)
+    return {
+        "exit_code": process.returncode,
+        "wall_time": wall_time,
+        "import_time": sum(modules.values()) / 1e6,
+        "modules": modules,
+    }
+
+
+@app.command(
+    name="run",
+    help="[purple]Run[/purple] the startup benchmark and store the results. :stopwatch:",
+)
+def run(
+    commands: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            ...,
+            "--command",
+            "-c",
+            help="Specify the [purple]commands[/purple] to benchmark (can be passed multiple times). :keyboard:",
+            show_default=False,
+        ),
+    ] = None,
+    repeat: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--repeat",
+            "-r",
+            help="Specify how many times each command is [purple]repeated[/purple]. :repeat:",
+            min=1,
+        ),
+    ] = 5,
+    top: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--top",
+            "-t",
+            help="Specify how many of the [purple]most expensive imports[/purple] are stored per command. :bar_chart:",
+            min=0,
+        ),
+    ] = 10,
+    strict: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--strict",
+            "-s",
+            help="Specify whether or not to fail if a command imports a [purple]heavy module[/purple]. :no_entry:",
+            show_default=False,
+        ),
+    ] = False,
+    label: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--label",
+            "-l",
+            help="Specify a [purple]label[/purple] for the result file (e.g. a version or host name). :label:",
+            show_default=False,
+        ),
+    ] = None,
+):
+    results = []
+    for command in commands or DEFAULT_COMMANDS:
+        typer.echo(f"Running 'main.py {command}'...")
+        runs = [run_command(command) for _ in range(repeat)]
+        if runs[-1]["exit_code"] != 0:
+            # e.g. "topics list" without any topics still measures the startup
+            typer.echo(f"Command exited with code {runs[-1]['exit_code']}.")
+
+        modules = runs[-1]["modules"]
+        results.append(
+            {
+                "command": command,
+                "exit_code": runs[-1]["exit_code"],
+                "wall_time": statistics.median(run["wall_time"] for run in runs),
+                "import_time": statistics.median(run["import_time"] for run in runs),
+                "heavy_modules": [
+                    module
+                    for module in HEAVY_MODULES
+                    if any(name.split(".")[0] == module for name in modules)
+                ],
+                "top_imports": dict(
+                    sorted(modules.items(), key=lambda item: item[1], reverse=True)[
+                        :top
+                    ]
+                ),
+            }
+        )
+
+    table = Table(title="Startup Benchmark")
+    table.add_column("Command", style="cyan")
+    table.add_column("Wall Time (in s)", style="green")
+    table.add_column("Import Time (in s)", style="magenta")
+    table.add_column("Heavy Modules", style="yellow")
+    for result in results:
+        table.add_row(
+            result["command"],
+            f"{result['wall_time']:.3f}",
+            f"{result['import_time']:.3f}",
+            ", ".join(result["heavy_modules"]) or "-",
+        )
+    Console().print(table)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_file = os.path.join(
+        RESULTS_DIR,
+        f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}{f'-{label}' if label else ''}.json",
+    )
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump({"label": label, "results": results}, f, indent=4)
+    typer.echo(f"Results saved as: {result_file}")
+
+    if strict and any(result["heavy_modules"] for result in results):
+        typer.echo("Some commands import heavy modules.")
+        raise typer.Exit(code=1)
+
+
+def load_results(path: str) -> dict[str, dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return {result["command"]: result for result in json.load(f)["results"]}
+
+
+@app.command(
+    name="compare, diff",
+    help="[purple]Compare[/purple] two stored startup benchmark runs. :bar_chart:",
+)
+def compare(
+    baseline: Annotated[
+        str,
+        typer.Argument(
+            ...,
+            help="Specify the [purple]baseline[/purple] result file. :page_facing_up:",
+            show_default=False,
+        ),
+    ],
+    candidate: Annotated[
+        str,
+        typer.Argument(
+            ...,
+            help="Specify the [purple]candidate[/purple] result file. :page_facing_up:",
+            show_default=False,
+        ),
+    ],
+    max_regression: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            "--max-regression",
+            "-m",
+            help="Specify the maximum allowed [purple]wall time regression[/purple] in percent. :warning:",
+            show_default=False,
+        ),
+    ] = None,
+):
+    def delta(old: float, new: float) -> str:
+        change = (new - old) / old * 100 if old else 0
+        return f"{old:.3f} → {new:.3f} ({change:+.1f}%)"
+
+    baseline_results = load_results(baseline)
+    candidate_results = load_results(candidate)
+
+    regressions = []
+    table = Table(title="Startup Benchmark")
+    table.add_column("Command", style="cyan")
+    table.add_column("Wall Time (in s)", style="green")
+    table.add_column("Import Time (in s)", style="magenta")
+    table.add_column("New Heavy Modules", style="yellow")
+    for command in sorted(set(baseline_results) & set(candidate_results)):
+        old, new = baseline_results[command], candidate_results[command]
+        new_modules = sorted(set(new["heavy_modules"]) - set(old["heavy_modules"]))
+        table.add_row(
+            command,
+            delta(old["wall_time"], new["wall_time"]),
+            delta(old["import_time"], new["import_time"]),
+            ", ".join(new_modules) or "-",
+        )
+        if new_modules or (
+            max_regression is not None
+            and new["wall_time"] > old["wall_time"] * (1 + max_regression / 100)
+        ):
+            regressions.append(command)
+    Console().print(table)
+
+    if regressions:
+        typer.echo(f"Startup regressions: {', '.join(regressions)}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
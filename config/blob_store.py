@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class BlobStore:
+    FICLONE = 0x40049409
+
+    def __init__(self, store_dir: str) -> None:
+        self.__store_dir__ = store_dir
+        self.__objects_dir__ = os.path.join(store_dir, "objects")
+
+    @property
+    def store_dir(self) -> str:
+        return self.__store_dir__
+
+    @staticmethod
+    def digest_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.__objects_dir__, digest[:2], digest[2:])
+
+    def add(self, path: str, move: bool = False) -> str:
+        blob_path = self.blob_path(self.digest_file(path))
+        if os.path.exists(blob_path):
+            if move:
+                os.remove(path)
+            return blob_path
+
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path))
+        os.close(fd)
+        try:
+            if move:
+                os.replace(path, temp_path)
+            else:
+                shutil.copyfile(path, temp_path)
+            os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return blob_path
+
+    def __reflink__(self, source: str, destination: str) -> bool:
+        if fcntl is None:
+            return False
+
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), self.FICLONE, src.fileno())
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+            return False
+        return True
+
+    def link(self, blob_path: str, destination: str) -> str:
+        if os.path.exists(destination) and os.path.samefile(blob_path, destination):
+            # Renaming a hard link over the same file would leave the link behind
+            return destination
+
+        directory = os.path.dirname(os.path.abspath(destination))
+        os.makedirs(directory, exist_ok=True)
+        # Rename into place, so readers never see a partial file and an
+        # existing link is never written through (it would change the shared blob)
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(destination)}.", suffix=".tmp"
+        )
+        os.close(fd)
+        try:
+            try:
+                # A hard link needs a free name, the placeholder only reserved it
+                os.remove(temp_path)
+                os.link(blob_path, temp_path)
+            except OSError:
+                # Different filesystem or no hard link support
+                if not self.__reflink__(blob_path, temp_path):
+                    shutil.copyfile(blob_path, temp_path)
+            os.replace(temp_path, destination)
+        except BaseException:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+        return destination
+
+    def put(self, path: str, destination: str, move: bool = False) -> str:
+        blob_path = self.add(path, move=move)
+        try:
+            return self.link(blob_path, destination)
+        except FileNotFoundError:
+            if move or not os.path.exists(path):
+                raise
+            # The blob was collected between adding and linking it
+            return self.link(self.add(path), destination)
+
+    def put_bytes(self, data: bytes, destination: str) -> str:
+        os.makedirs(self.__objects_dir__, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.__objects_dir__)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.put(temp_path, destination, move=True)
+
+    def refcount(self, blob_path: str) -> int:
+        return os.stat(blob_path).st_nlink - 1
+
+    def collect(self, dry_run: bool = False) -> tuple[int, int]:
+        if not os.path.isdir(self.__objects_dir__):
+            return 0, 0
+
+        count, size = 0, 0
+        for root, _, files in os.walk(self.__objects_dir__):
+            for file in files:
+                if len(file) != 62:
+                    # Temporary files of blobs that are still being added
+                    continue
+
+                path = os.path.join(root, file)
+                try:
+                    blob_stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                # Only the store itself still links to the blob
+                if blob_stat.st_nlink > 1:
+                    continue
+
+                if not dry_run:
+                    os.remove(path)
+                count += 1
+                size += blob_stat.st_size
+        return count, size
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import time
+import zipfile
+from typing import Iterable
+
+
+class BuildArchive:
+    MANIFEST = "manifest.json"
+    STORED_EXTENSIONS = (
+        ".mp3",
+        ".wav",
+        ".m4a",
+        ".jpeg",
+        ".jpg",
+        ".png",
+        ".webp",
+        ".mp4",
+        ".mov",
+    )
+    EXCLUDED = ("video/", ".session.lock")
+
+    def __init__(self, archive_dir: str) -> None:
+        self.__archive_dir__ = archive_dir
+
+    @property
+    def archive_dir(self) -> str:
+        return self.__archive_dir__
+
+    def archive_path(self, session_id: str) -> str:
+        return os.path.join(self.__archive_dir__, f"{session_id}.zip")
+
+    def is_archived(self, session_id: str) -> bool:
+        return os.path.isfile(self.archive_path(session_id))
+
+    def sessions(self) -> list[str]:
+        if not os.path.isdir(self.__archive_dir__):
+            return []
+
+        return [
+            file[:-4]
+            for file in os.listdir(self.__archive_dir__)
+            if file.endswith(".zip")
+        ]
+
+    def __compress_type__(self, name: str) -> int:
+        # Audio and pictures are already compressed, deflating them only costs time
+        return (
+            zipfile.ZIP_STORED
+            if name.lower().endswith(self.STORED_EXTENSIONS)
+            else zipfile.ZIP_DEFLATED
+        )
+
+    def manifest(self, session_id: str) -> dict:
+        with zipfile.ZipFile(self.archive_path(session_id), "r") as archive:
+            return json.loads(archive.read(self.MANIFEST))
+
+    def pack(self, session_id: str, build_dir: str, remove: bool = True) -> str:
+        os.makedirs(self.__archive_dir__, exist_ok=True)
+        archive_path = self.archive_path(session_id)
+        temp_path = f"{archive_path}.tmp"
+        files = []
+        with zipfile.ZipFile(
+            temp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6
+        ) as archive:
+            for root, _, names in os.walk(build_dir):
+                for name in sorted(names):
+                    path = os.path.join(root, name)
+                    arcname = os.path.relpath(path, build_dir).replace(os.sep, "/")
+                    if arcname.startswith(self.EXCLUDED):
+                        continue
+
+                    compress_type = self.__compress_type__(arcname)
+                    archive.write(path, arcname, compress_type=compress_type)
+                    files.append(
+                        {
+                            "path": arcname,
+                            "size": os.path.getsize(path),
+                            "stored": compress_type == zipfile.ZIP_STORED,
+                        }
+                    )
+
+            # Keep files of a previous archive that were not restored
+            if os.path.isfile(archive_path):
+                packed = {file["path"] for file in files}
+                with zipfile.ZipFile(archive_path, "r") as previous:
+                    for info in previous.infolist():
+                        if info.filename == self.MANIFEST or info.filename in packed:
+                            continue
+                        archive.writestr(
+                            info,
+                            previous.read(info),
+                            compress_type=info.compress_type,
+                        )
+                        files.append(
+                            {
+                                "path": info.filename,
+                                "size": info.file_size,
+                                "stored": info.compress_type == zipfile.ZIP_STORED,
+                            }
+                        )
+
+            archive.writestr(
+                self.MANIFEST,
+                json.dumps(
+                    {
+                        "session_id": session_id,
+                        "archived_at": time.time(),
+                        "files": files,
+                    },
+                    indent=4,
+                ),
+            )
+        os.replace(temp_path, archive_path)
+
+        if remove:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return archive_path
+
+    def restore(
+        self,
+        session_id: str,
+        build_dir: str,
+        prefixes: Iterable[str] | None = None,
+    ) -> int:
+        if not self.is_archived(session_id):
+            return 0
+
+        prefixes = tuple(prefixes) if prefixes is not None else None
+        restored = 0
+        with zipfile.ZipFile(self.archive_path(session_id), "r") as archive:
+            manifest = json.loads(archive.read(self.MANIFEST))
+            for file in manifest["files"]:
+                if prefixes is not None and not file["path"].startswith(prefixes):
+                    continue
+
+                target = os.path.join(build_dir, *file["path"].split("/"))
+                if os.path.exists(target):
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.open(file["path"]) as source, open(
+                    f"{target}.tmp", "wb"
+                ) as destination:
+                    shutil.copyfileobj(source, destination)
+                os.replace(f"{target}.tmp", target)
+                restored += 1
+        return restored
+
+    def remove(self, session_id: str) -> None:
+        if self.is_archived(session_id):
+            os.remove(self.archive_path(session_id))
@@ -0,0 +1,217 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable
+
+from filelock import FileLock, Timeout
+
+
+class BuildCollector:
+    LOCK_FILE = ".session.lock"
+
+    def __init__(self, database_file: str, build_root: str) -> None:
+        self.__database_file__ = database_file
+        self.__build_root__ = build_root
+        self.__leases__: dict[str, tuple[FileLock, int]] = {}
+        self.__lock__ = threading.Lock()
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS build_access (
+                    session_id TEXT PRIMARY KEY,
+                    last_access REAL NOT NULL,
+                    uploaded_at REAL
+                )
+                """)
+
+    @property
+    def build_root(self) -> str:
+        return self.__build_root__
+
+    def __connect__(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__database_file__, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def __lock_path__(self, session_id: str) -> str:
+        return os.path.join(self.__build_root__, session_id, self.LOCK_FILE)
+
+    def touch(self, session_id: str, when: float | None = None) -> None:
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                """
+                INSERT INTO build_access (session_id, last_access) VALUES (?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access
+                """,
+                (session_id, when or time.time()),
+            )
+
+    def mark_uploaded(self, session_id: str) -> None:
+        now = time.time()
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                """
+                INSERT INTO build_access (session_id, last_access, uploaded_at) VALUES (?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET uploaded_at = excluded.uploaded_at
+                """,
+                (session_id, now, now),
+            )
+
+    def is_uploaded(self, session_id: str) -> bool:
+        with closing(self.__connect__()) as connection:
+            row = connection.execute(
+                "SELECT uploaded_at FROM build_access WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return bool(row and row["uploaded_at"])
+
+    def forget(self, session_id: str) -> None:
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "DELETE FROM build_access WHERE session_id = ?", (session_id,)
+            )
+
+    def acquire(self, session_id: str) -> None:
+        with self.__lock__:
+            lease = self.__leases__.get(session_id)
+            if lease is not None:
+                self.__leases__[session_id] = (lease[0], lease[1] + 1)
+                return
+
+            os.makedirs(os.path.dirname(self.__lock_path__(session_id)), exist_ok=True)
+            lock = FileLock(self.__lock_path__(session_id), thread_local=False)
+            try:
+                lock.acquire(timeout=0)
+            except Timeout:
+                # Already held by another process, which keeps it open for us
+                pass
+            self.__leases__[session_id] = (lock, 1)
+
+    def release(self, session_id: str) -> None:
+        with self.__lock__:
+            lease = self.__leases__.get(session_id)
+            if lease is None:
+                return
+
+            if lease[1] > 1:
+                self.__leases__[session_id] = (lease[0], lease[1] - 1)
+                return
+
+            del self.__leases__[session_id]
+            if lease[0].is_locked:
+                lease[0].release()
+
+    def __try_lock__(self, session_id: str) -> FileLock | None:
+        if session_id in self.__leases__:
+            return None
+
+        lock = FileLock(self.__lock_path__(session_id), thread_local=False)
+        try:
+            lock.acquire(timeout=0)
+        except (Timeout, OSError):
+            return None
+        return lock
+
+    def is_open(self, session_id: str) -> bool:
+        lock = self.__try_lock__(session_id)
+        if lock is None:
+            return True
+
+        lock.release()
+        return False
+
+    @staticmethod
+    def directory_size(path: str) -> int:
+        size = 0
+        for root, _, files in os.walk(path):
+            for file in files:
+                try:
+                    size += os.lstat(os.path.join(root, file)).st_size
+                except FileNotFoundError:
+                    continue
+        return size
+
+    def entries(self) -> list[dict]:
+        if not os.path.isdir(self.__build_root__):
+            return []
+
+        with closing(self.__connect__()) as connection:
+            accessed = {
+                row["session_id"]: row["last_access"]
+                for row in connection.execute(
+                    "SELECT session_id, last_access FROM build_access"
+                )
+            }
+
+        entries = []
+        for entry in os.scandir(self.__build_root__):
+            if not entry.is_dir(follow_symlinks=False) or entry.name.startswith("."):
+                continue
+
+            entries.append(
+                {
+                    "session_id": entry.name,
+                    "path": entry.path,
+                    "size": self.directory_size(entry.path),
+                    "last_access": accessed.get(
+                        entry.name, entry.stat(follow_symlinks=False).st_mtime
+                    ),
+                }
+            )
+        entries.sort(key=lambda entry: entry["last_access"])
+        return entries
+
+    def collect(
+        self,
+        max_size: int | None = None,
+        max_age: float | None = None,
+        is_protected: Callable[[str], bool] | None = None,
+        evict: Callable[[dict], None] | None = None,
+        dry_run: bool = False,
+    ) -> list[dict]:
+        os.makedirs(self.__build_root__, exist_ok=True)
+        gc_lock = FileLock(
+            os.path.join(self.__build_root__, ".gc.lock"), thread_local=False
+        )
+        try:
+            gc_lock.acquire(timeout=0)
+        except Timeout:
+            return []
+
+        try:
+            entries = self.entries()
+            total_size = sum(entry["size"] for entry in entries)
+            now = time.time()
+            evicted = []
+            for entry in entries:
+                expired = max_age is not None and now - entry["last_access"] > max_age
+                over_quota = max_size is not None and total_size > max_size
+                if not expired and not over_quota:
+                    # Entries are sorted by last access, so the rest is newer
+                    break
+
+                if is_protected and is_protected(entry["session_id"]):
+                    continue
+
+                lock = self.__try_lock__(entry["session_id"])
+                if lock is None:
+                    continue
+
+                try:
+                    if not dry_run:
+                        if evict is not None:
+                            evict(entry)
+                        else:
+                            shutil.rmtree(entry["path"], ignore_errors=True)
+                        self.forget(entry["session_id"])
+                finally:
+                    lock.release()
+
+                total_size -= entry["size"]
+                evicted.append(entry)
+            return evicted
+        finally:
+            gc_lock.release()
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config.blob_store import BlobStore
+
+
+class BuildManifest:
+    FILE = "build_manifest.json"
+    JOURNAL = "build_manifest.journal"
+    __lock__ = threading.Lock()
+
+    def __init__(self, build_dir: str) -> None:
+        self.__build_dir__ = build_dir
+        self.__manifest_file__ = os.path.join(build_dir, self.FILE)
+        self.__journal_file__ = os.path.join(build_dir, self.JOURNAL)
+
+    @property
+    def build_dir(self) -> str:
+        return self.__build_dir__
+
+    @staticmethod
+    def hash_inputs(**inputs) -> str:
+        return hashlib.sha256(
+            json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def path(self, artifact: str) -> str:
+        return os.path.join(self.__build_dir__, *artifact.split("/"))
+
+    def __read__(self) -> dict:
+        try:
+            with open(self.__manifest_file__, "r", encoding="utf-8") as f:
+                artifacts = json.load(f).get("artifacts", {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            artifacts = {}
+
+        # Replay the checkpoints that were made since the last compaction
+        try:
+            with open(self.__journal_file__, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        checkpoint = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn write of a crashed process
+                        continue
+
+                    if checkpoint.get("entry") is None:
+                        artifacts.pop(checkpoint["artifact"], None)
+                    else:
+                        artifacts[checkpoint["artifact"]] = checkpoint["entry"]
+        except FileNotFoundError:
+            pass
+        return artifacts
+
+    def __append__(self, artifact: str, entry: dict | None) -> None:
+        os.makedirs(self.__build_dir__, exist_ok=True)
+        line = json.dumps({"artifact": artifact, "entry": entry}) + "\n"
+        with open(self.__journal_file__, "a+b") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                # Terminate a torn line so this checkpoint stays readable
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @property
+    def artifacts(self) -> dict[str, dict]:
+        with self.__lock__:
+            return self.__read__()
+
+    def digest(self, artifact: str, path: str | None = None) -> str | None:
+        path = path or self.path(artifact)
+        # The file may have been edited by hand, so always hash what is on disk
+        return BlobStore.digest_file(path) if os.path.isfile(path) else None
+
+    def is_fresh(
+        self,
+        artifact: str,
+        inputs: str,
+        path: str | None = None,
+        adopt: bool = True,
+    ) -> bool:
+        path = path or self.path(artifact)
+        if not os.path.isfile(path):
+            return False
+
+        with self.__lock__:
+            entry = self.__read__().get(artifact)
+            if entry is None:
+                if not adopt:
+                    return False
+                # Files are only ever renamed into place, so an unrecorded file is
+                # complete (e.g. a build from before the manifest existed)
+                self.__append__(
+                    artifact,
+                    {
+                        "inputs": inputs,
+                        "digest": BlobStore.digest_file(path),
+                        "updated_at": time.time(),
+                    },
+                )
+                return True
+        return entry["inputs"] == inputs
+
+    def record(self, artifact: str, inputs: str, path: str | None = None) -> None:
+        digest = self.digest(artifact, path)
+        with self.__lock__:
+            self.__append__(
+                artifact,
+                {"inputs": inputs, "digest": digest, "updated_at": time.time()},
+            )
+
+    def forget(self, artifact: str) -> None:
+        with self.__lock__:
+            if artifact in self.__read__():
+                self.__append__(artifact, None)
+
+    def compact(self) -> None:
+        with self.__lock__:
+            if not os.path.isfile(self.__journal_file__):
+                return
+
+            artifacts = self.__read__()
+            temp_file = os.path.join(self.__build_dir__, f".{self.FILE}.tmp")
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump({"artifacts": artifacts}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.__manifest_file__)
+            # Replaying the journal again after a crash right here is harmless
+            os.remove(self.__journal_file__)
@@ -1,14 +1,21 @@
 import atexit
+import copy
 import json
 import os
 import platform
 import shutil
+import subprocess as sp
 import sys
+import tempfile
 import threading
 import uuid
 from base64 import urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import Enum
-from typing import Iterable
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator
 
 import ffmpeg
 import typer
@@ -17,10 +24,21 @@ from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from dotenv import load_dotenv
+from filelock import FileLock
 from rich import print as rprint
 
+from config.blob_store import BlobStore
+from config.build_archive import BuildArchive
+from config.build_gc import BuildCollector
+from config.build_manifest import BuildManifest
+from config.job_queue import JobQueue
+from config.session_index import SessionIndex
+from config.topic_history import TopicHistory
 from src.errors import EncryptionKeyNotFoundError
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR_ENV = "QUICKCLIP_ROOT"
+
 
 class classproperty:
     def __init__(self, func):
@@ -74,6 +92,59 @@ def timeout(
     return outer
 
 
+_DELETED = object()
+_UNSET = object()
+_channel: ContextVar[str | None] = ContextVar("channel", default=None)
+
+
+def activate_channel(channel: str | None) -> None:
+    _channel.set(channel or None)
+
+
+_verbose: ContextVar[bool | None] = ContextVar("verbose", default=None)
+
+
+def activate_verbose(verbose: bool) -> None:
+    _verbose.set(verbose)
+
+
+def is_verbose() -> bool:
+    return bool(_verbose.get())
+
+
+class context_verbose:
+    # The APIs are singletons, so the command that is running decides how much
+    # they print, not the one that built them
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        verbose = _verbose.get()
+        if verbose is None:
+            return instance.__dict__.get("__verbose__", False)
+        return verbose
+
+    def __set__(self, instance, value: bool) -> None:
+        instance.__dict__["__verbose__"] = value
+
+
+@lru_cache(maxsize=4)
+def _derive_fernet_key(encryption_key: str) -> bytes:
+    salt = b"4EL\xefE\xad\xb9\xc4\x9b\x8d:\x86\x95Sg\x99"
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=100000,
+        backend=default_backend(),
+    )
+    return urlsafe_b64encode(kdf.derive(encryption_key.encode()))
+
+
+@lru_cache(maxsize=4)
+def _get_fernet(encryption_key: str) -> Fernet:
+    return Fernet(_derive_fernet_key(encryption_key))
+
+
 def Singleton(cls):
     __instance__ = None
 
@@ -83,6 +154,12 @@ def Singleton(cls):
             __instance__ = cls(*args, **kwargs)
         return __instance__
 
+    def reset() -> None:
+        nonlocal __instance__
+        __instance__ = None
+
+    __get_instance__.__wrapped__ = cls  # type: ignore
+    __get_instance__.reset = reset  # type: ignore
     return __get_instance__
 
 
@@ -128,80 +205,59 @@ class SessionID(Enum):
 
 
 class Session:
-    def __init__(self, session_id: _SessionID) -> None:
+    def __init__(self, session_id: _SessionID, title: str | None = None) -> None:
         self.__session_id__ = session_id
         assert self.__session_id__.value is not None
-        metadata = self.__get_metadata__(
-            self.__get_video_path__(self.__session_id__.value)
-        )
-
-        self.__video_owner__ = metadata.get("artist", "Unknown")
-        self.__video_title__ = metadata.get("title", "Unknown")
-        self.__video_description__ = metadata.get("description", "Unknown")
-        try:
-            self.__video_duration__ = float(
-                ffmpeg.probe(self.__get_video_path__(self.__session_id__.value))
-                .get("format", {})
-                .get("duration", "Unknown")
-            )
-        except:
-            self.__video_duration__ = "Unknown"
-        try:
-            self.__video_genre__ = int(metadata.get("genre", "Unknown"))
-        except:
-            self.__video_genre__ = "Unknown"
-        try:
-            self.__video_date__ = int(metadata.get("date", "Unknown"))
-        except:
-            self.__video_date__ = "Unknown"
-        self.__video_tags__ = list(
-            map(
-                lambda tag: tag.strip(),
-                metadata.get("comment", "").split(",") or [],
+        self.__title__ = title
+        self.__loaded__ = False
+        self.__lock__ = threading.Lock()
+
+    def __get_index_entry__(self, session_id: str) -> dict:
+        # The index is rebuilt once by whoever loads the sessions, not per session
+        settings_manager = SettingsManager(session_id=SessionID.NONE)
+        entry = settings_manager.session_index.lookup(session_id)
+        if entry is None:
+            raise FileNotFoundError(f"No video found for session {session_id}!")
+        return entry
+
+    def load(self) -> "Session":
+        with self.__lock__:
+            if self.__loaded__:
+                return self
+
+            entry = self.__get_index_entry__(self.__session_id__.value)  # type: ignore
+            metadata = entry["tags"]
+            if not metadata:
+                raise ValueError("Metadata not found!")
+
+            self.__video_owner__ = metadata.get("artist", "Unknown")
+            self.__video_title__ = metadata.get("title", "Unknown")
+            self.__video_description__ = metadata.get("description", "Unknown")
+            self.__video_duration__ = (
+                entry["duration"] if entry["duration"] is not None else "Unknown"
             )
-        )
-        self.__video_copyright__ = metadata.get("copyright", "Unknown")
-        self.__video_credits__ = metadata.get("album", "Unknown")
-
-    def __get_metadata__(self, video_path: str) -> dict[str, str]:
-        p = ffmpeg.probe(video_path)
-        metadata = p.get("format", {}).get("tags", {})
-
-        if not metadata:
-            raise ValueError("Metadata not found!")
-
-        return json.loads(json.dumps(metadata))
-
-    def __get_video_path__(self, session_id: str) -> str:
-        def file_filter(file) -> bool:
-            if not os.path.isfile(file) or not file.endswith(".mp4"):
-                return False
-
-            probe = ffmpeg.probe(file)
-            if not probe:
-                return False
-
-            return probe["format"]["tags"].get("episode_id") == session_id
-
-        try:
-            file = tuple(
-                filter(
-                    lambda file: file_filter(os.path.join(self.__output_dir__, file)),
-                    os.listdir(self.__output_dir__),
+            try:
+                self.__video_genre__ = int(metadata.get("genre", "Unknown"))
+            except:
+                self.__video_genre__ = "Unknown"
+            try:
+                self.__video_date__ = int(metadata.get("date", "Unknown"))
+            except:
+                self.__video_date__ = "Unknown"
+            self.__video_tags__ = list(
+                map(
+                    lambda tag: tag.strip(),
+                    metadata.get("comment", "").split(",") or [],
                 )
-            )[0]
-        except IndexError:
-            raise FileNotFoundError(f"No video found for session {session_id}!")
-        return os.path.join(
-            self.__output_dir__,
-            file,
-        )
+            )
+            self.__video_copyright__ = metadata.get("copyright", "Unknown")
+            self.__video_credits__ = metadata.get("album", "Unknown")
+            self.__loaded__ = True
+        return self
 
     @property
-    def __output_dir__(self) -> str:
-        return os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output"
-        )
+    def loaded(self) -> bool:
+        return self.__loaded__
 
     @property
     def id(self) -> SessionID:
@@ -209,61 +265,273 @@ class Session:
 
     @property
     def video_owner(self) -> str:
-        return self.__video_owner__
+        return self.load().__video_owner__
 
     @property
     def video_title(self) -> str:
-        return self.__video_title__
+        if not self.__loaded__ and self.__title__ is not None:
+            return self.__title__
+        return self.load().__video_title__
 
     @property
     def video_description(self) -> str:
-        return self.__video_description__
+        return self.load().__video_description__
 
     @property
     def video_duration(self) -> float | str:
-        return self.__video_duration__
+        return self.load().__video_duration__
 
     @property
     def video_genre(self) -> int | str:
-        return self.__video_genre__
+        return self.load().__video_genre__
 
     @property
     def video_date(self) -> int | str:
-        return self.__video_date__
+        return self.load().__video_date__
 
     @property
     def video_tags(self) -> list:
-        return self.__video_tags__
+        return self.load().__video_tags__
 
     @property
     def video_copyright(self) -> str:
-        return self.__video_copyright__
+        return self.load().__video_copyright__
 
     @property
     def video_credits(self) -> str:
-        return self.__video_credits__
+        return self.load().__video_credits__
+
+    def to_dict(self, brief: bool = False) -> dict:
+        if brief:
+            return {"session_id": self.id.value, "title": self.video_title}
+
+        return {
+            "session_id": self.id.value,
+            "owner": self.video_owner,
+            "date": self.video_date,
+            "duration": self.video_duration,
+            "title": self.video_title,
+            "description": self.video_description,
+            "tags": self.video_tags,
+            "genre": self.video_genre,
+            "copyright": self.video_copyright,
+            "credits": self.video_credits.strip(),
+        }
 
 
 @Singleton
 class SettingsManager:
-    def __init__(self, session_id: SessionID, verbose: bool = False) -> None:
+    CHANNEL_SCOPED_KEYS = (
+        "owner",
+        "voice_id",
+        "genre",
+        "assets",
+        "publisher",
+        "youtube_auth_session",
+        "elevenlabs_api_key",
+    )
+    __verbose__ = context_verbose()
+
+    def __init__(
+        self, session_id: SessionID, verbose: bool = False, root_dir: str | None = None
+    ) -> None:
         self.__verbose__ = verbose
+        # Settings, builds and outputs live next to the code unless told otherwise
+        self.__root_dir__ = os.path.abspath(
+            root_dir or os.environ.get(ROOT_DIR_ENV) or ROOT_DIR
+        )
+        os.makedirs(self.config_dir, exist_ok=True)
         self.__config_file__ = os.path.join(self.root_dir, "config", "config.json")
+        self.__file_lock__ = FileLock(self.__config_file__ + ".lock", timeout=30)
+        self.__lock__ = threading.RLock()
+        self.__batch_depth__ = 0
+        self.__pending__: dict = {}
+        self.__deferred__: dict = {}
+        self.__config_stat__ = None
+        self.__flush_timer__: threading.Timer | None = None
+        self.__write_behind_ms__ = 0
+        self.__session_index__ = SessionIndex(
+            os.path.join(self.config_dir, "sessions.db"), self.output_dir
+        )
+        self.__topic_history__ = TopicHistory(
+            os.path.join(self.config_dir, "sessions.db")
+        )
+        self.__build_collector__ = BuildCollector(
+            os.path.join(self.config_dir, "sessions.db"),
+            os.path.join(self.root_dir, "build"),
+        )
+        self.__build_archive__ = BuildArchive(
+            os.path.join(self.root_dir, "build", ".archive")
+        )
+        self.__blob_store__ = BlobStore(os.path.join(self.root_dir, "store"))
         self.reinit()
+        self.__migrate_past_topics__()
 
-        self.__session_id__ = session_id.value or uuid.uuid4().hex
-        self.__session_id__ = (
-            (self.last_session_id or self.__session_id__)
-            if self.__session_id__ == "last_session_id"
-            else self.__session_id__
+        self.__session_var__: ContextVar[str | None] = ContextVar(
+            "session_id", default=None
+        )
+        self.__last_activated__: str | None = None
+        self.__session_id__ = self.resolve_session_id(session_id)
+        self.__enter_session__(self.__session_id__)
+        self.__write_behind_ms__ = int(self.get("settings_write_behind_ms", 0) or 0)
+        atexit.register(self.flush)
+
+        self.__leases__: ContextVar[list[str] | None] = ContextVar(
+            "leases", default=None
+        )
+        self.__release_hooks__: list[Callable[[str], None]] = []
+        atexit.register(self.save_last_session_id)
+
+    def resolve_session_id(
+        self, session_id: "SessionID | _SessionID | str | None"
+    ) -> str:
+        if isinstance(session_id, (SessionID, _SessionID)):
+            session_id = session_id.value
+        if session_id == SessionID.LAST.value:
+            session_id = self.last_session_id
+        return session_id or uuid.uuid4().hex
+
+    def __enter_session__(self, session_id: str) -> None:
+        if session_id != SessionID.TEMP.value:
+            self.__last_activated__ = session_id
+        os.makedirs(self.build_dir_for_session(session_id), exist_ok=True)
+        self.build_collector.acquire(session_id)
+        self.build_collector.touch(session_id)
+
+    def activate(self, session_id: "SessionID | _SessionID | str | None") -> str:
+        resolved = self.resolve_session_id(session_id)
+        self.__session_var__.set(resolved)
+        self.__enter_session__(resolved)
+        self.__track_lease__(resolved)
+        return resolved
+
+    def lease(self, session_id: str) -> None:
+        self.build_collector.acquire(session_id)
+        self.build_collector.touch(session_id)
+        self.__track_lease__(session_id)
+
+    def __track_lease__(self, session_id: str) -> None:
+        leases = self.__leases__.get()
+        if leases is not None:
+            leases.append(session_id)
+
+    def on_release(self, hook: Callable[[str], None]) -> None:
+        # Lets services drop what they keep for a session once it is released
+        self.__release_hooks__.append(hook)
+
+    def __release__(self, session_id: str) -> None:
+        self.build_collector.release(session_id)
+        for hook in self.__release_hooks__:
+            hook(session_id)
+
+    def save_last_session_id(self) -> None:
+        if self.__last_activated__ is not None:
+            self.set("last_session_id", self.__last_activated__)
+
+    @contextmanager
+    def job(self):
+        # Commands of a long-running process release their sessions when done and
+        # start without the session, channel or verbosity of the previous command
+        leases: list[str] = []
+        token = self.__leases__.set(leases)
+        session_token = self.__session_var__.set(None)
+        channel_token = _channel.set(None)
+        verbose_token = _verbose.set(None)
+        try:
+            yield
+        finally:
+            _verbose.reset(verbose_token)
+            _channel.reset(channel_token)
+            self.__session_var__.reset(session_token)
+            self.__leases__.reset(token)
+            for session_id in leases:
+                self.__release__(session_id)
+            self.save_last_session_id()
+            self.flush()
+
+    @contextmanager
+    def session(self, session_id: "SessionID | _SessionID | str | None"):
+        resolved = self.resolve_session_id(session_id)
+        token = self.__session_var__.set(resolved)
+        try:
+            self.__enter_session__(resolved)
+            yield resolved
+        finally:
+            self.__session_var__.reset(token)
+            self.__release__(resolved)
+
+    def is_pending_upload(self, session_id: str) -> bool:
+        return bool(
+            self.session_index.get_video_path(session_id)
+        ) and not self.build_collector.is_uploaded(session_id)
+
+    def collect_garbage(
+        self,
+        max_size_gb: float | None = None,
+        max_age_days: float | None = None,
+        archive: bool | None = None,
+        dry_run: bool = False,
+    ) -> list[dict]:
+        max_size_gb = (
+            max_size_gb
+            if max_size_gb is not None
+            else self.get("gc_max_build_size_gb", None)
+        )
+        max_age_days = (
+            max_age_days
+            if max_age_days is not None
+            else self.get("gc_max_age_days", None)
+        )
+        if max_size_gb is None and max_age_days is None:
+            return []
+        if archive is None:
+            archive = self.get("gc_mode", "delete") == "archive"
+
+        self.session_index.rebuild()
+        return self.build_collector.collect(
+            max_size=(
+                int(float(max_size_gb) * 1024**3) if max_size_gb is not None else None
+            ),
+            max_age=(float(max_age_days) * 86400 if max_age_days is not None else None),
+            is_protected=self.is_pending_upload,
+            evict=(
+                (
+                    lambda entry: self.build_archive.pack(
+                        entry["session_id"], entry["path"]
+                    )
+                )
+                if archive
+                else None
+            ),
+            dry_run=dry_run,
         )
-        os.makedirs(self.build_dir, exist_ok=True)
 
-        def __save_session_id__():
-            if self.__session_id__ != "temp":
-                self.set("last_session_id", self.__session_id__)
+    def spawn_garbage_collection(self) -> bool:
+        if (
+            self.get("gc_max_build_size_gb", None) is None
+            and self.get("gc_max_age_days", None) is None
+        ):
+            return False
 
-        atexit.register(__save_session_id__)
+        kwargs = (
+            {"creationflags": sp.DETACHED_PROCESS | sp.CREATE_NEW_PROCESS_GROUP}  # type: ignore
+            if platform.system() == "Windows"
+            else {"start_new_session": True}
+        )
+        try:
+            sp.Popen(
+                [sys.executable, os.path.join(ROOT_DIR, "main.py"), "build", "gc"],
+                cwd=ROOT_DIR,
+                env={**os.environ, ROOT_DIR_ENV: self.root_dir},
+                stdin=sp.DEVNULL,
+                stdout=sp.DEVNULL,
+                stderr=sp.DEVNULL,
+                **kwargs,
+            )
+        except OSError as e:
+            rprint(f"[red]Error[/red]: Could not start the garbage collector: {e}")
+            return False
+        return True
 
     def get_metadata(self, video_path: str, verbose: bool = False) -> dict[str, str]:
         if not os.path.isfile(video_path):
@@ -284,32 +552,15 @@ class SettingsManager:
         return json.loads(json.dumps(metadata))
 
     def get_video_path(self, session_id: str, quiet: bool = False) -> str | None:
-        def file_filter(file) -> bool:
-            if not os.path.isfile(file) or not file.endswith(".mp4"):
-                return False
-
-            probe = ffmpeg.probe(file)
-            if not probe:
-                return False
+        video_path = self.session_index.get_video_path(session_id)
+        if video_path is None:
+            # Only probe files that are not indexed yet or changed since
+            self.session_index.rebuild()
+            video_path = self.session_index.get_video_path(session_id)
 
-            return probe["format"]["tags"].get("episode_id") == session_id
-
-        try:
-            file = tuple(
-                filter(
-                    lambda file: file_filter(os.path.join(self.output_dir, file)),
-                    os.listdir(self.output_dir),
-                )
-            )[0]
-            return os.path.join(
-                self.output_dir,
-                file,
-            )
-        except IndexError:
-            if not quiet:
-                raise FileNotFoundError(f"No video found for session {session_id}!")
-            else:
-                return None
+        if video_path is None and not quiet:
+            raise FileNotFoundError(f"No video found for session {session_id}!")
+        return video_path
 
     def session_exists(self, session_id: SessionID) -> bool:
         if session_id == SessionID.LAST:
@@ -319,28 +570,97 @@ class SettingsManager:
 
         return (
             os.path.exists(self.build_dir_for_session(session_id_str))
+            or self.build_archive.is_archived(session_id_str)
             if session_id_str
             else False
         )
 
-    def get_sessions(self) -> list[Session]:
-        past_topics = self.get("past_topics", {}) or {}
-        assert isinstance(past_topics, dict)
+    def restore_session(
+        self, session_id: str, prefixes: Iterable[str] | None = None
+    ) -> int:
+        restored = self.build_archive.restore(
+            session_id, self.build_dir_for_session(session_id), prefixes
+        )
+        if restored and self.__verbose__:
+            typer.echo(f"Restored {restored} files of session {session_id}.")
+        return restored
+
+    def __migrate_past_topics__(self) -> None:
+        if "past_topics" not in self.__config__:
+            return
 
-        def get_session_id(id: str) -> _SessionID:
-            return SessionID.explicit(id).copy()
+        with self.__lock__, self.__file_lock__:
+            self.__refresh__()
+            past_topics = self.get("past_topics")
+            if isinstance(past_topics, dict):
+                self.topic_history.import_topics(past_topics)
+            self.delete("past_topics")
+            self.flush()
 
+    def get_sessions(self, limit: int | None = None, offset: int = 0) -> list[Session]:
         return [
-            Session(get_session_id(session_id)) for session_id in past_topics.keys()
+            Session(SessionID.explicit(session_id).copy(), title)
+            for session_id, title in self.topic_history.page(limit, offset)
         ]
 
+    def load_sessions(
+        self, sessions: list[Session], max_workers: int = 8
+    ) -> Iterator[tuple[Session, Exception | None]]:
+        if not sessions:
+            return
+
+        self.session_index.rebuild(max_workers=max_workers)
+
+        def load(session: Session) -> tuple[Session, Exception | None]:
+            try:
+                return session.load(), None
+            except (FileNotFoundError, ValueError) as e:
+                return session, e
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            yield from executor.map(load, sessions)
+
     @property
     def config(self) -> dict:
+        self.__refresh__()
         return self.__config__
 
+    @property
+    def session_index(self) -> SessionIndex:
+        return self.__session_index__
+
+    @property
+    def topic_history(self) -> TopicHistory:
+        return self.__topic_history__
+
+    @property
+    def build_collector(self) -> BuildCollector:
+        return self.__build_collector__
+
+    @property
+    def build_archive(self) -> BuildArchive:
+        return self.__build_archive__
+
+    @property
+    def blob_store(self) -> BlobStore:
+        return self.__blob_store__
+
+    @property
+    def build_manifest(self) -> BuildManifest:
+        return BuildManifest(self.build_dir)
+
+    def job_queue(self, queue_dir: str | None = None) -> JobQueue:
+        return JobQueue(
+            queue_dir
+            or self.get("farm_dir", None)
+            or os.path.join(self.root_dir, "farm"),
+            lease_seconds=float(self.get("farm_lease_seconds", 120) or 120),
+            max_attempts=int(self.get("farm_max_attempts", 3) or 3),
+        )
+
     @property
     def session_id(self) -> str:
-        return self.__session_id__
+        return self.__session_var__.get() or self.__session_id__
 
     @property
     def last_session_id(self) -> str | None:
@@ -354,13 +674,197 @@ class SettingsManager:
     def verbose(self, value: bool):
         self.__verbose__ = value
 
-    def reinit(self):
-        load_dotenv()
+    @property
+    def write_behind_ms(self) -> int:
+        return self.__write_behind_ms__
+
+    @write_behind_ms.setter
+    def write_behind_ms(self, value: int):
+        self.__write_behind_ms__ = max(0, int(value))
+        if not self.__write_behind_ms__:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        with self.__lock__:
+            snapshot = (
+                (copy.deepcopy(self.__config__), dict(self.__pending__))
+                if not self.__batch_depth__
+                else None
+            )
+            self.__batch_depth__ += 1
+            try:
+                yield self
+            except BaseException:
+                if snapshot is not None:
+                    self.__config__, self.__pending__ = snapshot
+                    self.__deferred__ = {}
+                    self.__decrypted__ = {}
+                raise
+            finally:
+                self.__batch_depth__ -= 1
+
+            if not self.__batch_depth__ and self.__deferred__:
+                self.__merge_updates__()
+            elif not self.__batch_depth__ and self.__pending__:
+                self.__save__()
+
+    def update(self, key, fn, default=None, encrypt: bool = False):
+        with self.__lock__, self.__file_lock__:
+            self.__refresh__()
+            path = self.__write_path__(key)
+            deferred = self.__deferred__.pop(path, None) or {
+                "before": self.__pending__.get(path, _UNSET),
+                "updates": [],
+            }
+            value = fn(self.get(key, default))
+            self.set(key, value, encrypt=encrypt)
+            if not self.__batch_depth__:
+                self.flush()
+                return value
+
+            # Other processes may write the key before the batch does, so the
+            # update is made again on their value when the batch is written
+            deferred["updates"].append((key, fn, default, encrypt, self.channel))
+            self.__deferred__[path] = deferred
+            return value
+
+    def __merge_updates__(self):
+        with self.__lock__, self.__file_lock__:
+            deferred, self.__deferred__ = self.__deferred__, {}
+            for path, entry in deferred.items():
+                if entry["before"] is _UNSET:
+                    self.__pending__.pop(path, None)
+                else:
+                    self.__pending__[path] = entry["before"]
+            self.__refresh__(force=True)
+
+            self.__batch_depth__ += 1
+            try:
+                for entry in deferred.values():
+                    for key, fn, default, encrypt, channel in entry["updates"]:
+                        with self.use_channel(channel):
+                            self.set(key, fn(self.get(key, default)), encrypt=encrypt)
+            finally:
+                self.__batch_depth__ -= 1
+            self.flush()
+
+    def __save__(self):
+        with self.__lock__:
+            if self.__batch_depth__:
+                return
+
+            if not self.__write_behind_ms__:
+                self.flush()
+                return
+
+            if self.__flush_timer__ is None:
+                self.__flush_timer__ = threading.Timer(
+                    self.__write_behind_ms__ / 1000, self.flush
+                )
+                self.__flush_timer__.daemon = True
+                self.__flush_timer__.start()
+
+    def __stat_config_file__(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.__config_file__)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def __read_config_file__(self) -> dict:
         try:
             with open(self.__config_file__, "r", encoding="utf-8") as f:
-                self.__config__ = json.load(f)
-        except:
-            self.__config__ = {}
+                config = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return config if isinstance(config, dict) else {}
+
+    @staticmethod
+    def __get_path__(config: dict, path: tuple) -> tuple[bool, object]:
+        value = config
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                return False, None
+            value = value[key]
+        return True, value
+
+    @staticmethod
+    def __set_path__(config: dict, path: tuple, value) -> None:
+        for key in path[:-1]:
+            if not isinstance(config.get(key), dict):
+                if value is _DELETED:
+                    return
+                config[key] = {}
+            config = config[key]
+
+        if value is _DELETED:
+            config.pop(path[-1], None)
+        else:
+            config[path[-1]] = value
+
+    def __apply_pending__(self, config: dict) -> dict:
+        for path, value in self.__pending__.items():
+            self.__set_path__(config, path, value)
+        return config
+
+    def __refresh__(self, force: bool = False):
+        with self.__lock__:
+            stat = self.__stat_config_file__()
+            if not force and stat == self.__config_stat__:
+                return
+
+            # Other processes only ever replace the file atomically
+            self.__config__ = self.__apply_pending__(self.__read_config_file__())
+            self.__config_stat__ = stat
+
+    def flush(self) -> bool:
+        with self.__lock__:
+            if self.__flush_timer__ is not None:
+                self.__flush_timer__.cancel()
+                self.__flush_timer__ = None
+
+            if not self.__pending__:
+                return True
+
+            config_dir = os.path.dirname(self.__config_file__)
+            temp_file = None
+            try:
+                with self.__file_lock__:
+                    config = self.__apply_pending__(self.__read_config_file__())
+                    fd, temp_file = tempfile.mkstemp(
+                        prefix=".config.", suffix=".tmp", dir=config_dir
+                    )
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        json.dump(config, f, indent=4)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_file, self.__config_file__)
+                    temp_file = None
+
+                    if platform.system() != "Windows":
+                        dir_fd = os.open(config_dir, os.O_RDONLY)
+                        try:
+                            os.fsync(dir_fd)
+                        finally:
+                            os.close(dir_fd)
+
+                    self.__config_stat__ = self.__stat_config_file__()
+            except (OSError, TypeError, ValueError) as e:
+                rprint(f"[red]Error[/red]: Could not save settings: {e}")
+                if temp_file and os.path.exists(temp_file):
+                    os.remove(temp_file)
+                return False
+
+            self.__config__ = config
+            self.__pending__ = {}
+            return True
+
+    def reinit(self):
+        load_dotenv()
+        self.flush()
+        self.__decrypted__ = {}
+        self.__refresh__(force=True)
 
     def clean_build_dir(self):
         try:
@@ -392,29 +896,25 @@ class SettingsManager:
         if not cls.encryption_enabled:
             raise EncryptionKeyNotFoundError()
 
-        encryption_key = os.environ["ENCRYPTION_KEY"].encode()
-        salt = b"4EL\xefE\xad\xb9\xc4\x9b\x8d:\x86\x95Sg\x99"
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-            backend=default_backend(),
-        )
-        key = kdf.derive(encryption_key)
-        del encryption_key, salt, kdf
-        return urlsafe_b64encode(key)
+        return _derive_fernet_key(os.environ["ENCRYPTION_KEY"])
 
     @classproperty
-    def root_dir(cls) -> str:
-        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    def __fernet__(cls) -> Fernet:
+        if not cls.encryption_enabled:
+            raise EncryptionKeyNotFoundError()
+
+        return _get_fernet(os.environ["ENCRYPTION_KEY"])
+
+    @property
+    def root_dir(self) -> str:
+        return self.__root_dir__
 
     @property
     def build_dir(self) -> str:
         return os.path.join(
             self.root_dir,
             "build",
-            self.__session_id__,
+            self.session_id,
         )
 
     @classproperty
@@ -446,39 +946,83 @@ class SettingsManager:
             session_id,
         )
 
-    @classproperty
-    def output_dir(cls) -> str:
-        return os.path.join(cls.root_dir, "output")
+    @property
+    def output_dir(self) -> str:
+        return os.path.join(self.root_dir, "output")
 
-    @classproperty
-    def assets_dir(cls) -> str:
-        return os.path.join(cls.root_dir, "assets")
+    @property
+    def assets_dir(self) -> str:
+        return os.path.join(self.root_dir, "assets")
 
-    @classproperty
-    def config_dir(cls) -> str:
-        return os.path.join(cls.root_dir, "config")
+    @property
+    def config_dir(self) -> str:
+        return os.path.join(self.root_dir, "config")
 
     @property
     def immutable_keys(self) -> list:
         return []
 
-    def has(self, key, check_none: bool = False):
-        if key in self.__config__:
-            return not (check_none and self.__config__[key] is None)
+    @property
+    def channel(self) -> str | None:
+        return _channel.get()
+
+    @property
+    def channels(self) -> list[str]:
+        self.__refresh__()
+        channels = self.__config__.get("channels", {})
+        return list(channels.keys()) if isinstance(channels, dict) else []
+
+    def activate_channel(self, channel: str | None) -> None:
+        activate_channel(channel)
+
+    @contextmanager
+    def use_channel(self, channel: str | None):
+        token = _channel.set(channel or None)
+        try:
+            yield channel
+        finally:
+            _channel.reset(token)
+
+    @property
+    def channel_assets_dir(self) -> str:
+        return (
+            os.path.join(self.assets_dir, "channels", self.channel)
+            if self.channel
+            else os.path.join(self.assets_dir, "project")
+        )
+
+    def __write_path__(self, key, channel: str | None = None) -> tuple:
+        if channel is None and key in self.CHANNEL_SCOPED_KEYS:
+            channel = self.channel
+        return ("channels", channel, key) if channel else (key,)
+
+    def __lookup__(
+        self, key, channel: str | None = None
+    ) -> tuple[tuple | None, object]:
+        self.__refresh__()
+        channel = channel or self.channel
+        paths = [("channels", channel, key), (key,)] if channel else [(key,)]
+        for path in paths:
+            found, value = self.__get_path__(self.__config__, path)
+            if found:
+                return path, value
 
         if key in os.environ:
-            return not (check_none and os.environ[key] is None)
+            return None, os.environ[key]
 
-        return False
+        return None, _DELETED
 
-    def get(self, key, default=None):
-        if not self.has(key):
-            return default
+    def has(self, key, check_none: bool = False, channel: str | None = None):
+        _, value = self.__lookup__(key, channel)
+        if value is _DELETED:
+            return False
 
-        if key in self.__config__:
-            value = self.__config__[key]
-        else:
-            value = os.environ[key]
+        return not (check_none and value is None)
+
+    def get(self, key, default=None, channel: str | None = None):
+        path, value = self.__lookup__(key, channel)
+        if value is _DELETED:
+            return default
 
         if (
             value is not None
@@ -486,14 +1030,25 @@ class SettingsManager:
             and isinstance(value, str)
             and value.startswith("gAAAAA")
         ):
+            value = self.__get_decrypted__(path or (key,), value)
+
+        return value
+
+    def __get_decrypted__(self, key, ciphertext: str):
+        encryption_key = os.environ["ENCRYPTION_KEY"]
+        cached = self.__decrypted__.get(key)
+        if cached is None or cached[:2] != (ciphertext, encryption_key):
+            plaintext = self.decrypt(ciphertext, ignore_errors=False)
             try:
-                value = json.loads(self.decrypt(value, ignore_errors=False))
+                value = json.loads(plaintext)
             except:
-                value = self.decrypt(value, ignore_errors=False)
+                value = plaintext
+            cached = (ciphertext, encryption_key, value)
+            self.__decrypted__[key] = cached
 
-        return value
+        return copy.deepcopy(cached[2])
 
-    def set(self, key, value, encrypt: bool = False):
+    def set(self, key, value, encrypt: bool = False, channel: str | None = None):
         if key in self.immutable_keys:
             return
 
@@ -513,39 +1068,37 @@ class SettingsManager:
             else:
                 raise ValueError("Cannot encrypt this type of value")
 
-        self.__config__[key] = value
-        try:
-            with open(self.__config_file__, "w", encoding="utf-8") as f:
-                json.dump(self.__config__, f, indent=4)
-        except:
-            pass
+        with self.__lock__:
+            path = self.__write_path__(key, channel)
+            self.__set_path__(self.__config__, path, value)
+            self.__pending__[path] = value
+            # A later write replaces the updates the batch made to the key
+            self.__deferred__.pop(path, None)
+            self.__decrypted__.pop(path, None)
+            self.__save__()
 
-    def delete(self, key):
+    def delete(self, key, channel: str | None = None):
         if key in self.immutable_keys:
             return
 
-        if self.has(key):
-            del self.__config__[key]
-            try:
-                with open(self.__config_file__, "w", encoding="utf-8") as f:
-                    json.dump(self.__config__, f, indent=4)
-            except:
-                pass
+        with self.__lock__:
+            self.__refresh__()
+            path = self.__write_path__(key, channel)
+            if self.__get_path__(self.__config__, path)[0]:
+                self.__decrypted__.pop(path, None)
+                self.__set_path__(self.__config__, path, _DELETED)
+                self.__pending__[path] = _DELETED
+                self.__deferred__.pop(path, None)
+                self.__save__()
 
     def encrypt(self, value: str, ignore_errors: bool = True) -> str:
         if ignore_errors and (not self.encryption_enabled or not value):
             return value
 
-        f = Fernet(self.__fernet_key__)
-        value = f.encrypt(value.encode()).decode()
-        del f
-        return value
+        return self.__fernet__.encrypt(value.encode()).decode()
 
     def decrypt(self, value: str, ignore_errors: bool = True) -> str:
         if ignore_errors and (not self.encryption_enabled or not value):
             return value
 
-        f = Fernet(self.__fernet_key__)
-        value = f.decrypt(value.encode()).decode()
-        del f
-        return value
+        return self.__fernet__.decrypt(value.encode()).decode()
@@ -0,0 +1,286 @@
+import glob
+import json
+import os
+import socket
+import time
+import uuid
+
+from src.errors import QueueFullError
+
+
+class JobQueue:
+    # Directories on a shared mount are the only coordination between hosts, so
+    # every state change is a rename, which is atomic on NFS as well
+    STATES = ("pending", "claimed", "done", "failed")
+
+    def __init__(
+        self, queue_dir: str, lease_seconds: float = 120, max_attempts: int = 3
+    ) -> None:
+        self.__queue_dir__ = queue_dir
+        self.__lease_seconds__ = lease_seconds
+        self.__max_attempts__ = max(1, max_attempts)
+        for state in self.STATES:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+        os.makedirs(self.outputs_dir, exist_ok=True)
+
+    @property
+    def queue_dir(self) -> str:
+        return self.__queue_dir__
+
+    @property
+    def outputs_dir(self) -> str:
+        return os.path.join(self.__queue_dir__, "outputs")
+
+    @property
+    def lease_seconds(self) -> float:
+        return self.__lease_seconds__
+
+    @staticmethod
+    def worker_id() -> str:
+        return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def __path__(self, state: str, job_id: str) -> str:
+        return os.path.join(self.__queue_dir__, state, f"{job_id}.json")
+
+    def __lease__(self, job_id: str, worker_id: str) -> str:
+        return os.path.join(
+            self.__queue_dir__, "claimed", f"{job_id}@{worker_id}.lease"
+        )
+
+    def __leases__(self, job_id: str) -> list[str]:
+        return glob.glob(
+            os.path.join(
+                self.__queue_dir__, "claimed", f"{glob.escape(job_id)}@*.lease"
+            )
+        )
+
+    def __drop_leases__(self, job_id: str) -> None:
+        for lease in self.__leases__(job_id):
+            try:
+                os.remove(lease)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def __read__(path: str) -> dict:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def __write__(path: str, job: dict) -> None:
+        temp_file = os.path.join(
+            os.path.dirname(path), f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp"
+        )
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+
+    def __now__(self) -> float:
+        # Compare lease times with the clock of the file server, not of this host
+        clock = os.path.join(self.__queue_dir__, ".clock")
+        with open(clock, "a"):
+            os.utime(clock)
+        return os.stat(clock).st_mtime
+
+    def __take__(
+        self, job_id: str, worker_id: str, reaper: bool = False
+    ) -> tuple[str, dict] | None:
+        # Whoever renames the claimed file first owns the transition
+        taken = os.path.join(
+            self.__queue_dir__, "claimed", f".{job_id}.json.{worker_id}.taken"
+        )
+        try:
+            os.rename(self.__path__("claimed", job_id), taken)
+        except FileNotFoundError:
+            return None
+
+        job = self.__read__(taken)
+        if not reaper and job.get("worker") != worker_id:
+            # The lease expired and another worker claimed the job since
+            os.rename(taken, self.__path__("claimed", job_id))
+            return None
+        self.__drop_leases__(job_id)
+        return taken, job
+
+    def __retry_state__(self, job: dict) -> str:
+        # Jobs with side effects (e.g. an upload) are submitted with a single attempt
+        max_attempts = job.get("max_attempts") or self.__max_attempts__
+        return "pending" if job["attempts"] < max_attempts else "failed"
+
+    def __move__(self, taken: str, state: str, job: dict, event: dict) -> None:
+        job["state"] = state
+        job["history"].append({**event, "at": time.time()})
+        self.__write__(self.__path__(state, job["id"]), job)
+        os.remove(taken)
+
+    def submit(
+        self,
+        spec: dict,
+        max_pending: int | None = None,
+        max_attempts: int | None = None,
+    ) -> str:
+        # Every producer is admitted here, so the backlog has a single bound
+        if max_pending is not None and self.counts()["pending"] >= max_pending:
+            raise QueueFullError(max_pending)
+        job_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self.__write__(
+            self.__path__("pending", job_id),
+            {
+                "id": job_id,
+                "state": "pending",
+                "spec": spec,
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "submitted_at": time.time(),
+                "history": [],
+            },
+        )
+        return job_id
+
+    def claim(self, worker_id: str) -> dict | None:
+        self.reap(worker_id)
+        for path in sorted(
+            glob.glob(os.path.join(self.__queue_dir__, "pending", "*.json"))
+        ):
+            job_id = os.path.basename(path)[: -len(".json")]
+            lease = self.__lease__(job_id, worker_id)
+            # The lease exists before the claim, so the job never looks abandoned
+            with open(lease, "w", encoding="utf-8") as f:
+                f.write(worker_id)
+            try:
+                os.rename(path, self.__path__("claimed", job_id))
+            except FileNotFoundError:
+                # Another worker was faster (and may have removed this lease already)
+                try:
+                    os.remove(lease)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            job = self.__read__(self.__path__("claimed", job_id))
+            job["state"] = "claimed"
+            job["attempts"] += 1
+            job["worker"] = worker_id
+            job["history"].append(
+                {"event": "claimed", "worker": worker_id, "at": time.time()}
+            )
+            self.__write__(self.__path__("claimed", job_id), job)
+            return job
+        return None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        try:
+            os.utime(self.__lease__(job_id, worker_id))
+        except FileNotFoundError:
+            # The lease expired and the job was handed to another worker
+            return False
+        return True
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        taken = self.__take__(job_id, worker_id)
+        if taken is None:
+            return False
+        path, job = taken
+        job["result"] = result
+        self.__move__(path, "done", job, {"event": "done", "worker": worker_id})
+        return True
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True) -> bool:
+        taken = self.__take__(job_id, worker_id)
+        if taken is None:
+            return False
+        path, job = taken
+        job["error"] = error
+        self.__move__(
+            path,
+            self.__retry_state__(job) if retry else "failed",
+            job,
+            {"event": "failed", "worker": worker_id, "error": error},
+        )
+        return True
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        taken = self.__take__(job_id, worker_id)
+        if taken is None:
+            return False
+        path, job = taken
+        # A worker that shuts down didn't try the job, so it doesn't count
+        job["attempts"] -= 1
+        self.__move__(path, "pending", job, {"event": "released", "worker": worker_id})
+        return True
+
+    def reap(self, worker_id: str) -> list[str]:
+        now = self.__now__()
+        reaped = []
+        for path in glob.glob(os.path.join(self.__queue_dir__, "claimed", "*.json")):
+            job_id = os.path.basename(path)[: -len(".json")]
+            try:
+                heartbeats = [
+                    os.stat(lease).st_mtime for lease in self.__leases__(job_id)
+                ]
+                # A rename updates the change time, so it marks the claim
+                last_seen = max(heartbeats, default=os.stat(path).st_ctime)
+            except FileNotFoundError:
+                continue
+            if now - last_seen < self.__lease_seconds__:
+                continue
+
+            taken = self.__take__(job_id, worker_id, reaper=True)
+            if taken is None:
+                continue
+            taken_path, job = taken
+            self.__move__(
+                taken_path,
+                self.__retry_state__(job),
+                job,
+                {"event": "expired", "worker": job.get("worker"), "reaper": worker_id},
+            )
+            reaped.append(job_id)
+
+        # Transitions of a worker that crashed halfway
+        for taken in glob.glob(os.path.join(self.__queue_dir__, "claimed", ".*.taken")):
+            try:
+                if now - os.stat(taken).st_ctime < self.__lease_seconds__:
+                    continue
+                job = self.__read__(taken)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            # The worker may have crashed before it removed its lease
+            self.__drop_leases__(job["id"])
+            self.__move__(
+                taken,
+                self.__retry_state__(job),
+                job,
+                {"event": "expired", "worker": job.get("worker"), "reaper": worker_id},
+            )
+            reaped.append(job["id"])
+        return reaped
+
+    def get(self, job_id: str) -> dict | None:
+        for state in self.STATES:
+            try:
+                return self.__read__(self.__path__(state, job_id))
+            except FileNotFoundError:
+                continue
+        return None
+
+    def jobs(self, state: str | None = None) -> list[dict]:
+        jobs = []
+        for current in (state,) if state else self.STATES:
+            for path in sorted(
+                glob.glob(os.path.join(self.__queue_dir__, current, "*.json"))
+            ):
+                try:
+                    jobs.append(self.__read__(path))
+                except (FileNotFoundError, json.JSONDecodeError):
+                    # Moved on by another host in the meantime
+                    continue
+        return jobs
+
+    def counts(self) -> dict[str, int]:
+        return {
+            state: len(glob.glob(os.path.join(self.__queue_dir__, state, "*.json")))
+            for state in self.STATES
+        }
@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+import ffmpeg
+
+
+class SessionIndex:
+    def __init__(self, database_file: str, output_dir: str) -> None:
+        self.__database_file__ = database_file
+        self.__output_dir__ = output_dir
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL UNIQUE,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    duration REAL,
+                    tags TEXT NOT NULL
+                )
+                """)
+
+    @property
+    def database_file(self) -> str:
+        return self.__database_file__
+
+    def __connect__(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__database_file__, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def __row_to_entry__(self, row: sqlite3.Row) -> dict:
+        return {
+            "session_id": row["session_id"],
+            "path": row["path"],
+            "size": row["size"],
+            "mtime": row["mtime"],
+            "duration": row["duration"],
+            "tags": json.loads(row["tags"]),
+        }
+
+    def update(self, video_path: str, probe: dict | None = None) -> str | None:
+        video_path = os.path.abspath(video_path)
+        stat = os.stat(video_path)
+        probe = probe or ffmpeg.probe(video_path)
+        tags = probe.get("format", {}).get("tags", {})
+        session_id = tags.get("episode_id")
+        if not session_id:
+            return None
+
+        try:
+            duration = float(probe.get("format", {}).get("duration"))
+        except (TypeError, ValueError):
+            duration = None
+
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE path = ? AND session_id != ?",
+                (video_path, session_id),
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    video_path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    duration,
+                    json.dumps(tags),
+                ),
+            )
+        return session_id
+
+    def remove(self, session_id: str) -> None:
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id = ?", (session_id,)
+            )
+
+    def lookup(self, session_id: str) -> dict | None:
+        with closing(self.__connect__()) as connection:
+            row = connection.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        entry = self.__row_to_entry__(row)
+        try:
+            stat = os.stat(entry["path"])
+        except FileNotFoundError:
+            self.remove(session_id)
+            return None
+
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime"]:
+            if self.update(entry["path"]) != session_id:
+                return None
+            return self.lookup(session_id)
+
+        return entry
+
+    def get_video_path(self, session_id: str) -> str | None:
+        entry = self.lookup(session_id)
+        return entry["path"] if entry else None
+
+    def get_tags(self, session_id: str) -> dict[str, str] | None:
+        entry = self.lookup(session_id)
+        return entry["tags"] if entry else None
+
+    def rebuild(self, max_workers: int = 8) -> None:
+        with closing(self.__connect__()) as connection:
+            known = {
+                row["path"]: (row["size"], row["mtime"])
+                for row in connection.execute("SELECT path, size, mtime FROM sessions")
+            }
+
+        existing, changed = set(), []
+        if os.path.isdir(self.__output_dir__):
+            for file in os.listdir(self.__output_dir__):
+                path = os.path.abspath(os.path.join(self.__output_dir__, file))
+                if not os.path.isfile(path) or not file.endswith(".mp4"):
+                    continue
+
+                existing.add(path)
+                stat = os.stat(path)
+                if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                    changed.append(path)
+
+        def probe(path: str) -> dict | None:
+            try:
+                return ffmpeg.probe(path)
+            except ffmpeg.Error:
+                return None
+
+        if changed:
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                for path, result in zip(changed, executor.map(probe, changed)):
+                    if result is not None:
+                        self.update(path, probe=result)
+
+        with closing(self.__connect__()) as connection, connection:
+            connection.executemany(
+                "DELETE FROM sessions WHERE path = ?",
+                [(path,) for path in set(known) - existing],
+            )
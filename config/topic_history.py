@@ -0,0 +1,191 @@
+import sqlite3
+import time
+from contextlib import closing
+from typing import Iterator
+
+
+class TopicHistory:
+    def __init__(self, database_file: str) -> None:
+        self.__database_file__ = database_file
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL,
+                    norm_title TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0,
+                    pending INTEGER NOT NULL DEFAULT 0
+                )
+                """)
+            columns = {
+                row["name"] for row in connection.execute("PRAGMA table_info(topics)")
+            }
+            if "pending" not in columns:
+                connection.execute(
+                    "ALTER TABLE topics ADD COLUMN pending INTEGER NOT NULL DEFAULT 0"
+                )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS topics_norm_title ON topics (norm_title)"
+            )
+
+    @property
+    def database_file(self) -> str:
+        return self.__database_file__
+
+    @staticmethod
+    def normalize(title: str) -> str:
+        return " ".join(title.casefold().split())
+
+    def __connect__(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.__database_file__, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def __where__(self, prefix: str | None, pending: bool = False) -> tuple[str, tuple]:
+        where = "deleted = 0" if pending else "deleted = 0 AND pending = 0"
+        if not prefix:
+            return where, ()
+
+        # Range scan over the norm_title index instead of LIKE
+        prefix = self.normalize(prefix)
+        return (
+            f"{where} AND norm_title >= ? AND norm_title < ?",
+            (prefix, prefix + "\U0010ffff"),
+        )
+
+    def add(self, session_id: str, title: str, pending: bool = False) -> bool:
+        norm_title = self.normalize(title)
+        with closing(self.__connect__()) as connection, connection:
+            duplicate = connection.execute(
+                "SELECT 1 FROM topics WHERE norm_title = ? AND deleted = 0 AND session_id != ?",
+                (norm_title, session_id),
+            ).fetchone()
+            if duplicate:
+                return False
+
+            connection.execute(
+                """
+                INSERT INTO topics (session_id, title, norm_title, created_at, pending)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    title = excluded.title,
+                    norm_title = excluded.norm_title,
+                    deleted = 0,
+                    pending = excluded.pending
+                """,
+                (session_id, title, norm_title, time.time(), int(pending)),
+            )
+        return True
+
+    def commit(self, session_id: str) -> None:
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "UPDATE topics SET pending = 0 WHERE session_id = ?", (session_id,)
+            )
+
+    def discard(self, session_id: str) -> None:
+        # Only a topic whose video was never finished is dropped
+        with closing(self.__connect__()) as connection, connection:
+            connection.execute(
+                "DELETE FROM topics WHERE session_id = ? AND pending = 1",
+                (session_id,),
+            )
+
+    def import_topics(self, topics: dict[str, str]) -> None:
+        with closing(self.__connect__()) as connection, connection:
+            connection.executemany(
+                """
+                INSERT OR IGNORE INTO topics (session_id, title, norm_title, created_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (session_id, title, self.normalize(title), time.time())
+                    for session_id, title in topics.items()
+                    if isinstance(title, str)
+                ],
+            )
+
+    def get(self, session_id: str) -> str | None:
+        with closing(self.__connect__()) as connection:
+            row = connection.execute(
+                "SELECT title FROM topics WHERE session_id = ? AND deleted = 0 AND pending = 0",
+                (session_id,),
+            ).fetchone()
+        return row["title"] if row else None
+
+    def remove(self, session_id: str) -> str | None:
+        with closing(self.__connect__()) as connection, connection:
+            row = connection.execute(
+                "SELECT title FROM topics WHERE session_id = ? AND deleted = 0",
+                (session_id,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE topics SET deleted = 1 WHERE session_id = ?", (session_id,)
+            )
+        return row["title"]
+
+    def remove_at(self, index: int) -> tuple[str, str] | None:
+        if index < 0:
+            return None
+
+        with closing(self.__connect__()) as connection, connection:
+            row = connection.execute(
+                "SELECT session_id, title FROM topics WHERE deleted = 0 AND pending = 0 ORDER BY seq LIMIT 1 OFFSET ?",
+                (index,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE topics SET deleted = 1 WHERE session_id = ?",
+                (row["session_id"],),
+            )
+        return row["session_id"], row["title"]
+
+    def count(self, prefix: str | None = None) -> int:
+        where, params = self.__where__(prefix)
+        with closing(self.__connect__()) as connection:
+            return connection.execute(
+                f"SELECT COUNT(*) FROM topics WHERE {where}", params
+            ).fetchone()[0]
+
+    def page(
+        self, limit: int | None = None, offset: int = 0, prefix: str | None = None
+    ) -> list[tuple[str, str]]:
+        where, params = self.__where__(prefix)
+        with closing(self.__connect__()) as connection:
+            rows = connection.execute(
+                f"SELECT session_id, title FROM topics WHERE {where} ORDER BY seq LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else max(0, limit), max(0, offset)),
+            ).fetchall()
+        return [(row["session_id"], row["title"]) for row in rows]
+
+    def iter(
+        self, prefix: str | None = None, batch_size: int = 500, pending: bool = False
+    ) -> Iterator[tuple[str, str]]:
+        where, params = self.__where__(prefix, pending=pending)
+        last_seq = 0
+        while True:
+            # Keyset paging keeps every batch an index seek
+            with closing(self.__connect__()) as connection:
+                rows = connection.execute(
+                    f"SELECT seq, session_id, title FROM topics WHERE {where} AND seq > ? ORDER BY seq LIMIT ?",
+                    (*params, last_seq, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+
+            for row in rows:
+                yield row["session_id"], row["title"]
+            last_seq = rows[-1]["seq"]
+
+    def iter_titles(self, batch_size: int = 500) -> Iterator[str]:
+        # Topics of videos that are still being made are taken as well
+        for _, title in self.iter(batch_size=batch_size, pending=True):
+            yield title
@@ -2,16 +2,58 @@
 
 import json
 import os
+import platform
 import random as rd
 import shutil
+import subprocess as sp
 import sys
+import threading
+import time
 import traceback
+from functools import partial
 from pathlib import Path
-from typing import Annotated, Optional
+from typing import TYPE_CHECKING, Annotated, Callable, Optional
+
+from src import daemon
+
+# Commands (with their aliases) that a running daemon may run for the CLI
+DAEMON_COMMANDS = (
+    "generate",
+    "new",
+    "regenerate",
+    "rebuild",
+    "continue",
+    "resume",
+    "upload",
+    "publish",
+    "inspect",
+    "info",
+    "metadata",
+    "hashtags",
+    "show",
+    "play",
+    "preview",
+    "topics",
+    "build",
+    "settings",
+    "farm submit",
+    "farm add",
+    "farm status",
+    "farm list",
+)
+
+# Hand the command to a running daemon before anything heavy is imported
+if __name__ == "__main__":
+    exit_code = daemon.forward_to_daemon(
+        sys.argv[1:], DAEMON_COMMANDS, value_options=("--channel", "-ch")
+    )
+    if exit_code is not None:
+        sys.exit(exit_code)
 
-import captametropolis
+import click
 import typer
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 
 from src.cli_helpers import AliasGroup
@@ -25,7 +67,14 @@ def excepthook(type, value, tb):
 
 sys.excepthook = excepthook
 
-is_verbose: bool = False
+
+def resolve_client_path(value: Optional[str | Path]) -> Optional[str | Path]:
+    # Relative paths are relative to the caller, also when the daemon runs the command
+    if value is None:
+        return None
+    return type(value)(daemon.client_path(os.fspath(value)))
+
+
 app: typer.Typer = typer.Typer(
     name="QuickClipAI",
     help=":sparkles: An [italic]awesome[/italic] [orange1]CLI tool[/orange1] to create and publish [bold cyan]beautiful[/bold cyan] YouTube Shorts/Instagram Reels/TikToks. :sparkles:",
@@ -66,13 +115,47 @@ settings_app = typer.Typer(
     },
     rich_help_panel="Settings: Configuration",
 )
+daemon_app = typer.Typer(
+    name="daemon",
+    help="[purple]Manage[/purple] the [bold cyan]background[/bold cyan] daemon that keeps the services warm. :fire:",
+    rich_markup_mode="rich",
+    cls=AliasGroup,
+    context_settings={
+        "help_option_names": ["-h", "--help", "-?"],
+    },
+    rich_help_panel="Settings: Management",
+)
+farm_app = typer.Typer(
+    name="farm",
+    help="[purple]Distribute[/purple] [bold cyan]beautiful[/bold cyan] videos across several render machines. :factory:",
+    rich_markup_mode="rich",
+    cls=AliasGroup,
+    context_settings={
+        "help_option_names": ["-h", "--help", "-?"],
+    },
+    rich_help_panel="Video: Management",
+)
+api_app = typer.Typer(
+    name="api",
+    help="[purple]Serve[/purple] a [bold cyan]local HTTP API[/bold cyan] to submit and track video jobs. :globe_with_meridians:",
+    rich_markup_mode="rich",
+    cls=AliasGroup,
+    context_settings={
+        "help_option_names": ["-h", "--help", "-?"],
+    },
+    rich_help_panel="Video: Management",
+)
 app.add_typer(settings_app, name="settings", rich_help_panel="Video: Configuration")
+app.add_typer(farm_app, name="farm", rich_help_panel="Video: Management")
+app.add_typer(api_app, name="api", rich_help_panel="Video: Management")
+app.add_typer(daemon_app, name="daemon", rich_help_panel="Settings: Management")
 app.add_typer(build_app, name="build", rich_help_panel="Video: Management")
 app.add_typer(topics_app, name="topics", rich_help_panel="Video: Information")
 
 
 @app.callback()
 def main(
+    ctx: typer.Context,
     verbose: Annotated[
         bool,
         typer.Option(
@@ -84,24 +167,652 @@ def main(
             rich_help_panel="Options: Configuration",
         ),
     ] = False,
+    channel: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--channel",
+            "-ch",
+            help="Specify the [purple]channel[/purple] profile to use for settings and assets. :tv:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    trace: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--trace",
+            "-tr",
+            help="Specify whether or not to record a [purple]timeline[/purple] of the command as a Chrome trace [italic](open it in Perfetto)[/italic]. :mag:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
+    profile: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--profile",
+            "-pr",
+            help="Specify whether or not to run the command under a [purple]sampling profiler[/purple] and save a report per stage to the build directory. :bar_chart:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
 ):
-    global is_verbose
-    is_verbose = verbose
-
-
-from config.config import SessionID, SettingsManager
-from src.elevenlabs_api import ElevenLabsAPI
-from src.fooocus_api import FooocusAPI, ImageType, LoRa, Model, Resolution, UpscaleMode
-from src.g4f_api import G4FAPI, Message, MessageSender
-from src.moviepy_api import (
-    BackgroundMusic,
-    BensoundBackgroundMusic,
-    MoviepyAPI,
-    Overlay,
-    SubtitleOptions,
+    activate_verbose(verbose)
+    activate_channel(channel)
+    if trace or profile:
+        # Resources are closed in reverse: the spans, the profiler, then the reports
+        tracer = ctx.with_resource(tracing.record())
+        if trace:
+            ctx.call_on_close(partial(save_trace, tracer))
+        if profile:
+            profiler = ctx.with_resource(profiling.sample(tracer))
+            ctx.call_on_close(partial(save_profile, profiler))
+        ctx.with_resource(
+            tracing.span(f"main.py {ctx.invoked_subcommand}", channel=channel)
+        )
+
+
+def save_trace(tracer: "tracing.Tracer") -> None:
+    trace_file = tracer.save(
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "traces",
+            f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}.json",
+        )
+    )
+    typer.echo(f"Trace saved as: {trace_file}")
+
+
+def save_profile(profiler: "profiling.SamplingProfiler") -> None:
+    if not profiler.sessions:
+        typer.echo("The command was too short to be profiled.")
+        return
+
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    for session_id in profiler.sessions:
+        profile_dir = (
+            os.path.join(settings_manager.build_dir_for_session(session_id), "profile")
+            if session_id
+            else os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                "profiles",
+                time.strftime("%Y%m%d-%H%M%S"),
+            )
+        )
+        profiler.save(session_id, profile_dir)
+        typer.echo(f"Profile saved in: {profile_dir}")
+
+
+from config.config import (
+    Session,
+    SessionID,
+    SettingsManager,
+    activate_channel,
+    activate_verbose,
+    is_verbose,
 )
+from src import profiling, progress, tracing
+from src.errors import QueueFullError
+from src.hashtags import generate_hashtags
+from src.pipeline import Pipeline, PipelineJob, PipelineStage
 from src.prompt_manager import PromptManager
-from src.upload_api import UploadAPI
+from src.task_graph import TaskGraph
+
+# The provider and render modules are heavy, so commands import them when needed
+if TYPE_CHECKING:
+    from src.elevenlabs_api import ElevenLabsAPI
+    from src.fooocus_api import FooocusAPI
+    from src.g4f_api import G4FAPI
+    from src.moviepy_api import BackgroundMusic, MoviepyAPI, Overlay
+
+DEFAULT_BACKGROUND_MUSIC = [
+    {
+        "path": r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_1.mp3",
+        "volume_factor": 0.1,
+        "credits": "\nSong: Sappheiros - Lights (Vlog No Copyright Music)\nMusic promoted by Vlog No Copyright Music.\nVideo Link: https://youtu.be/kzeQK45StRo\n",
+    },
+    {
+        "path": r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_2.mp3",
+        "volume_factor": 0.1,
+        "credits": "\nSong: Chill Day - LAKEY INSPIRED\nLink: https://soundcloud.com/lakeyinspired/chill-day\nLicense: Creative Commons Attribution-ShareAlike 3.0\nLicense Link: https://creativecommons.org/licenses/by-sa/3.0/\n",
+    },
+    {
+        "bensound": "the lounge",
+        "volume_factor": 0.2,
+    },
+]
+DEFAULT_OVERLAYS = [
+    {
+        "path": r"D:\Hobbys\YouTube\CurioBurstz\Allgemein\Subscribe-Popup.mov",
+        "start_sec": 25,
+        "size": 0.5,
+        "rel_position": ["center", "top"],
+        "is_transparent": True,
+        "volume_factor": 0.4,
+    }
+]
+
+
+def get_channel_assets(settings_manager: SettingsManager, kind: str) -> list[dict]:
+    assets = settings_manager.get("assets", {})
+    if isinstance(assets, str):
+        # Values set from the CLI are stored as plain strings
+        assets = json.loads(assets)
+    if isinstance(assets, dict) and kind in assets:
+        return assets[kind] or []
+
+    if settings_manager.channel:
+        # Channels without an asset list use their own asset folder
+        return [{}] if kind == "music" else []
+    return DEFAULT_BACKGROUND_MUSIC if kind == "music" else DEFAULT_OVERLAYS
+
+
+def get_background_music(
+    settings_manager: SettingsManager,
+    bensound_volume: float | None = None,
+    musics: list[dict] | None = None,
+) -> "BackgroundMusic | None":
+    from src.moviepy_api import BackgroundMusic, BensoundBackgroundMusic
+
+    if musics is None:
+        musics = get_channel_assets(settings_manager, "music")
+    if not musics:
+        return None
+
+    music = rd.choice(musics)
+    if "bensound" in music:
+        return BensoundBackgroundMusic(
+            music["bensound"],
+            start_sec=music.get("start_sec", 0),
+            volume_factor=bensound_volume or music.get("volume_factor", 1),
+        )
+    return BackgroundMusic(
+        music.get("path"),
+        start_sec=music.get("start_sec", 0),
+        volume_factor=music.get("volume_factor", 1),
+        credits=music.get("credits"),
+    )
+
+
+def get_overlays(
+    settings_manager: SettingsManager, overlays: list[dict] | None = None
+) -> list["Overlay"]:
+    from src.moviepy_api import Overlay
+
+    if overlays is None:
+        overlays = get_channel_assets(settings_manager, "overlays")
+    return [
+        Overlay(
+            overlay["path"],
+            start_sec=overlay.get("start_sec", 0),
+            size=overlay.get("size"),
+            rel_position=tuple(overlay.get("rel_position", ("center", "center"))),
+            is_transparent=overlay.get("is_transparent", False),
+            volume_factor=overlay.get("volume_factor", 1),
+        )
+        for overlay in overlays
+    ]
+
+
+LLM_MODEL = "gpt-4o-mini"
+TTS_MODEL = "eleven_monolingual_v1"
+PICTURE_PARAMS = {
+    "model": "juggernautXL_v8Rundiffusion",
+    "lora_1": ("sd_xl_offset_example-lora_1.0", 0.1),
+    "resolution": "RES_768x1344",
+    "upscale_mode": "X_1_5",
+    "image_type": "jpeg",
+}
+SUBTITLE_PARAMS = {
+    "highlight_color": ["yellow", "cyan"],
+    "font_size": 90,
+    "stroke_width": 10,
+    "rel_height_pos": 0.3,
+}
+MAX_VIDEO_LENGTH = 59
+API_COMMANDS = ("generate", "regenerate", "upload")
+SINGLE_ATTEMPT_COMMANDS = ("upload",)
+
+
+def parse_paragraphs(text: str) -> tuple[str, ...]:
+    return tuple(
+        pg.replace("*", "").strip()
+        for pg in text.split("\n")
+        if pg.strip() and not pg[0].isdigit()
+    )
+
+
+def parse_lines(text: str) -> tuple[str, ...]:
+    return tuple(line.strip() for line in text.split("\n") if line.strip())
+
+
+def parse_video_info(text: str) -> tuple[str, str, tuple[str, ...]]:
+    return tuple(
+        map(
+            lambda info: (
+                tuple(
+                    map(
+                        lambda tag: tag.strip().replace("#", ""),
+                        info[1].split(","),
+                    )
+                )
+                if info[0] == 2
+                else info[1].strip()
+            ),
+            enumerate([info for info in text.split("\n") if info.strip()]),
+        )
+    )  # type: ignore
+
+
+def read_response(settings_manager: SettingsManager, name: str) -> str:
+    with open(
+        settings_manager.build_manifest.path(f"responses/{name}"),
+        "r",
+        encoding="utf-8",
+    ) as f:
+        return f.read()
+
+
+def list_outputs(directory: str) -> list[str]:
+    # Skip partial files of interrupted writes and keep the index order
+    return sorted(
+        (
+            file
+            for file in os.listdir(directory)
+            if not file.startswith(".") and not file.endswith(".tmp")
+        ),
+        key=lambda file: (
+            not os.path.splitext(file)[0].isdigit(),
+            (
+                int(os.path.splitext(file)[0])
+                if os.path.splitext(file)[0].isdigit()
+                else 0
+            ),
+            file,
+        ),
+    )
+
+
+def picture_artifact(index: int, count: int) -> str:
+    return f"pictures/{'thumbnail' if index == count - 1 else index}.{PICTURE_PARAMS['image_type']}"
+
+
+def topic_prompt(prompt_name: str, topic: str | None = None) -> str:
+    prompt = PromptManager().get_prompt(prompt_name)
+    if topic:
+        prompt += f"\nThe topic of this video must be: {topic}"
+    return prompt
+
+
+def response_inputs(
+    settings_manager: SettingsManager, prompt_name: str, topic: str | None = None
+) -> str:
+    manifest = settings_manager.build_manifest
+    return manifest.hash_inputs(
+        voiceover=manifest.digest("responses/voiceover.txt"),
+        prompt=topic_prompt(prompt_name, topic),
+        model=LLM_MODEL,
+    )
+
+
+def voiceover_inputs(
+    settings_manager: SettingsManager, paragraph: str, voice_id: str | None
+) -> str:
+    return settings_manager.build_manifest.hash_inputs(
+        text=paragraph, voice_id=voice_id, model=TTS_MODEL
+    )
+
+
+def picture_inputs(settings_manager: SettingsManager, prompt: str) -> str:
+    return settings_manager.build_manifest.hash_inputs(prompt=prompt, **PICTURE_PARAMS)
+
+
+def video_inputs(
+    settings_manager: SettingsManager,
+    audios: list[str],
+    pictures: list[str],
+    owner: str | None,
+    genre: int | None,
+    music: list[dict] | None = None,
+    overlays: list[dict] | None = None,
+) -> str:
+    manifest = settings_manager.build_manifest
+    return manifest.hash_inputs(
+        audios=[manifest.digest(audio) for audio in audios],
+        pictures=[manifest.digest(picture) for picture in pictures],
+        video_info=manifest.digest("responses/video_info.txt"),
+        subtitles=SUBTITLE_PARAMS,
+        music=get_channel_assets(settings_manager, "music") if music is None else music,
+        overlays=(
+            get_channel_assets(settings_manager, "overlays")
+            if overlays is None
+            else overlays
+        ),
+        owner=owner,
+        genre=genre,
+        max_length=MAX_VIDEO_LENGTH,
+    )
+
+
+def ask(
+    settings_manager: SettingsManager,
+    g4f_api: "G4FAPI",
+    prompt_name: str,
+    save_response: str,
+    history: list[dict[str, str]] | None = None,
+    topic: str | None = None,
+) -> str:
+    from src.g4f_api import Message, MessageSender
+
+    response = g4f_api.get_response(
+        Message(MessageSender.USER, topic_prompt(prompt_name, topic)),
+        save_response=save_response,
+        history=history,
+    ).content  # type: ignore
+    settings_manager.build_manifest.record(
+        f"responses/{save_response}",
+        response_inputs(settings_manager, prompt_name, topic),
+    )
+    return response
+
+
+def generate_voiceover(
+    settings_manager: SettingsManager,
+    elevenlabs_api: "ElevenLabsAPI",
+    index: int,
+    paragraph: str,
+    voice_id: str | None,
+) -> None:
+    if is_verbose():
+        typer.echo(f"{index + 1}. {paragraph}")
+    if not elevenlabs_api.generate_audio(
+        paragraph, voice_id=voice_id, model=TTS_MODEL, save_audio=str(index)
+    ):
+        raise RuntimeError(f"Failed to generate the audio of paragraph {index + 1}!")
+    settings_manager.build_manifest.record(
+        f"audios/{index}.mp3", voiceover_inputs(settings_manager, paragraph, voice_id)
+    )
+
+
+def generate_picture(
+    settings_manager: SettingsManager,
+    fooocus_api: "FooocusAPI",
+    index: int,
+    prompt: str,
+    count: int,
+) -> None:
+    from src.fooocus_api import ImageType, LoRa, Model, Resolution, UpscaleMode
+
+    if is_verbose():
+        typer.echo(f"{index + 1}. {prompt}")
+    artifact = picture_artifact(index, count)
+    if not fooocus_api.generate_picture(
+        prompt,
+        image_type=ImageType(PICTURE_PARAMS["image_type"]),
+        resolution=Resolution[PICTURE_PARAMS["resolution"]],
+        model=Model(PICTURE_PARAMS["model"]),
+        lora_1=LoRa(PICTURE_PARAMS["lora_1"][0], weight=PICTURE_PARAMS["lora_1"][1]),
+        upscale_mode=UpscaleMode[PICTURE_PARAMS["upscale_mode"]],
+        save_picture=os.path.splitext(os.path.basename(artifact))[0],
+    ):
+        raise RuntimeError(f"Failed to generate picture {index + 1}!")
+    settings_manager.build_manifest.record(
+        artifact, picture_inputs(settings_manager, prompt)
+    )
+
+
+def render_video(
+    settings_manager: SettingsManager,
+    moviepy_api: "MoviepyAPI",
+    audios: list[str],
+    pictures: list[str],
+    owner: str | None,
+    genre: int | None,
+    num_threads: int,
+    bensound_volume: float | None = None,
+    music: list[dict] | None = None,
+    overlays: list[dict] | None = None,
+    replace: str | None = None,
+) -> str:
+    from src.moviepy_api import SubtitleOptions
+
+    manifest = settings_manager.build_manifest
+    pictures = [
+        picture for picture in pictures if not picture.startswith("pictures/thumbnail")
+    ]
+    inputs = video_inputs(
+        settings_manager, audios, pictures, owner, genre, music, overlays
+    )
+    video_title, video_description, video_hashtags = parse_video_info(
+        read_response(settings_manager, "video_info.txt")
+    )
+    # A video that is replaced stays in place until the new one is rendered
+    render_dir = (
+        os.path.join(settings_manager.build_dir, "video", "render") if replace else None
+    )
+    try:
+        video_path = moviepy_api.generate_video(
+            audio_paths=[manifest.path(audio) for audio in audios],
+            picture_paths=[manifest.path(picture) for picture in pictures],
+            background_music=get_background_music(
+                settings_manager, bensound_volume, music
+            ),
+            overlays=get_overlays(settings_manager, overlays),
+            metadata={
+                "artist": owner,
+                "title": video_title,
+                "description": video_description,
+                "comment": list(video_hashtags),
+                "genre": str(genre),
+            },
+            max_length=MAX_VIDEO_LENGTH,
+            num_threads=num_threads,
+            subtitle_options=SubtitleOptions(
+                font_path=os.path.join(
+                    settings_manager.assets_dir,
+                    "project",
+                    "fonts",
+                    "TheBoldFont.ttf",
+                ),
+                **SUBTITLE_PARAMS,
+            ),
+            output_dir=render_dir,
+        ).video_path
+        if render_dir is not None:
+            rendered_path = video_path
+            video_path = os.path.join(
+                settings_manager.output_dir, os.path.basename(rendered_path)
+            )
+            os.replace(rendered_path, video_path)
+            if os.path.exists(replace) and not os.path.samefile(replace, video_path):
+                os.remove(replace)
+    finally:
+        if render_dir is not None:
+            shutil.rmtree(render_dir, ignore_errors=True)
+    manifest.record("video", inputs, path=video_path)
+    progress.report(
+        "video",
+        session_id=settings_manager.session_id,
+        title=video_title,
+        path=video_path,
+    )
+    return video_title
+
+
+def parse_stage_concurrency(
+    settings_manager: SettingsManager, options: list[str] | None
+) -> dict[str, int]:
+    concurrency = {
+        "script": 1,
+        "media": 1,
+        "render": 1,
+        **(settings_manager.get("pipeline_concurrency", {}) or {}),
+    }
+    for option in options or []:
+        stage, _, workers = option.partition("=")
+        if stage not in concurrency or not workers.isdigit():
+            typer.echo(f"Invalid stage concurrency: {option}")
+            raise typer.Exit(code=1)
+        concurrency[stage] = int(workers)
+    return concurrency
+
+
+def video_pipeline(
+    settings_manager: SettingsManager,
+    concurrency: dict[str, int],
+    queue_size: int,
+    num_threads: int,
+    on_done: Callable[[PipelineJob], None] | None = None,
+) -> Pipeline:
+    # Every video is a dict with its session ID and optional overrides (owner,
+    # voice_id, genre, topic, music, overlays, channel)
+    from src.elevenlabs_api import ElevenLabsAPI
+    from src.fooocus_api import FooocusAPI
+    from src.g4f_api import G4FAPI
+    from src.moviepy_api import MoviepyAPI
+
+    g4f_api = G4FAPI(verbose=is_verbose(), model=LLM_MODEL)
+    elevenlabs_api = ElevenLabsAPI(verbose=is_verbose())
+    fooocus_api = FooocusAPI(verbose=is_verbose())
+    moviepy_api = MoviepyAPI(verbose=is_verbose())
+
+    def write_script(video: dict) -> None:
+        video["paragraphs"] = parse_paragraphs(
+            ask(
+                settings_manager,
+                g4f_api,
+                "video_idea",
+                "voiceover.txt",
+                topic=video.get("topic"),
+            )
+        )
+        video["history"] = g4f_api.conversation()
+
+    def generate_media(video: dict) -> None:
+        # Picture prompts and video info only need the voiceover text, so they
+        # fork the conversation and run alongside the voiceover
+        graph = TaskGraph(
+            limits={
+                "voiceover": int(settings_manager.get("tts_concurrency", 3) or 1),
+                "pictures": 1,
+            }
+        )
+
+        def write_picture_prompts() -> None:
+            fooocus_prompts = parse_lines(
+                ask(
+                    settings_manager,
+                    g4f_api,
+                    "picture_generation",
+                    "pictureprompts.txt",
+                    history=video["history"],
+                )
+            )
+            video["pictures"] = [
+                picture_artifact(index, len(fooocus_prompts))
+                for index in range(len(fooocus_prompts))
+            ]
+            for index, prompt in enumerate(fooocus_prompts):
+                graph.add(
+                    video["pictures"][index],
+                    partial(
+                        generate_picture,
+                        settings_manager,
+                        fooocus_api,
+                        index,
+                        prompt,
+                        len(fooocus_prompts),
+                    ),
+                    deps=("picture_prompts",),
+                    resource="pictures",
+                )
+
+        def write_video_info() -> None:
+            video_title, _, _ = parse_video_info(
+                ask(
+                    settings_manager,
+                    g4f_api,
+                    "video_info",
+                    "video_info.txt",
+                    history=video["history"],
+                )
+            )
+            # Reserve the topic right away so the next script of the batch avoids
+            # it, it's only recorded once the video is rendered
+            settings_manager.topic_history.add(
+                video["session_id"], video_title, pending=True
+            )
+
+        video["audios"] = []
+        for index, paragraph in enumerate(video["paragraphs"]):
+            video["audios"].append(f"audios/{index}.mp3")
+            graph.add(
+                video["audios"][index],
+                partial(
+                    generate_voiceover,
+                    settings_manager,
+                    elevenlabs_api,
+                    index,
+                    paragraph,
+                    video.get("voice_id") or settings_manager.get("voice_id"),
+                ),
+                resource="voiceover",
+            )
+        graph.add("picture_prompts", write_picture_prompts)
+        graph.add("video_info", write_video_info)
+        graph.run()
+        if is_verbose():
+            typer.echo(
+                f"Media generated in {graph.wall_time:.1f}s (critical path: {' -> '.join(task.name for task in graph.critical_path())})."
+            )
+
+    def render(video: dict) -> None:
+        video["title"] = render_video(
+            settings_manager,
+            moviepy_api,
+            video["audios"],
+            video["pictures"],
+            video.get("owner") or settings_manager.get("owner"),
+            video.get("genre") or settings_manager.get("genre", 28),
+            num_threads,
+            music=video.get("music"),
+            overlays=video.get("overlays"),
+        )
+        settings_manager.topic_history.add(video["session_id"], video["title"])
+
+    def in_session(name: str, fn):
+        def run(video: dict) -> dict:
+            channel = video.get("channel", settings_manager.channel)
+            with settings_manager.use_channel(channel), settings_manager.session(
+                video["session_id"]
+            ), progress.stage(video["session_id"], name):
+                try:
+                    fn(video)
+                except BaseException:
+                    settings_manager.topic_history.discard(video["session_id"])
+                    raise
+                finally:
+                    settings_manager.build_manifest.compact()
+            return video
+
+        return run
+
+    return Pipeline(
+        [
+            PipelineStage(name, in_session(name, fn), concurrency=concurrency[name])
+            for name, fn in (
+                ("script", write_script),
+                ("media", generate_media),
+                ("render", render),
+            )
+        ],
+        queue_size=queue_size,
+        on_done=on_done,
+    )
 
 
 @app.command(
@@ -143,15 +854,27 @@ def generate(
         ),
     ] = None,
     genre: Annotated[
-        int,
+        Optional[int],
         typer.Option(
             ...,
             "--genre",
             "-g",
-            help="Specify the [purple]genre[/purple] of the video. :musical_note:",
+            help="Specify the [purple]genre[/purple] of the video (defaults to the channel's genre or 28). :musical_note:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    topic: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--topic",
+            "-to",
+            help="Specify the [purple]topic[/purple] of the video (chosen by the AI by default). :bulb:",
+            show_default=False,
             rich_help_panel="Options: Customization",
         ),
-    ] = 28,
+    ] = None,
     num_threads: Annotated[
         int,
         typer.Option(
@@ -163,148 +886,104 @@ def generate(
             rich_help_panel="Options: Configuration",
         ),
     ] = 4,
+    count: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--count",
+            "-c",
+            min=1,
+            help="Specify the [purple]number of videos[/purple] to generate in one overlapped batch. :repeat:",
+            show_default=True,
+            rich_help_panel="Options: Batch",
+        ),
+    ] = 1,
+    stage_concurrency: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            ...,
+            "--stage-concurrency",
+            "-sc",
+            help="Specify the [purple]number of workers[/purple] of a stage ([italic]script[/italic], [italic]media[/italic] or [italic]render[/italic]), e.g. [italic]media=2[/italic]. :busts_in_silhouette:",
+            show_default=False,
+            rich_help_panel="Options: Batch",
+        ),
+    ] = None,
+    queue_size: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--queue-size",
+            "-qs",
+            min=1,
+            help="Specify the [purple]number of videos[/purple] that may wait between two stages. :inbox_tray:",
+            show_default=True,
+            rich_help_panel="Options: Batch",
+        ),
+    ] = 1,
 ):
+    if temporary and count > 1:
+        typer.echo("Temporary mode can only be used for a single video.")
+        raise typer.Exit(code=1)
+
     settings_manager = SettingsManager(
         session_id=SessionID.TEMP if temporary else SessionID.NONE,
-        verbose=is_verbose,
-    )
-    typer.echo(f"Session UID: {settings_manager.session_id}")
-    g4f_api = G4FAPI(verbose=is_verbose, model="gpt-4o-mini")
-    elevenlabs_api = ElevenLabsAPI(verbose=is_verbose)
-    fooocus_api = FooocusAPI(verbose=is_verbose)
-    prompt_manager = PromptManager()
-    moviepy_api = MoviepyAPI(verbose=is_verbose)
-
-    video_text_paragraphs = g4f_api.get_response(
-        Message(MessageSender.USER, prompt_manager.get_prompt("video_idea")),
-        save_response="voiceover.txt",
-    ).content  # type: ignore
-    video_text_paragraphs = tuple(
-        map(
-            str.strip,
-            [
-                pg.replace("*", "")
-                for pg in video_text_paragraphs.split("\n")
-                if pg and not pg[0].isdigit()
-            ],
-        )
+        verbose=is_verbose(),
     )
-
-    for index, paragraph in enumerate(video_text_paragraphs):
-        if is_verbose:
-            typer.echo(f"{index + 1}. {paragraph}")
-        elevenlabs_api.generate_audio(
-            paragraph,
-            voice_id=voice_id,
-            save_audio=str(index),
+    concurrency = parse_stage_concurrency(settings_manager, stage_concurrency)
+    videos = []
+    for _ in range(count):
+        session_id = settings_manager.resolve_session_id(
+            SessionID.TEMP if temporary else SessionID.NONE
         )
-
-    fooocus_prompts = g4f_api.get_response(
-        Message(MessageSender.USER, prompt_manager.get_prompt("picture_generation")),
-        save_response="pictureprompts.txt",
-    ).content  # type: ignore
-    fooocus_prompts = tuple(
-        map(str.strip, [prompt for prompt in fooocus_prompts.split("\n") if prompt])
-    )
-
-    for index, prompt in enumerate(fooocus_prompts):
-        is_last = index == len(fooocus_prompts) - 1
-        if is_verbose:
-            typer.echo(f"{index + 1}. {prompt}")
-        fooocus_api.generate_picture(
-            prompt,
-            image_type=ImageType.JPEG,
-            resolution=Resolution.RES_768x1344,
-            model=Model("juggernautXL_v8Rundiffusion"),
-            lora_1=LoRa("sd_xl_offset_example-lora_1.0", weight=0.1),
-            upscale_mode=UpscaleMode.X_1_5,
-            save_picture="thumbnail" if is_last else str(index),
+        typer.echo(f"Session UID: {session_id}")
+        progress.report("session", session_id=session_id)
+        videos.append(
+            {
+                "session_id": session_id,
+                "owner": owner,
+                "voice_id": voice_id,
+                "genre": genre,
+                "topic": topic,
+            }
         )
+    pipeline = video_pipeline(settings_manager, concurrency, queue_size, num_threads)
+    jobs = pipeline.run(videos)
+    settings_manager.spawn_garbage_collection()
 
-    video_info = g4f_api.get_response(
-        Message(MessageSender.USER, prompt_manager.get_prompt("video_info")),
-        save_response="video_info.txt",
-    ).content  # type: ignore
-    video_title, video_description, video_hashtags = tuple(
-        map(
-            lambda info: (
-                tuple(
-                    map(
-                        lambda tag: tag.strip().replace("#", ""),
-                        info[1].split(","),
-                    )
-                )
-                if info[0] == 2
-                else info[1].strip()
-            ),
-            enumerate([info for info in video_info.split("\n") if info]),
-        )
-    )
+    if count == 1:
+        if not jobs[0].succeeded:
+            raise jobs[0].error  # type: ignore
+        return
 
-    background_musics = [
-        lambda: BackgroundMusic(
-            r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_1.mp3",
-            volume_factor=0.1,
-            credits="\nSong: Sappheiros - Lights (Vlog No Copyright Music)\nMusic promoted by Vlog No Copyright Music.\nVideo Link: https://youtu.be/kzeQK45StRo\n",
-        ),
-        lambda: BackgroundMusic(
-            r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_2.mp3",
-            volume_factor=0.1,
-            credits="\nSong: Chill Day - LAKEY INSPIRED\nLink: https://soundcloud.com/lakeyinspired/chill-day\nLicense: Creative Commons Attribution-ShareAlike 3.0\nLicense Link: https://creativecommons.org/licenses/by-sa/3.0/\n",
-        ),
-        lambda: BensoundBackgroundMusic(
-            "the lounge",
-            volume_factor=0.2,
-        ),
-    ]
-    background_music = rd.choice(background_musics)()
-    moviepy_api.generate_video(
-        audio_paths=[
-            os.path.join(elevenlabs_api.output_dir, audio)
-            for audio in os.listdir(elevenlabs_api.output_dir)
-        ],
-        picture_paths=[
-            os.path.join(fooocus_api.output_dir, picture)
-            for picture in os.listdir(fooocus_api.output_dir)
-            if not picture.startswith("thumbnail")
-        ],
-        background_music=background_music,
-        overlays=[
-            Overlay(
-                r"D:\Hobbys\YouTube\CurioBurstz\Allgemein\Subscribe-Popup.mov",
-                start_sec=25,
-                size=0.5,
-                rel_position=("center", "top"),
-                is_transparent=True,
-                volume_factor=0.4,
+    for job in jobs:
+        if not job.succeeded:
+            typer.echo(
+                f"Video {job.index + 1} ({job.payload['session_id']}) failed in stage '{job.failed_stage}': {job.error}"
             )
-        ],
-        metadata={
-            "artist": owner,
-            "title": video_title,
-            "description": video_description,  # type: ignore
-            "comment": list(video_hashtags),
-            "genre": str(genre),
-        },
-        max_length=59,
-        num_threads=num_threads,
-        subtitle_options=SubtitleOptions(
-            highlight_color=["yellow", "cyan"],
-            font_path=os.path.join(
-                settings_manager.assets_dir,
-                "project",
-                "fonts",
-                "TheBoldFont.ttf",
-            ),
-            font_size=90,
-            stroke_width=10,
-            rel_height_pos=0.3,
-        ),
+    print_pipeline_report(pipeline)
+
+
+def print_pipeline_report(pipeline: Pipeline) -> None:
+    report = pipeline.report()
+    table = Table(title="Pipeline Report")
+    table.add_column("Stage", style="cyan")
+    table.add_column("Workers", justify="right")
+    table.add_column("Processed", justify="right")
+    table.add_column("Busy (s)", justify="right")
+    table.add_column("Utilization", justify="right")
+    for stage in report["stages"]:
+        table.add_row(
+            stage["name"],
+            str(stage["concurrency"]),
+            str(stage["processed"]),
+            f"{stage['busy_time']:.1f}",
+            f"{stage['utilization']:.0%}",
+        )
+    Console().print(table)
+    typer.echo(
+        f"Generated {report['completed']}/{len(pipeline.jobs)} videos in {report['wall_time']:.1f}s ({report['videos_per_hour']:.2f} videos/hour)."
     )
-    past_topics = settings_manager.get("past_topics", {}) or {}
-    if video_title not in past_topics:  # type: ignore
-        past_topics[settings_manager.session_id] = video_title  # type: ignore
-        settings_manager.set("past_topics", past_topics)
 
 
 @app.command(
@@ -336,22 +1015,23 @@ def regenerate(
         ),
     ] = None,
     genre: Annotated[
-        int,
+        Optional[int],
         typer.Option(
             ...,
             "--genre",
             "-g",
-            help="Specify the [purple]genre[/purple] of the video. :musical_note:",
+            help="Specify the [purple]genre[/purple] of the video (defaults to the channel's genre or 28). :musical_note:",
+            show_default=False,
             rich_help_panel="Options: Customization",
         ),
-    ] = 28,
+    ] = None,
     voice_id: Annotated[
         Optional[str],
         typer.Option(
             ...,
             "--voice-id",
             "-vid",
-            help="Specify the [purple]voice ID[/purple] to use for the voiceover (only applies when the audios weren't generated in the first place). :microphone:",
+            help="Specify the [purple]voice ID[/purple] to use for the voiceover (audios recorded with another voice are regenerated). :microphone:",
             show_default=False,
             rich_help_panel="Options: Customization",
         ),
@@ -367,234 +1047,232 @@ def regenerate(
             rich_help_panel="Options: Configuration",
         ),
     ] = 4,
+    force: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--force",
+            "-f",
+            help="Specify whether or not to [purple]render[/purple] the video even if it is up to date. :hammer:",
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
 ):
-    settings_manager = SettingsManager(
-        session_id=(
-            (SessionID.TEMP if session_id == "temp" else SessionID.explicit(session_id))
-            if session_id
-            else SessionID.LAST
+    session = (
+        (SessionID.TEMP if session_id == "temp" else SessionID.explicit(session_id))
+        if session_id
+        else SessionID.LAST
+    ).copy()
+    settings_manager = SettingsManager(session_id=session, verbose=is_verbose())
+    settings_manager.activate(session)
+    typer.echo(f"Session UID: {settings_manager.session_id}")
+    progress.report("session", session_id=settings_manager.session_id)
+    settings_manager.restore_session(
+        settings_manager.session_id,
+        (
+            "responses/",
+            "audios/",
+            "pictures/",
+            settings_manager.build_manifest.FILE,
+            settings_manager.build_manifest.JOURNAL,
         ),
-        verbose=is_verbose,
     )
-    typer.echo(f"Session UID: {settings_manager.session_id}")
-    elevenlabs_api = ElevenLabsAPI(verbose=is_verbose)
-    fooocus_api = FooocusAPI(verbose=is_verbose)
-    moviepy_api = MoviepyAPI(verbose=is_verbose)
 
-    video_path = settings_manager.get_video_path(
-        settings_manager.session_id, quiet=True
-    )
-    if video_path:
-        os.remove(video_path)
-
-    if not os.path.isfile(
-        os.path.join(settings_manager.build_dir, "responses", "video_info.txt")
-    ) or not (
-        os.path.isfile(
-            os.path.join(settings_manager.build_dir, "responses", "pictureprompts.txt")
-        )
-        and os.listdir(fooocus_api.output_dir)
-    ):
-        try:
-            with open(
-                os.path.join(settings_manager.build_dir, "responses", "voiceover.txt"),
-                "r",
-                encoding="utf-8",
-            ) as f:
-                voiceover = "\n".join(
-                    [
-                        line.strip()
-                        for line in f.readlines()
-                        if line and not line[0].isdigit()
-                    ]
+    import captametropolis
+
+    from src.elevenlabs_api import ElevenLabsAPI
+    from src.fooocus_api import FooocusAPI
+    from src.g4f_api import G4FAPI, Message, MessageSender
+    from src.moviepy_api import MoviepyAPI
+
+    elevenlabs_api = ElevenLabsAPI(verbose=is_verbose())
+    fooocus_api = FooocusAPI(verbose=is_verbose())
+    moviepy_api = MoviepyAPI(verbose=is_verbose())
+    manifest = settings_manager.build_manifest
+
+    audio_files = list_outputs(elevenlabs_api.output_dir)
+    if not os.path.isfile(manifest.path("responses/voiceover.txt")):
+        if not audio_files:
+            typer.echo("No voiceover found.")
+            raise typer.Exit(code=1)
+
+        temp_voiceover = manifest.path("responses/.voiceover.txt.tmp")
+        os.makedirs(os.path.dirname(temp_voiceover), exist_ok=True)
+        with open(temp_voiceover, "w", encoding="utf-8") as f:
+            for audio in audio_files:
+                segments = captametropolis.transcriber.transcribe_locally(
+                    os.path.join(elevenlabs_api.output_dir, audio)
                 )
-        except FileNotFoundError:
-            if not os.listdir(elevenlabs_api.output_dir):
-                typer.echo("No voiceover found.")
-                raise typer.Exit(code=1)
-
-            voiceover = ""
-            with open(
-                os.path.join(settings_manager.build_dir, "responses", "voiceover.txt"),
-                "w",
-                encoding="utf-8",
-            ) as f:
-                for audio in os.listdir(elevenlabs_api.output_dir):
-                    segments = captametropolis.transcriber.transcribe_locally(
-                        os.path.join(elevenlabs_api.output_dir, audio)
-                    )
-                    for segment in segments:
-                        f.write(segment["text"] + "\n")  # type: ignore
-                        voiceover += segment["text"] + "\n"  # type: ignore
-
-        voiceover = voiceover.strip().replace("*", "")
-        g4f_api = G4FAPI(verbose=is_verbose, model="gpt-4o-mini")
-        prompt_manager = PromptManager()
-        g4f_api.add_message(
-            Message(MessageSender.USER, prompt_manager.get_prompt("video_idea")),
+                for segment in segments:
+                    f.write(segment["text"] + "\n")  # type: ignore
+        os.replace(temp_voiceover, manifest.path("responses/voiceover.txt"))
+        manifest.record(
+            "responses/voiceover.txt", manifest.hash_inputs(transcribed=audio_files)
         )
-        g4f_api.add_message(Message(MessageSender.ASSISTANT, voiceover))
-        if is_verbose:
-            typer.echo(voiceover)
-        if not os.path.isfile(
-            os.path.join(settings_manager.build_dir, "responses", "pictureprompts.txt")
-        ) or not os.listdir(fooocus_api.output_dir):
-            fooocus_prompts = g4f_api.get_response(
-                Message(
-                    MessageSender.USER, prompt_manager.get_prompt("picture_generation")
+
+    # The segments of a transcript don't match the paragraphs the audios were made
+    # from, so the audios are kept as they are until the voiceover is edited
+    transcript = manifest.artifacts.get("responses/voiceover.txt") or {}
+    transcribed = transcript.get("inputs") == manifest.hash_inputs(
+        transcribed=audio_files
+    ) and transcript.get("digest") == manifest.digest("responses/voiceover.txt")
+
+    paragraphs = parse_paragraphs(read_response(settings_manager, "voiceover.txt"))
+    if is_verbose():
+        typer.echo("\n".join(paragraphs))
+    g4f_api = G4FAPI(verbose=is_verbose(), model=LLM_MODEL)
+    history = [
+        Message(MessageSender.USER, PromptManager().get_prompt("video_idea")).to_dict(),
+        Message(MessageSender.ASSISTANT, "\n".join(paragraphs)).to_dict(),
+    ]
+
+    # Only artifacts whose inputs changed are rebuilt, their dependents follow
+    # because their inputs contain the digests of what they are built from
+    graph = TaskGraph(
+        limits={
+            "voiceover": int(settings_manager.get("tts_concurrency", 3) or 1),
+            "pictures": 1,
+        }
+    )
+    voice_id = voice_id or settings_manager.get("voice_id")
+    audios = (
+        [f"audios/{file}" for file in audio_files]
+        if transcribed
+        else [f"audios/{index}.mp3" for index in range(len(paragraphs))]
+    )
+    for index, paragraph in enumerate(() if transcribed else paragraphs):
+        if not manifest.is_fresh(
+            audios[index], voiceover_inputs(settings_manager, paragraph, voice_id)
+        ):
+            graph.add(
+                audios[index],
+                partial(
+                    generate_voiceover,
+                    settings_manager,
+                    elevenlabs_api,
+                    index,
+                    paragraph,
+                    voice_id,
                 ),
-                save_response="pictureprompts.txt",
-            ).content  # type: ignore
-            fooocus_prompts = tuple(
-                map(
-                    str.strip,
-                    [prompt for prompt in fooocus_prompts.split("\n") if prompt],
-                )
+                resource="voiceover",
             )
 
-            for index, prompt in enumerate(fooocus_prompts):
-                is_last = index == len(fooocus_prompts) - 1
-                if is_verbose:
-                    typer.echo(f"{index + 1}. {prompt}")
-                fooocus_api.generate_picture(
-                    prompt,
-                    image_type=ImageType.JPEG,
-                    resolution=Resolution.RES_768x1344,
-                    model=Model("juggernautXL_v8Rundiffusion"),
-                    lora_1=LoRa("sd_xl_offset_example-lora_1.0", weight=0.1),
-                    upscale_mode=UpscaleMode.X_1_5,
-                    save_picture="thumbnail" if is_last else str(index),
-                )
-        video_info = g4f_api.get_response(
-            Message(MessageSender.USER, prompt_manager.get_prompt("video_info")),
-            save_response="video_info.txt",
-        ).content  # type: ignore
-
-        video_title, video_description, video_hashtags = tuple(
-            map(
-                lambda info: (
-                    tuple(
-                        map(
-                            lambda tag: tag.strip().replace("#", ""),
-                            info[1].split(","),
-                        )
-                    )
-                    if info[0] == 2
-                    else info[1].strip()
-                ),
-                enumerate([info for info in video_info.split("\n") if info]),
-            )
-        )
-    else:
-        with open(
-            os.path.join(settings_manager.build_dir, "responses", "video_info.txt"),
-            "r",
-            encoding="utf-8",
-        ) as f:
-            video_info = [line for line in f.readlines() if line.strip()]
-        video_title, video_description, video_hashtags = tuple(
-            map(
-                lambda info: (
-                    tuple(
-                        map(
-                            lambda tag: tag.strip().replace("#", ""),
-                            info[1].split(","),
-                        )
-                    )
-                    if info[0] == 2
-                    else info[1].strip()
-                ),
-                enumerate(video_info),
+    pictures: list[str] = []
+
+    def plan_pictures() -> None:
+        if not manifest.is_fresh(
+            "responses/pictureprompts.txt",
+            response_inputs(settings_manager, "picture_generation"),
+        ):
+            ask(
+                settings_manager,
+                g4f_api,
+                "picture_generation",
+                "pictureprompts.txt",
+                history=history,
             )
+
+        fooocus_prompts = parse_lines(
+            read_response(settings_manager, "pictureprompts.txt")
         )
+        for index, prompt in enumerate(fooocus_prompts):
+            pictures.append(picture_artifact(index, len(fooocus_prompts)))
+            if not manifest.is_fresh(
+                pictures[index], picture_inputs(settings_manager, prompt)
+            ):
+                graph.add(
+                    pictures[index],
+                    partial(
+                        generate_picture,
+                        settings_manager,
+                        fooocus_api,
+                        index,
+                        prompt,
+                        len(fooocus_prompts),
+                    ),
+                    deps=("picture_prompts",),
+                    resource="pictures",
+                )
 
-    if not os.listdir(elevenlabs_api.output_dir):
-        with open(
-            os.path.join(settings_manager.build_dir, "responses", "voiceover.txt"),
-            "r",
-            encoding="utf-8",
-        ) as f:
-            voiceover = "\n".join(
-                [
-                    line.strip()
-                    for line in f.readlines()
-                    if line and not line[0].isdigit()
-                ]
-            )
-        voiceover = voiceover.strip().replace("*", "")
-        for index, paragraph in enumerate(voiceover.split("\n")):
-            if is_verbose:
-                typer.echo(f"{index + 1}. {paragraph}")
-            elevenlabs_api.generate_audio(
-                paragraph,
-                voice_id=voice_id,
-                save_audio=str(index),
+    def plan_video_info() -> None:
+        if not manifest.is_fresh(
+            "responses/video_info.txt",
+            response_inputs(settings_manager, "video_info"),
+        ):
+            ask(
+                settings_manager,
+                g4f_api,
+                "video_info",
+                "video_info.txt",
+                history=history,
             )
 
-    background_musics = [
-        lambda: BackgroundMusic(
-            r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_1.mp3",
-            volume_factor=0.1,
-            credits="\nSong: Sappheiros - Lights (Vlog No Copyright Music)\nMusic promoted by Vlog No Copyright Music.\nVideo Link: https://youtu.be/kzeQK45StRo\n",
-        ),
-        lambda: BackgroundMusic(
-            r"D:\Hobbys\YouTube\CurioBurstz\Assets\background_music_2.mp3",
-            volume_factor=0.1,
-            credits="\nSong: Chill Day - LAKEY INSPIRED\nLink: https://soundcloud.com/lakeyinspired/chill-day\nLicense: Creative Commons Attribution-ShareAlike 3.0\nLicense Link: https://creativecommons.org/licenses/by-sa/3.0/\n",
-        ),
-        lambda: BensoundBackgroundMusic(
-            "the lounge",
-            volume_factor=0.3,
-        ),
+    graph.add("picture_prompts", plan_pictures)
+    graph.add("video_info", plan_video_info)
+    with progress.stage(settings_manager.session_id, "media"):
+        graph.run()
+    rebuilt = [
+        task.name
+        for task in graph.tasks
+        if task.name.startswith(("audios/", "pictures/"))
     ]
-    background_music = rd.choice(background_musics)()
-    moviepy_api.generate_video(
-        audio_paths=[
-            os.path.join(elevenlabs_api.output_dir, audio)
-            for audio in os.listdir(elevenlabs_api.output_dir)
-        ],
-        picture_paths=[
-            os.path.join(fooocus_api.output_dir, picture)
-            for picture in os.listdir(fooocus_api.output_dir)
-            if not picture.startswith("thumbnail")
-        ],
-        background_music=background_music,
-        overlays=[
-            Overlay(
-                r"D:\Hobbys\YouTube\CurioBurstz\Allgemein\Subscribe-Popup.mov",
-                start_sec=25,
-                size=0.5,
-                rel_position=("center", "top"),
-                is_transparent=True,
-                volume_factor=0.4,
-            )
-        ],
-        metadata={
-            "artist": owner,
-            "title": video_title,
-            "description": video_description,  # type: ignore
-            "comment": list(video_hashtags),
-            "genre": str(genre),
-        },
-        max_length=59,
-        num_threads=num_threads,
-        subtitle_options=SubtitleOptions(
-            highlight_color=["yellow", "cyan"],
-            font_path=os.path.join(
-                settings_manager.assets_dir,
-                "project",
-                "fonts",
-                "TheBoldFont.ttf",
-            ),
-            font_size=90,
-            stroke_width=10,
-            rel_height_pos=0.3,
-        ),
+    if is_verbose() and rebuilt:
+        typer.echo(f"Rebuilt: {', '.join(rebuilt)}")
+
+    # Drop audios and pictures left over from a longer voiceover or prompt list
+    # and partial files of an interrupted build
+    for output_dir, expected in (
+        (elevenlabs_api.output_dir, audios),
+        (fooocus_api.output_dir, pictures),
+    ):
+        for file in os.listdir(output_dir):
+            artifact = f"{os.path.basename(output_dir)}/{file}"
+            if artifact not in expected:
+                os.remove(manifest.path(artifact))
+                manifest.forget(artifact)
+    manifest.compact()
+
+    owner = owner or settings_manager.get("owner")
+    genre = genre or settings_manager.get("genre", 28)
+    video_path = settings_manager.get_video_path(
+        settings_manager.session_id, quiet=True
     )
-    past_topics = settings_manager.get("past_topics", {}) or {}
-    if video_title not in past_topics:  # type: ignore
-        past_topics[settings_manager.session_id] = video_title  # type: ignore
-        settings_manager.set("past_topics", past_topics)
+    if (
+        video_path
+        and not force
+        and manifest.is_fresh(
+            "video",
+            video_inputs(
+                settings_manager,
+                audios,
+                [
+                    picture
+                    for picture in pictures
+                    if not picture.startswith("pictures/thumbnail")
+                ],
+                owner,
+                genre,
+            ),
+            path=video_path,
+            adopt=False,
+        )
+    ):
+        typer.echo("The video is already up to date.")
+        return
+
+    with progress.stage(settings_manager.session_id, "render"):
+        video_title = render_video(
+            settings_manager,
+            moviepy_api,
+            audios,
+            pictures,
+            owner,
+            genre,
+            num_threads,
+            bensound_volume=0.3,
+            replace=video_path,
+        )
+    settings_manager.topic_history.add(settings_manager.session_id, video_title)
 
 
 @app.command(
@@ -650,6 +1328,7 @@ def upload(
             ...,
             "--thumbnail-path",
             "-tp",
+            callback=resolve_client_path,
             help="Specify the [purple]thumbnail path[/purple] to use for the video. :frame_photo:",
             show_default=False,
             rich_help_panel="Options: Configuration",
@@ -664,8 +1343,10 @@ def upload(
         typer.echo("The thumbnail path does not exist.")
         raise typer.Exit(code=1)
 
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
-    upload_api = UploadAPI(verbose=is_verbose)
+    from src.upload_api import UploadAPI
+
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    upload_api = UploadAPI(verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -675,7 +1356,13 @@ def upload(
         )
         raise typer.Exit(code=1)
     typer.echo(f"Session UID: {session_id}")
-    result = upload_api.upload(session_id, youtube, instagram, tiktok, thumbnail_path)
+    progress.report("session", session_id=session_id)
+    settings_manager.lease(session_id)
+    settings_manager.restore_session(session_id, ("pictures/thumbnail",))
+    with progress.stage(session_id, "upload"):
+        result = upload_api.upload(
+            session_id, youtube, instagram, tiktok, thumbnail_path
+        )
     if not result:
         typer.echo("Failed to upload the video.")
         raise typer.Exit(code=1)
@@ -700,7 +1387,7 @@ def inspect(
         ),
     ] = None,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -741,6 +1428,40 @@ def list_topics(
             rich_help_panel="Options: Customization",
         ),
     ] = False,
+    prefix: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--prefix",
+            "-p",
+            help="Specify the [purple]prefix[/purple] the video topics have to start with [italic](case insensitive)[/italic]. :mag:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    limit: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--limit",
+            "-l",
+            help="Specify the [purple]maximum number[/purple] of video topics to show. :1234:",
+            show_default=False,
+            min=0,
+            rich_help_panel="Options: Paging",
+        ),
+    ] = None,
+    offset: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--offset",
+            "-of",
+            help="Specify the [purple]number[/purple] of video topics to skip. :fast_forward:",
+            min=0,
+            rich_help_panel="Options: Paging",
+        ),
+    ] = 0,
 ):
     topic_filter = (
         tuple(
@@ -753,19 +1474,32 @@ def list_topics(
         if filter_keywords
         else None
     )
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
-    past_topics = list(settings_manager.get("past_topics", {}).values() or [])  # type: ignore
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     filter_method = all if enforce else any
-    for index, topic in enumerate(past_topics):
+    topics = (
+        settings_manager.topic_history.iter(prefix=prefix)
+        if topic_filter
+        else settings_manager.topic_history.page(limit, offset, prefix=prefix)
+    )
+
+    shown = 0
+    for index, (_, topic) in enumerate(topics, start=0 if topic_filter else offset):
         if topic_filter:
-            if filter_method(
+            if not filter_method(
                 keyword.lower() in topic.lower() for keyword in topic_filter
             ):
-                typer.echo(f"{index + 1}. {topic}")
+                continue
+            shown += 1
+            if shown <= offset:
+                continue
+            if limit is not None and shown > offset + limit:
+                break
         else:
-            typer.echo(f"{index + 1}. {topic}")
+            shown += 1
+
+        typer.echo(f"{index + 1}. {topic}")
 
-    if not past_topics:
+    if not shown:
         typer.echo("No video topics found.")
         raise typer.Exit(code=1)
 
@@ -786,18 +1520,16 @@ def delete_topic(
         ),
     ],
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
-    past_topics = settings_manager.get("past_topics", {}) or {}
-    assert isinstance(past_topics, dict)
-    if not past_topics:
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    if not settings_manager.topic_history.count():
         typer.echo("No video topics found.")
         raise typer.Exit(code=1)
-    if not 0 <= topic_index < len(past_topics):
+
+    deleted = settings_manager.topic_history.remove_at(topic_index)
+    if deleted is None:
         typer.echo("Invalid topic index.")
         raise typer.Exit(code=1)
-    topic = past_topics.pop(list(past_topics.keys())[topic_index])
-    settings_manager.set("past_topics", past_topics)
-    typer.echo(f"Deleted video topic: {topic}")
+    typer.echo(f"Deleted video topic: {deleted[1]}")
 
 
 @build_app.command(
@@ -829,7 +1561,7 @@ def open_build_dir(
         ),
     ] = None,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -863,7 +1595,7 @@ def list_build_dir(
         ),
     ] = None,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -913,7 +1645,7 @@ def delete_build_dir(
         ),
     ] = None,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -931,9 +1663,85 @@ def delete_build_dir(
             os.remove(path_to_delete)
         else:
             shutil.rmtree(path_to_delete)
+    if path_to_delete == settings_manager.build_dir_for_session(session_id):
+        # The collector must not keep tracking a build that is gone
+        settings_manager.build_collector.release(session_id)
+        settings_manager.build_collector.forget(session_id)
     typer.echo("Deleted video build directory.")
 
 
+@build_app.command(
+    name="gc, collect",
+    help="[purple]Evict[/purple] the least recently used [bold cyan]beautiful[/bold cyan] video build directories. :broom:",
+    rich_help_panel="Video: Management",
+)
+def collect_build_dirs(
+    max_size_gb: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            "--max-size-gb",
+            "-ms",
+            help="Specify the [purple]maximum total size[/purple] of all build directories in GB [italic](defaults to the 'gc_max_build_size_gb' setting)[/italic]. :floppy_disk:",
+            show_default=False,
+            min=0,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    max_age_days: Annotated[
+        Optional[float],
+        typer.Option(
+            ...,
+            "--max-age-days",
+            "-ma",
+            help="Specify the [purple]maximum age[/purple] since the last access in days [italic](defaults to the 'gc_max_age_days' setting)[/italic]. :hourglass:",
+            show_default=False,
+            min=0,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    archive: Annotated[
+        Optional[bool],
+        typer.Option(
+            ...,
+            "--archive/--delete",
+            help="Specify whether to [purple]archive[/purple] or delete evicted build directories [italic](defaults to the 'gc_mode' setting)[/italic]. :package:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    dry_run: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--dry-run",
+            "-dr",
+            help="Specify whether or not to only show the build directories that would be evicted. :eyes:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = False,
+):
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    evicted = settings_manager.collect_garbage(
+        max_size_gb=max_size_gb,
+        max_age_days=max_age_days,
+        archive=archive,
+        dry_run=dry_run,
+    )
+    for entry in evicted:
+        typer.echo(
+            f"{'Would evict' if dry_run else 'Evicted'}: {entry['session_id']} ({entry['size'] / 1024**2:.1f} MB)"
+        )
+    typer.echo(
+        f"{len(evicted)} build directories, {sum(entry['size'] for entry in evicted) / 1024**2:.1f} MB {'to free' if dry_run else 'freed'}."
+    )
+    blobs, blob_size = settings_manager.blob_store.collect(dry_run=dry_run)
+    typer.echo(
+        f"{blobs} unreferenced blobs, {blob_size / 1024**2:.1f} MB {'to free' if dry_run else 'freed'}."
+    )
+
+
 @build_app.command(
     name="sessions",
     help="[purple]List[/purple] the [bold cyan]beautiful[/bold cyan] video sessions. :scroll:",
@@ -951,6 +1759,17 @@ def sessions(
             rich_help_panel="Options: Customization",
         ),
     ] = False,
+    titles_only: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--titles-only",
+            "-to",
+            help="Specify whether or not to show only the session IDs and titles [italic](without reading any video files)[/italic]. :memo:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = False,
     last_only: Annotated[
         bool,
         typer.Option(
@@ -962,20 +1781,98 @@ def sessions(
             rich_help_panel="Options: Customization",
         ),
     ] = False,
+    limit: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--limit",
+            "-l",
+            help="Specify the [purple]maximum number[/purple] of sessions to show. :1234:",
+            show_default=False,
+            min=0,
+            rich_help_panel="Options: Paging",
+        ),
+    ] = None,
+    offset: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--offset",
+            "-of",
+            help="Specify the [purple]number[/purple] of sessions to skip. :fast_forward:",
+            min=0,
+            rich_help_panel="Options: Paging",
+        ),
+    ] = 0,
+    json_output: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--json",
+            "-j",
+            help="Specify whether or not to output the sessions as [italic]JSON lines[/italic]. :page_facing_up:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = False,
+    num_workers: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--num-workers",
+            "-nw",
+            help="Specify the [purple]number of workers[/purple] used to read the video metadata. :gear:",
+            min=1,
+            rich_help_panel="Options: Performance",
+        ),
+    ] = 8,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
-    sessions = settings_manager.get_sessions()
-    typer.echo(
-        f"Total Sessions: {len(sessions)}\n" if not last_only else "Last Session:\n"
-    )
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    if last_only:
+        last_session_id = settings_manager.last_session_id
+        sessions = [
+            session
+            for session in settings_manager.get_sessions()
+            if session.id.value == last_session_id
+        ]
+    else:
+        sessions = settings_manager.get_sessions(limit=limit, offset=offset)
 
-    if ids_only:
-        if last_only:
-            typer.echo(settings_manager.last_session_id)
-            return
+    if not json_output:
+        typer.echo(
+            f"Total Sessions: {settings_manager.topic_history.count()}\n"
+            if not last_only
+            else "Last Session:\n"
+        )
 
+    if ids_only or titles_only:
         for index, session in enumerate(sessions):
-            typer.echo(f"{index + 1}. {session.id.value}")
+            if json_output:
+                typer.echo(
+                    json.dumps(
+                        session.to_dict(brief=True)
+                        if titles_only
+                        else {"session_id": session.id.value}
+                    )
+                )
+            elif titles_only:
+                typer.echo(
+                    f"{offset + index + 1}. {session.id.value}: {session.video_title}"
+                )
+            else:
+                typer.echo(f"{offset + index + 1}. {session.id.value}")
+        return
+
+    results = settings_manager.load_sessions(sessions, max_workers=num_workers)
+    if json_output:
+        for session, error in results:
+            typer.echo(
+                json.dumps(
+                    session.to_dict()
+                    if error is None
+                    else {"session_id": session.id.value, "error": str(error)}
+                )
+            )
         return
 
     console = Console()
@@ -990,23 +1887,30 @@ def sessions(
     table.add_column("Genre", style="purple")
     table.add_column("Copyright", style="orange1")
     table.add_column("Credits", style="cyan")
-    for session in sessions:
-        if last_only and session.id.value != settings_manager.last_session_id:
-            continue
-
-        table.add_row(
-            session.id.value,
-            session.video_owner,
-            str(session.video_date),
-            str(session.video_duration),
-            session.video_title,
-            session.video_description,
-            ",".join(session.video_tags),
-            str(session.video_genre),
-            session.video_copyright,
-            session.video_credits.strip(),
-        )
-    console.print(table)
+    with Live(table, console=console, vertical_overflow="visible"):
+        for session, error in results:
+            if error is not None:
+                table.add_row(
+                    session.id.value,
+                    *["Unknown"] * 3,
+                    session.video_title,
+                    f"[red]{error}[/red]",
+                    *["Unknown"] * 4,
+                )
+                continue
+
+            table.add_row(
+                session.id.value,
+                session.video_owner,
+                str(session.video_date),
+                str(session.video_duration),
+                session.video_title,
+                session.video_description,
+                ",".join(session.video_tags),
+                str(session.video_genre),
+                session.video_copyright,
+                session.video_credits.strip(),
+            )
 
 
 @app.command(
@@ -1025,8 +1929,7 @@ def hashtags(
         ),
     ],
 ):
-    upload_api = UploadAPI(verbose=is_verbose)
-    hashtags = upload_api.generate_hashtags(keywords.split(","))
+    hashtags = generate_hashtags(keywords.split(","))
     typer.echo(f'\n{" ".join(hashtags)}')
 
 
@@ -1048,7 +1951,7 @@ def show(
         ),
     ] = None,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     session_id = session_id or settings_manager.last_session_id
     if not session_id or not settings_manager.session_exists(
         SessionID.explicit(session_id)
@@ -1068,9 +1971,11 @@ def show(
     rich_help_panel="Settings: Information",
 )
 def show_settings():
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     typer.echo("Settings:\n")
     typer.echo(json.dumps(settings_manager.config, indent=4))
+    if settings_manager.channels:
+        typer.echo(f"\nChannels: {', '.join(settings_manager.channels)}")
 
 
 @settings_app.command(
@@ -1109,9 +2014,9 @@ def set_settings(
         ),
     ] = False,
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     settings_manager.set(key=key, value=value, encrypt=encrypt)
-    if is_verbose:
+    if is_verbose():
         typer.echo(f"Set key '{key}' to value '{value}'.")
 
 
@@ -1131,9 +2036,9 @@ def delete_settings(
         ),
     ],
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     settings_manager.delete(key=key)
-    if is_verbose:
+    if is_verbose():
         typer.echo(f"Deleted key '{key}'.")
 
 
@@ -1153,10 +2058,705 @@ def get_settings(
         ),
     ],
 ):
-    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose)
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
     value = settings_manager.get(key=key)
     typer.echo(f"Value for key '{key}': {value}")
 
 
+@farm_app.command(
+    name="submit, add",
+    help="[purple]Submit[/purple] [bold cyan]beautiful[/bold cyan] video jobs to the render farm. :inbox_tray:",
+    rich_help_panel="Farm: Management",
+)
+def farm_submit(
+    count: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--count",
+            "-c",
+            min=1,
+            help="Specify the [purple]number of videos[/purple] to submit (per topic). :repeat:",
+            show_default=True,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = 1,
+    topics: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            ...,
+            "--topic",
+            "-to",
+            help="Specify the [purple]topic[/purple] of the videos (can be passed multiple times). :bulb:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    owner: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--owner",
+            "-o",
+            help="Specify the [purple]owner[/purple] of the videos. :bust_in_silhouette:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    voice_id: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--voice-id",
+            "-vid",
+            help="Specify the [purple]voice ID[/purple] to use for the voiceovers. :microphone:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    genre: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--genre",
+            "-g",
+            help="Specify the [purple]genre[/purple] of the videos. :musical_note:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    music: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--music",
+            "-m",
+            help="Specify the [purple]background music[/purple] as a JSON list (defaults to the channel's assets). :notes:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    overlays: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--overlays",
+            "-ov",
+            help="Specify the [purple]overlays[/purple] as a JSON list (defaults to the channel's assets). :framed_picture:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = None,
+    queue_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--queue-dir",
+            "-qd",
+            callback=resolve_client_path,
+            help="Specify the shared [purple]queue directory[/purple] (defaults to the [italic]farm_dir[/italic] setting). :file_folder:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+):
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    try:
+        assets = {
+            key: json.loads(value)
+            for key, value in (("music", music), ("overlays", overlays))
+            if value is not None
+        }
+    except json.JSONDecodeError as e:
+        typer.echo(f"Invalid JSON: {e}")
+        raise typer.Exit(code=1)
+
+    job_queue = settings_manager.job_queue(queue_dir)
+    max_pending = settings_manager.get("farm_max_pending", None)
+    for topic in topics or [None]:
+        for _ in range(count):
+            try:
+                job_id = job_queue.submit(
+                    {
+                        "topic": topic,
+                        "owner": owner,
+                        "voice_id": voice_id,
+                        "genre": genre,
+                        "channel": settings_manager.channel,
+                        **assets,
+                    },
+                    max_pending=int(max_pending) if max_pending else None,
+                )
+            except QueueFullError as e:
+                typer.echo(e.message)
+                raise typer.Exit(code=1)
+            typer.echo(f"Job ID: {job_id}")
+
+
+@farm_app.command(
+    name="worker, work",
+    help="[purple]Render[/purple] [bold cyan]beautiful[/bold cyan] videos from the render farm queue. :construction_worker:",
+    rich_help_panel="Farm: Management",
+)
+def farm_worker(
+    num_threads: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--num-threads",
+            "-nt",
+            help="Specify the [purple]number of threads[/purple] to use for video generation. :thread:",
+            show_default=True,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = 4,
+    stage_concurrency: Annotated[
+        Optional[list[str]],
+        typer.Option(
+            ...,
+            "--stage-concurrency",
+            "-sc",
+            help="Specify the [purple]number of workers[/purple] of a stage ([italic]script[/italic], [italic]media[/italic] or [italic]render[/italic]), e.g. [italic]media=2[/italic]. :busts_in_silhouette:",
+            show_default=False,
+            rich_help_panel="Options: Batch",
+        ),
+    ] = None,
+    queue_size: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--queue-size",
+            "-qs",
+            min=1,
+            help="Specify the [purple]number of videos[/purple] that may wait between two stages. :inbox_tray:",
+            show_default=True,
+            rich_help_panel="Options: Batch",
+        ),
+    ] = 1,
+    max_jobs: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--max-jobs",
+            "-mj",
+            min=1,
+            help="Specify the [purple]number of jobs[/purple] after which the worker stops. :stop_sign:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+    drain: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--drain",
+            "-d",
+            help="Specify whether or not to stop once the [purple]queue is empty[/purple]. :checkered_flag:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
+    poll_interval: Annotated[
+        float,
+        typer.Option(
+            ...,
+            "--poll-interval",
+            "-pi",
+            min=0.1,
+            help="Specify how many [purple]seconds[/purple] to wait before polling an empty queue again. :hourglass:",
+            show_default=True,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = 5,
+    queue_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--queue-dir",
+            "-qd",
+            callback=resolve_client_path,
+            help="Specify the shared [purple]queue directory[/purple] (defaults to the [italic]farm_dir[/italic] setting). :file_folder:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+):
+    settings_manager = SettingsManager(session_id=SessionID.NONE, verbose=is_verbose())
+    concurrency = parse_stage_concurrency(settings_manager, stage_concurrency)
+    job_queue = settings_manager.job_queue(queue_dir)
+    worker_id = job_queue.worker_id()
+    held: dict[str, dict] = {}
+    lock = threading.Lock()
+    stopped = threading.Event()
+    typer.echo(f"Worker ID: {worker_id}")
+
+    def heartbeat() -> None:
+        while not stopped.wait(job_queue.lease_seconds / 4):
+            with lock:
+                job_ids = list(held)
+            for job_id in job_ids:
+                if not job_queue.heartbeat(job_id, worker_id):
+                    typer.echo(f"Lost the lease of job {job_id}.")
+
+    def claim_videos():
+        # The pipeline pulls the next job only once its first stage has room
+        claimed = 0
+        while max_jobs is None or claimed < max_jobs:
+            job = job_queue.claim(worker_id)
+            if job is None:
+                if drain:
+                    return
+                time.sleep(poll_interval)
+                continue
+
+            claimed += 1
+            session_id = settings_manager.resolve_session_id(SessionID.NONE)
+            typer.echo(
+                f"Job {job['id']} (attempt {job['attempts']}): Session UID: {session_id}"
+            )
+            with lock:
+                held[job["id"]] = job
+            yield {**job["spec"], "session_id": session_id, "job_id": job["id"]}
+
+    def publish(video: dict) -> dict:
+        video_path = settings_manager.get_video_path(video["session_id"])
+        output_dir = os.path.join(job_queue.outputs_dir, video["job_id"])
+        output_path = os.path.join(output_dir, os.path.basename(video_path))  # type: ignore
+        os.makedirs(output_dir, exist_ok=True)
+        temp_file = os.path.join(output_dir, f".{os.path.basename(output_path)}.tmp")
+        shutil.copyfile(video_path, temp_file)  # type: ignore
+        os.replace(temp_file, output_path)
+        return {
+            "session_id": video["session_id"],
+            "title": video.get("title"),
+            "video_path": output_path,
+            "worker": worker_id,
+        }
+
+    def finish(job: PipelineJob) -> None:
+        video = job.payload
+        try:
+            if not job.succeeded:
+                raise RuntimeError(f"Stage '{job.failed_stage}' failed: {job.error}")
+            result = publish(video)
+            if job_queue.complete(video["job_id"], worker_id, result):
+                typer.echo(f"Job {video['job_id']} done: {result['video_path']}")
+                return
+        except Exception as e:
+            if job_queue.fail(video["job_id"], worker_id, str(e)):
+                typer.echo(f"Job {video['job_id']} failed: {e}")
+                return
+        finally:
+            with lock:
+                held.pop(video["job_id"], None)
+        typer.echo(f"Job {video['job_id']} was taken over by another worker.")
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    pipeline = video_pipeline(
+        settings_manager, concurrency, queue_size, num_threads, on_done=finish
+    )
+    try:
+        pipeline.run(claim_videos())
+    except KeyboardInterrupt:
+        with lock:
+            job_ids = list(held)
+        for job_id in job_ids:
+            job_queue.release(job_id, worker_id)
+        typer.echo(f"Released {len(job_ids)} unfinished job(s).")
+        raise typer.Exit(code=1)
+    finally:
+        stopped.set()
+
+    settings_manager.spawn_garbage_collection()
+    if pipeline.jobs:
+        print_pipeline_report(pipeline)
+    else:
+        typer.echo("No jobs found.")
+
+
+@farm_app.command(
+    name="status, list",
+    help="[purple]Show[/purple] the [bold cyan]render farm[/bold cyan] queue. :bar_chart:",
+    rich_help_panel="Farm: Information",
+)
+def farm_status(
+    show_all: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--all",
+            "-a",
+            help="Specify whether or not to include the [purple]finished[/purple] jobs. :white_check_mark:",
+            show_default=False,
+            rich_help_panel="Options: Customization",
+        ),
+    ] = False,
+    queue_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--queue-dir",
+            "-qd",
+            callback=resolve_client_path,
+            help="Specify the shared [purple]queue directory[/purple] (defaults to the [italic]farm_dir[/italic] setting). :file_folder:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+):
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    job_queue = settings_manager.job_queue(queue_dir)
+    job_queue.reap(job_queue.worker_id())
+    typer.echo(
+        " | ".join(
+            f"{state.capitalize()}: {count}"
+            for state, count in job_queue.counts().items()
+        )
+    )
+
+    table = Table(title="Render Farm")
+    table.add_column("Job ID", style="cyan")
+    table.add_column("State", style="magenta")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Worker", style="green")
+    table.add_column("Topic")
+    table.add_column("Result", style="yellow")
+    for job in job_queue.jobs():
+        if job["state"] == "done" and not show_all:
+            continue
+        table.add_row(
+            job["id"],
+            job["state"],
+            str(job["attempts"]),
+            job.get("worker") or "-",
+            job["spec"].get("topic") or "-",
+            (job.get("result") or {}).get("video_path") or job.get("error") or "-",
+        )
+    Console().print(table)
+
+
+def daemon_status() -> dict | None:
+    try:
+        return daemon.request("status")
+    except (OSError, ValueError):
+        return None
+
+
+def run_daemon_job(argv: list[str]) -> int:
+    # Every job gets its own session leases, just like a separate process would
+    with SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose()).job():
+        try:
+            # Standalone mode would exit, so errors are reported here instead
+            result = app(args=argv, prog_name="main.py", standalone_mode=False)
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            typer.echo("Aborted!", err=True)
+            return 1
+    # A raised typer.Exit comes back as its exit code, commands return None
+    return result if isinstance(result, int) else 0
+
+
+@daemon_app.command(
+    name="start, serve",
+    help="[purple]Start[/purple] the [bold cyan]background[/bold cyan] daemon. :fire:",
+    rich_help_panel="Daemon: Management",
+)
+def start_daemon(
+    detach: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--detach",
+            "-d",
+            help="Specify whether or not to run the daemon in the [purple]background[/purple]. :ghost:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
+    warm: Annotated[
+        bool,
+        typer.Option(
+            ...,
+            "--warm",
+            "-w",
+            help="Specify whether or not to [purple]warm up[/purple] all services before serving. :fire:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = False,
+    wait: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--wait",
+            "-wt",
+            help="Specify how many [purple]seconds[/purple] to wait for a detached daemon. :hourglass:",
+            min=0,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = 120,
+):
+    status = daemon_status()
+    if status is not None:
+        typer.echo(f"The daemon is already running (PID {status['pid']}).")
+        raise typer.Exit(code=1)
+
+    if detach:
+        kwargs = (
+            {"creationflags": sp.DETACHED_PROCESS | sp.CREATE_NEW_PROCESS_GROUP}  # type: ignore
+            if platform.system() == "Windows"
+            else {"start_new_session": True}
+        )
+        process = sp.Popen(
+            [sys.executable, os.path.abspath(__file__)]
+            + (["--verbose"] if is_verbose() else [])
+            + ["daemon", "start"]
+            + (["--warm"] if warm else []),
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=sp.DEVNULL,
+            stdout=sp.DEVNULL,
+            stderr=sp.DEVNULL,
+            **kwargs,
+        )
+        deadline = time.monotonic() + wait
+        while (status := daemon_status()) is None:
+            if process.poll() is not None:
+                typer.echo("The daemon exited during startup.")
+                raise typer.Exit(code=1)
+            if time.monotonic() > deadline:
+                typer.echo(f"The daemon (PID {process.pid}) is still starting up.")
+                return
+            time.sleep(0.25)
+        typer.echo(f"The daemon is running (PID {status['pid']}).")
+        return
+
+    if warm:
+        from src.elevenlabs_api import ElevenLabsAPI
+        from src.fooocus_api import FooocusAPI
+        from src.g4f_api import G4FAPI
+        from src.moviepy_api import MoviepyAPI
+
+        typer.echo("Warming up the services...")
+        SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+        PromptManager()
+        G4FAPI(verbose=is_verbose(), model=LLM_MODEL)
+        ElevenLabsAPI(verbose=is_verbose())
+        FooocusAPI(verbose=is_verbose())
+        MoviepyAPI(verbose=is_verbose())
+
+    server = daemon.DaemonServer(run_daemon_job)
+    typer.echo(f"The daemon is running (PID {os.getpid()}). Press Ctrl+C to stop it.")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    typer.echo("The daemon has stopped.")
+
+
+@daemon_app.command(
+    name="stop, kill",
+    help="[purple]Stop[/purple] the [bold cyan]background[/bold cyan] daemon. :stop_sign:",
+    rich_help_panel="Daemon: Management",
+)
+def stop_daemon():
+    status = daemon_status()
+    if status is None:
+        typer.echo("The daemon is not running.")
+        raise typer.Exit(code=1)
+
+    daemon.request("stop")
+    if status["running"]:
+        typer.echo(
+            f"The daemon (PID {status['pid']}) stops after {status['running']} running job(s)."
+        )
+    else:
+        typer.echo(f"The daemon (PID {status['pid']}) has been stopped.")
+
+
+@daemon_app.command(
+    name="status, info",
+    help="[purple]Show[/purple] the [bold cyan]background[/bold cyan] daemon status. :information:",
+    rich_help_panel="Daemon: Information",
+)
+def show_daemon_status():
+    status = daemon_status()
+    if status is None:
+        typer.echo("The daemon is not running.")
+        raise typer.Exit(code=1)
+
+    typer.echo(f"PID: {status['pid']}")
+    typer.echo(f"Uptime: {status['uptime']:.0f}s")
+    typer.echo(f"Running jobs: {status['running']}")
+    typer.echo(f"Served jobs: {status['served']}")
+
+
+def job_argv(command: str, options: dict) -> list[str]:
+    # API jobs become the argv of the CLI command, so they are validated and run
+    # by the very same code
+    if command not in API_COMMANDS:
+        raise ValueError(f"Unknown command: {command}")
+
+    group = typer.main.get_command(app)
+    subcommand = group.get_command(None, command)  # type: ignore
+
+    def to_args(target, options: dict) -> list[str]:
+        params = {
+            param.name: param
+            for param in target.params
+            if param.param_type_name == "option"
+        }
+        args: list[str] = []
+        for name, value in options.items():
+            param = params.get(name.replace("-", "_"))
+            if param is None:
+                raise ValueError(f"Unknown option of '{command}': {name}")
+            if value is None:
+                continue
+            opt = max(param.opts, key=len)
+            if param.is_flag:
+                if value:
+                    args.append(opt)
+                elif param.secondary_opts:
+                    args.append(max(param.secondary_opts, key=len))
+            elif param.multiple:
+                for item in value if isinstance(value, list) else [value]:
+                    args += [opt, str(item)]
+            else:
+                args += [opt, str(value)]
+        return args
+
+    global_options = {
+        key: options[key] for key in ("channel", "verbose") if key in options
+    }
+    args = to_args(
+        subcommand,
+        {key: value for key, value in options.items() if key not in global_options},
+    )
+    try:
+        subcommand.make_context(command, list(args))  # type: ignore
+    except Exception as e:
+        # Click's errors name the option that is invalid
+        raise ValueError(e.format_message() if hasattr(e, "format_message") else str(e))
+    return to_args(group, global_options) + [command] + args
+
+
+def session_details(session_id: str) -> dict | None:
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    if not settings_manager.session_exists(SessionID.explicit(session_id)):
+        return None
+    session = Session(SessionID.explicit(session_id).copy())
+    for session, error in settings_manager.load_sessions([session], max_workers=1):
+        if error is not None:
+            return {"session_id": session_id, "error": str(error)}
+        return session.to_dict()
+    return None
+
+
+@api_app.command(
+    name="serve, start",
+    help="[purple]Serve[/purple] the [bold cyan]local HTTP API[/bold cyan] and run its jobs. :globe_with_meridians:",
+    rich_help_panel="API: Management",
+)
+def serve_api(
+    host: Annotated[
+        str,
+        typer.Option(
+            ...,
+            "--host",
+            "-ho",
+            help="Specify the [purple]host[/purple] to listen on. :house:",
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = "127.0.0.1",
+    port: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--port",
+            "-p",
+            help="Specify the [purple]port[/purple] to listen on. :door:",
+            min=0,
+            max=65535,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = 8765,
+    workers: Annotated[
+        int,
+        typer.Option(
+            ...,
+            "--workers",
+            "-w",
+            help="Specify the [purple]number of jobs[/purple] that run at the same time. :busts_in_silhouette:",
+            min=1,
+            rich_help_panel="Options: Performance",
+        ),
+    ] = 1,
+    max_pending: Annotated[
+        Optional[int],
+        typer.Option(
+            ...,
+            "--max-pending",
+            "-mp",
+            help="Specify the [purple]maximum number[/purple] of pending jobs before new ones are rejected (defaults to the [italic]api_max_pending[/italic] setting). :no_entry:",
+            show_default=False,
+            min=1,
+            rich_help_panel="Options: Performance",
+        ),
+    ] = None,
+    queue_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            "--queue-dir",
+            "-qd",
+            callback=resolve_client_path,
+            help="Specify the [purple]queue directory[/purple] of the jobs (defaults to the [italic]api_queue_dir[/italic] setting or [italic]jobs/[/italic]). :file_folder:",
+            show_default=False,
+            rich_help_panel="Options: Configuration",
+        ),
+    ] = None,
+):
+    from src.job_api import JobServer
+
+    settings_manager = SettingsManager(session_id=SessionID.TEMP, verbose=is_verbose())
+    job_queue = settings_manager.job_queue(
+        queue_dir
+        or settings_manager.get("api_queue_dir", None)
+        or os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs")
+    )
+    max_pending = max_pending or settings_manager.get("api_max_pending", None)
+    token = settings_manager.get("api_token", None)
+    if not token and host not in ("127.0.0.1", "localhost", "::1"):
+        typer.echo("Please set the 'api_token' setting to listen on other hosts.")
+        raise typer.Exit(code=1)
+
+    server = JobServer(
+        (host, port),
+        job_queue,
+        run_daemon_job,
+        job_argv,
+        lambda limit, offset: [
+            session.to_dict(brief=True)
+            for session in settings_manager.get_sessions(limit=limit, offset=offset)
+        ],
+        session_details,
+        workers=workers,
+        single_attempt=SINGLE_ATTEMPT_COMMANDS,
+        max_pending=int(max_pending) if max_pending else None,
+        token=token,
+        verbose=is_verbose(),
+    )
+    typer.echo(
+        f"The API is listening on http://{host}:{server.server_address[1]} with {workers} worker(s). Press Ctrl+C to stop it."
+    )
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    typer.echo("The API has stopped.")
+
+
 if __name__ == "__main__":
     app()
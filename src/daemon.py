@@ -0,0 +1,397 @@
+import io
+import json
+import os
+import platform
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, TextIO
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INFO_FILE = os.path.join(ROOT_DIR, "config", "daemon.json")
+SOCKET_FILE = os.path.join(ROOT_DIR, "config", "daemon.sock")
+NO_DAEMON_ENV = "QUICKCLIP_NO_DAEMON"
+IS_WINDOWS = platform.system() == "Windows"
+
+_client_streams: ContextVar[dict[str, TextIO] | None] = ContextVar(
+    "client_streams", default=None
+)
+_client_environ: ContextVar[dict[str, str] | None] = ContextVar(
+    "client_environ", default=None
+)
+_client_cwd: ContextVar[str | None] = ContextVar("client_cwd", default=None)
+
+
+class _ClientStream(io.TextIOBase):
+    def __init__(self, name: str, wfile, lock: threading.Lock) -> None:
+        self.__name__ = name
+        self.__wfile__ = wfile
+        self.__lock__ = lock
+        self.__connected__ = True
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    def write(self, data: str) -> int:
+        if not isinstance(data, str):
+            # Click probes for binary streams by writing bytes
+            raise TypeError("The client stream only accepts text!")
+        if data and self.__connected__:
+            send(self.__wfile__, {"stream": self.__name__, "data": data}, self.__lock__)
+            # A disconnected client must not abort the job it started
+            self.__connected__ = not self.__wfile__.closed
+        return len(data)
+
+
+class _ContextStream(io.TextIOBase):
+    def __init__(self, name: str, fallback: TextIO) -> None:
+        self.__name__ = name
+        self.__fallback__ = fallback
+
+    @property
+    def target(self) -> TextIO:
+        streams = _client_streams.get()
+        return self.__fallback__ if streams is None else streams[self.__name__]  # type: ignore
+
+    @property
+    def encoding(self) -> str:  # type: ignore
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return self.target.isatty()
+
+    def write(self, data: str) -> int:
+        return self.target.write(data)
+
+    def flush(self) -> None:
+        self.target.flush()
+
+    def fileno(self) -> int:
+        return self.__fallback__.fileno()
+
+
+class _ContextEnviron(MutableMapping):
+    def __init__(self, fallback: MutableMapping) -> None:
+        self.__fallback__ = fallback
+
+    @property
+    def target(self) -> MutableMapping:
+        environ = _client_environ.get()
+        return self.__fallback__ if environ is None else environ
+
+    def __getitem__(self, key: str) -> str:
+        return self.target[key]
+
+    def __setitem__(self, key: str, value: str) -> None:
+        self.target[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self.target[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.target)
+
+    def __len__(self) -> int:
+        return len(self.target)
+
+    def copy(self) -> dict[str, str]:
+        return dict(self.target)
+
+
+@contextmanager
+def output_routing():
+    # Lets every thread of this process write to the client it works for
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout = _ContextStream("stdout", stdout)
+    sys.stderr = _ContextStream("stderr", stderr)
+    try:
+        yield
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+@contextmanager
+def environ_routing():
+    # Lets every thread of this process see the environment of its client
+    environ = os.environ
+    os.environ = _ContextEnviron(environ)  # type: ignore
+    try:
+        yield
+    finally:
+        os.environ = environ
+
+
+@contextmanager
+def routed_environ(environ: dict[str, str]):
+    token = _client_environ.set(dict(environ))
+    try:
+        yield
+    finally:
+        _client_environ.reset(token)
+
+
+@contextmanager
+def routed_cwd(cwd: str):
+    token = _client_cwd.set(cwd)
+    try:
+        yield
+    finally:
+        _client_cwd.reset(token)
+
+
+def client_path(path: str) -> str:
+    # The daemon runs in its own working directory, so relative paths given by
+    # a client are relative to the directory the client was started in
+    return os.path.join(_client_cwd.get() or os.getcwd(), path)
+
+
+@contextmanager
+def routed_output(stdout: TextIO, stderr: TextIO):
+    token = _client_streams.set({"stdout": stdout, "stderr": stderr})
+    try:
+        yield
+    finally:
+        _client_streams.reset(token)
+
+
+def run_command(run: Callable[[list[str]], int], argv: list[str]) -> int:
+    try:
+        return run(argv)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        traceback.print_exc()
+        return 1
+
+
+def send(wfile, message: dict, lock: "threading.Lock | None" = None) -> None:
+    line = (json.dumps(message) + "\n").encode("utf-8")
+    try:
+        if lock is None:
+            wfile.write(line)
+            wfile.flush()
+        else:
+            with lock:
+                wfile.write(line)
+                wfile.flush()
+    except (BrokenPipeError, ConnectionResetError, ValueError):
+        if not wfile.closed:
+            wfile.close()
+
+
+def read_info() -> dict | None:
+    try:
+        with open(INFO_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_info(info: dict) -> None:
+    temp_file = os.path.join(os.path.dirname(INFO_FILE), ".daemon.json.tmp")
+    fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(temp_file, INFO_FILE)
+
+
+def connect(info: dict, timeout: float | None = None) -> socket.socket:
+    if info["family"] == "unix":
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)  # type: ignore
+        connection.settimeout(timeout)
+        connection.connect(info["address"])
+    else:
+        connection = socket.create_connection(tuple(info["address"]), timeout)
+    connection.settimeout(None)
+    return connection
+
+
+def request(command: str, argv: list[str] | None = None, on_message=None) -> dict:
+    info = read_info()
+    if info is None:
+        raise ConnectionError("The daemon is not running!")
+
+    with connect(info, timeout=1) as connection, connection.makefile("rwb") as stream:
+        send(
+            stream,
+            {
+                "token": info["token"],
+                "command": command,
+                "argv": argv or [],
+                "cwd": os.getcwd(),
+                "env": dict(os.environ),
+            },
+        )
+        for line in stream:
+            message = json.loads(line)
+            if "stream" in message:
+                if on_message is not None:
+                    on_message(message)
+                continue
+            if "error" in message:
+                raise ConnectionError(message["error"])
+            return message
+    raise ConnectionError("The daemon closed the connection!")
+
+
+def __command__(argv: list[str], value_options: tuple[str, ...]) -> list[str]:
+    # The command and its subcommand, without the options of the main callback
+    words, args = [], iter(argv)
+    for arg in args:
+        if arg.startswith("-"):
+            if not words and arg in value_options:
+                next(args, None)
+            continue
+        words.append(arg)
+        if len(words) == 2:
+            break
+    return words
+
+
+def forward_to_daemon(
+    argv: list[str],
+    commands: tuple[str, ...],
+    value_options: tuple[str, ...] = (),
+) -> int | None:
+    # Only the listed commands run in the daemon; servers and workers keep a
+    # process of their own
+    words = __command__(argv, value_options)
+    if os.environ.get(NO_DAEMON_ENV) or not (
+        words[:1] and (words[0] in commands or " ".join(words) in commands)
+    ):
+        return None
+
+    def relay(message: dict) -> None:
+        stream = sys.stderr if message["stream"] == "stderr" else sys.stdout
+        stream.write(message["data"])
+        stream.flush()
+
+    try:
+        response = request("run", argv, relay)
+    except (OSError, ValueError):
+        # Fall back to running the command in this process
+        return None
+    return response.get("exit", 1)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "DaemonServer"
+
+    def handle(self) -> None:
+        try:
+            message = json.loads(self.rfile.readline())
+        except json.JSONDecodeError:
+            return
+
+        if not secrets.compare_digest(str(message.get("token")), self.server.token):
+            send(self.wfile, {"error": "Invalid token!"})
+            return
+
+        command = message.get("command")
+        if command == "status":
+            send(self.wfile, self.server.status())
+        elif command == "stop":
+            send(self.wfile, {"exit": 0})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif command == "run":
+            lock = threading.Lock()
+            cwd = message.get("cwd") or os.getcwd()
+            with routed_output(
+                _ClientStream("stdout", self.wfile, lock),  # type: ignore
+                _ClientStream("stderr", self.wfile, lock),  # type: ignore
+            ), routed_environ(message.get("env") or dict(os.environ)), routed_cwd(cwd):
+                exit_code = self.server.run_job(message.get("argv", []))
+            send(self.wfile, {"exit": exit_code}, lock)
+        else:
+            send(self.wfile, {"error": f"Unknown command: {command}"})
+
+
+if IS_WINDOWS:
+    _BaseServer = socketserver.ThreadingTCPServer
+else:
+    _BaseServer = socketserver.ThreadingUnixStreamServer  # type: ignore
+
+
+class DaemonServer(_BaseServer):  # type: ignore
+    daemon_threads = True
+
+    def __init__(self, run: Callable[[list[str]], int]) -> None:
+        self.__run__ = run
+        self.__token__ = secrets.token_hex(32)
+        self.__started_at__ = time.time()
+        self.__running__ = 0
+        self.__served__ = 0
+        self.__lock__ = threading.Lock()
+
+        if IS_WINDOWS:
+            super().__init__(("127.0.0.1", 0), _Handler)
+        else:
+            if os.path.exists(SOCKET_FILE):
+                os.remove(SOCKET_FILE)
+            # Only the owner may connect to the socket
+            umask = os.umask(0o177)
+            try:
+                super().__init__(SOCKET_FILE, _Handler)
+            finally:
+                os.umask(umask)
+
+    @property
+    def token(self) -> str:
+        return self.__token__
+
+    @property
+    def info(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "family": "tcp" if IS_WINDOWS else "unix",
+            "address": self.server_address,
+            "token": self.__token__,
+            "started_at": self.__started_at__,
+        }
+
+    def status(self) -> dict:
+        with self.__lock__:
+            return {
+                "pid": os.getpid(),
+                "uptime": time.time() - self.__started_at__,
+                "running": self.__running__,
+                "served": self.__served__,
+            }
+
+    def run_job(self, argv: list[str]) -> int:
+        with self.__lock__:
+            self.__running__ += 1
+        try:
+            return run_command(self.__run__, argv)
+        finally:
+            with self.__lock__:
+                self.__running__ -= 1
+                self.__served__ += 1
+
+    def serve(self) -> None:
+        write_info(self.info)
+        try:
+            with output_routing(), environ_routing():
+                self.serve_forever()
+                # Let the jobs that are still running finish
+                while self.status()["running"]:
+                    time.sleep(0.5)
+        finally:
+            self.server_close()
+            if (read_info() or {}).get("token") == self.__token__:
+                os.remove(INFO_FILE)
+                if not IS_WINDOWS and os.path.exists(SOCKET_FILE):
+                    os.remove(SOCKET_FILE)
@@ -10,27 +10,40 @@ warnings.filterwarnings("ignore", category=UserWarning)
 from elevenlabs import VoiceSettings, save
 from elevenlabs.client import DEFAULT_VOICE, ElevenLabs
 
-from config.config import SessionID, SettingsManager, Singleton
+from config.config import SessionID, SettingsManager, Singleton, context_verbose
+from src import tracing
 
 
 @Singleton
 class ElevenLabsAPI:
+    __verbose__ = context_verbose()
+
     def __init__(self, verbose: bool = False) -> None:
         self.__verbose__ = verbose
         self.__settings_manager__ = SettingsManager(session_id=SessionID.NONE)
-        api_key = self.__settings_manager__.get(
-            "elevenlabs_api_key",
-            self.__settings_manager__.get("ELEVENLABS_API_KEY", None),
-        )
-        if not api_key:
-            raise APIKeyNotFoundError("ElevenLabs")
-        self.__client__ = ElevenLabs(api_key=api_key)
-        del api_key
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.__clients__: dict[str | None, ElevenLabs] = {}
+        self.__client__  # Fail early without an API key
+
+    @property
+    def __client__(self) -> ElevenLabs:
+        # Channels may use their own ElevenLabs accounts
+        channel = self.__settings_manager__.channel
+        if channel not in self.__clients__:
+            api_key = self.__settings_manager__.get(
+                "elevenlabs_api_key",
+                self.__settings_manager__.get("ELEVENLABS_API_KEY", None),
+            )
+            if not api_key:
+                raise APIKeyNotFoundError("ElevenLabs")
+            self.__clients__[channel] = ElevenLabs(api_key=api_key)
+            del api_key
+        return self.__clients__[channel]
 
     @property
     def output_dir(self):
-        return os.path.join(self.__settings_manager__.build_dir, "audios")
+        output_dir = os.path.join(self.__settings_manager__.build_dir, "audios")
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
 
     @property
     def voices(self):
@@ -48,6 +61,7 @@ class ElevenLabsAPI:
     def verbose(self, value: bool):
         self.__verbose__ = value
 
+    @tracing.traced("elevenlabs.generate_audio")
     def generate_audio(
         self,
         text: str,
@@ -56,6 +70,7 @@ class ElevenLabsAPI:
         model: str = "eleven_monolingual_v1",
         save_audio: str | None = None,
     ):
+        tracing.annotate(model=model, voice_id=voice_id, chars=len(text))
         if self.__verbose__:
             typer.echo(f"Generating audio...")
         try:
@@ -73,7 +88,12 @@ class ElevenLabsAPI:
             if not save_audio.endswith(".mp3"):
                 save_audio += ".mp3"
 
-            save(response, os.path.join(self.output_dir, save_audio))
+            temp_audio = os.path.join(self.output_dir, f".{save_audio}.tmp")
+            save(response, temp_audio)
+            tracing.annotate(bytes=os.path.getsize(temp_audio))
+            self.__settings_manager__.blob_store.put(
+                temp_audio, os.path.join(self.output_dir, save_audio), move=True
+            )
             if self.__verbose__:
                 typer.echo(f"Audio saved as: {save_audio}")
             return os.path.join(self.output_dir, save_audio)
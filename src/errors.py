@@ -51,3 +51,10 @@ class UtilityNotFoundError(_CustomException):
 class BensoundDownloadError(_CustomException):
     def __init__(self, bensound_track: str):
         super().__init__(f"Failed to download Bensound track '{bensound_track}'!")
+
+
+class QueueFullError(_CustomException):
+    def __init__(self, max_pending: int):
+        super().__init__(
+            f"The job queue is full ({max_pending} pending jobs). Please try again later."
+        )
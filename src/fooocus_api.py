@@ -1,6 +1,5 @@
 import atexit
 import os
-import shutil
 import subprocess as sp
 import sys
 import threading
@@ -11,7 +10,15 @@ import PIL.Image as Image
 import typer
 from rich import print as rprint
 
-from config.config import SessionID, SettingsManager, Singleton, classproperty, timeout
+from config.config import (
+    SessionID,
+    SettingsManager,
+    Singleton,
+    classproperty,
+    context_verbose,
+    timeout,
+)
+from src import tracing
 from src.errors import FooocusNotFoundError, LoRaNotFoundError, ModelNotFoundError
 
 
@@ -159,12 +166,16 @@ class ImageType(Enum):
 
 @Singleton
 class FooocusAPI:
+    __verbose__ = context_verbose()
+
+    @tracing.traced("fooocus.startup")
     def __init__(
         self,
         verbose: bool = False,
     ) -> None:
         atexit.register(self.__dispose__, exit_code=None)
         self.__verbose__ = verbose
+        self.__generate_lock__ = threading.Lock()
         try:
             self.__process__ = sp.Popen(
                 self.__fooocus_cmd__,
@@ -235,12 +246,13 @@ class FooocusAPI:
             self.__dispose__(exit_code=1)
 
         self.__placeholder_img__ = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVQImWNgYGBgAAAABQABh6FO1AAAAABJRU5ErkJggg=="
-        os.makedirs(self.output_dir, exist_ok=True)
 
     @property
     def output_dir(self) -> str:
         settings_manager = SettingsManager(session_id=SessionID.NONE)
-        return os.path.join(settings_manager.build_dir, "pictures")
+        output_dir = os.path.join(settings_manager.build_dir, "pictures")
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
 
     @classproperty
     def fooocus_path(cls) -> dict[str, str] | None:
@@ -373,13 +385,18 @@ class FooocusAPI:
         if save_picture:
             if not save_picture.endswith(f".{image_type.value}"):
                 save_picture += f".{image_type.value}"
-            img.save(os.path.join(self.output_dir, save_picture), image_type.value)
+            temp_picture = os.path.join(self.output_dir, f".{save_picture}.tmp")
+            img.save(temp_picture, image_type.value)
+            SettingsManager(session_id=SessionID.NONE).blob_store.put(
+                temp_picture, os.path.join(self.output_dir, save_picture), move=True
+            )
             if self.__verbose__:
                 typer.echo(f"Picture saved as: {save_picture}")
             return os.path.join(self.output_dir, save_picture)
 
         return img
 
+    @tracing.traced("fooocus.generate_picture")
     def generate_picture(
         self,
         prompt: str,
@@ -391,195 +408,204 @@ class FooocusAPI:
         upscale_mode: UpscaleMode = UpscaleMode.DISABLED,
         save_picture: str | None = None,
     ) -> bool | str:
-        if self.__verbose__:
-            typer.echo(f"Setting Fooocus params...")
-        self.__client__.predict(True, fn_index=53)  # Advanced: True
-        self.__client__.predict(fn_index=65)  # ???
-        self.__client__.predict(True, "0", fn_index=66)  # Random: True, Seed: 0
-        self.__client__.predict(
-            False,
-            prompt,
-            "unrealistic, saturated, high contrast, big nose, painting, drawing, sketch, cartoon, anime, manga, render, CG, 3d, watermark, signature, label",
-            [
-                "Fooocus V2",
-                "Fooocus Photograph",
-                "Fooocus Negative",
-                "Fooocus Sharp",
-                "Fooocus Masterpiece",
-                "Fooocus Enhance",
-                "Fooocus Cinematic",
-            ],
-            "Quality",
-            f'{str(resolution).split("|")[0].strip()} <span style="color: grey;"> | {str(resolution).split("|")[1].strip()}</span>',
-            1,
-            image_type.value,
-            "0",
-            False,
-            6,
-            3,
-            model.file,
-            refiner.file if refiner else "None",
-            refiner.weight if refiner else 0.5,
-            True,
-            lora_1.file if lora_1 else "None",
-            lora_1.weight if lora_1 else 1,
-            True,
-            "None",
-            1,
-            True,
-            "None",
-            1,
-            True,
-            "None",
-            1,
-            True,
-            "None",
-            1,
-            False,
-            "uov",
-            "Disabled",
-            self.__placeholder_img__,
-            [],
-            self.__placeholder_img__,
-            "",
-            self.__placeholder_img__,
-            False,
-            False,
-            False,
-            False,
-            1.5,
-            0.8,
-            0.3,
-            7,
-            2,
-            "dpmpp_2m_sde_gpu",
-            "karras",
-            "Default (model)",
-            -1,
-            -1,
-            -1,
-            -1,
-            -1,
-            -1,
-            False,
-            False,
-            False,
-            False,
-            64,
-            128,
-            "joint",
-            0.25,
-            False,
-            1.01,
-            1.02,
-            0.99,
-            0.95,
-            False,
-            False,
-            "v2.6",
-            1,
-            0.618,
-            False,
-            False,
-            0,
-            False,
-            False,
-            "fooocus",
-            self.__placeholder_img__,
-            0.5,
-            0.6,
-            "ImagePrompt",
-            self.__placeholder_img__,
-            0.5,
-            0.6,
-            "ImagePrompt",
-            self.__placeholder_img__,
-            0.5,
-            0.6,
-            "ImagePrompt",
-            self.__placeholder_img__,
-            0.5,
-            0.6,
-            "ImagePrompt",
-            False,
-            0,
-            False,
-            None,
-            False if upscale_mode == UpscaleMode.DISABLED else True,
-            upscale_mode.value,
-            "Before First Enhancement",
-            "Original Prompts",
-            False,
-            "",
-            "",
-            "",
-            "sam",
-            "full",
-            "vit_b",
-            0.25,
-            0.3,
-            0,
-            False,
-            "v2.6",
-            1,
-            0.618,
-            0,
-            False,
-            False,
-            "",
-            "",
-            "",
-            "sam",
-            "full",
-            "vit_b",
-            0.25,
-            0.3,
-            0,
-            False,
-            "v2.6",
-            1,
-            0.618,
-            0,
-            False,
-            False,
-            "",
-            "",
-            "",
-            "sam",
-            "full",
-            "vit_b",
-            0.25,
-            0.3,
-            0,
-            False,
-            "v2.6",
-            1,
-            0.618,
-            0,
-            False,
-            fn_index=67,
+        tracing.annotate(
+            model=model.name,
+            resolution=resolution.name,
+            upscale_mode=upscale_mode.name,
         )
-        if self.__verbose__:
-            typer.echo("Generating picture...")
-        result = self.__client__.predict(fn_index=68)[3]["value"]  # Generate picture
-        result = result[0] if upscale_mode == UpscaleMode.DISABLED else result[1]
-        if self.__verbose__:
-            typer.echo(f"Picture generated! Result: {result}")
-        for i in range(69, 73):
-            self.__client__.predict(fn_index=i)  # ???
-        if not result["is_file"]:
-            return False
-
-        if save_picture:
-            if not save_picture.endswith(f".{image_type.value}"):
-                save_picture += f".{image_type.value}"
-
-            shutil.copy(
-                result["name"],
-                os.path.join(self.output_dir, save_picture),
+        # Fooocus keeps the parameters in its UI state, so requests must not interleave
+        with self.__generate_lock__:
+            if self.__verbose__:
+                typer.echo(f"Setting Fooocus params...")
+            self.__client__.predict(True, fn_index=53)  # Advanced: True
+            self.__client__.predict(fn_index=65)  # ???
+            self.__client__.predict(True, "0", fn_index=66)  # Random: True, Seed: 0
+            self.__client__.predict(
+                False,
+                prompt,
+                "unrealistic, saturated, high contrast, big nose, painting, drawing, sketch, cartoon, anime, manga, render, CG, 3d, watermark, signature, label",
+                [
+                    "Fooocus V2",
+                    "Fooocus Photograph",
+                    "Fooocus Negative",
+                    "Fooocus Sharp",
+                    "Fooocus Masterpiece",
+                    "Fooocus Enhance",
+                    "Fooocus Cinematic",
+                ],
+                "Quality",
+                f'{str(resolution).split("|")[0].strip()} <span style="color: grey;"> | {str(resolution).split("|")[1].strip()}</span>',
+                1,
+                image_type.value,
+                "0",
+                False,
+                6,
+                3,
+                model.file,
+                refiner.file if refiner else "None",
+                refiner.weight if refiner else 0.5,
+                True,
+                lora_1.file if lora_1 else "None",
+                lora_1.weight if lora_1 else 1,
+                True,
+                "None",
+                1,
+                True,
+                "None",
+                1,
+                True,
+                "None",
+                1,
+                True,
+                "None",
+                1,
+                False,
+                "uov",
+                "Disabled",
+                self.__placeholder_img__,
+                [],
+                self.__placeholder_img__,
+                "",
+                self.__placeholder_img__,
+                False,
+                False,
+                False,
+                False,
+                1.5,
+                0.8,
+                0.3,
+                7,
+                2,
+                "dpmpp_2m_sde_gpu",
+                "karras",
+                "Default (model)",
+                -1,
+                -1,
+                -1,
+                -1,
+                -1,
+                -1,
+                False,
+                False,
+                False,
+                False,
+                64,
+                128,
+                "joint",
+                0.25,
+                False,
+                1.01,
+                1.02,
+                0.99,
+                0.95,
+                False,
+                False,
+                "v2.6",
+                1,
+                0.618,
+                False,
+                False,
+                0,
+                False,
+                False,
+                "fooocus",
+                self.__placeholder_img__,
+                0.5,
+                0.6,
+                "ImagePrompt",
+                self.__placeholder_img__,
+                0.5,
+                0.6,
+                "ImagePrompt",
+                self.__placeholder_img__,
+                0.5,
+                0.6,
+                "ImagePrompt",
+                self.__placeholder_img__,
+                0.5,
+                0.6,
+                "ImagePrompt",
+                False,
+                0,
+                False,
+                None,
+                False if upscale_mode == UpscaleMode.DISABLED else True,
+                upscale_mode.value,
+                "Before First Enhancement",
+                "Original Prompts",
+                False,
+                "",
+                "",
+                "",
+                "sam",
+                "full",
+                "vit_b",
+                0.25,
+                0.3,
+                0,
+                False,
+                "v2.6",
+                1,
+                0.618,
+                0,
+                False,
+                False,
+                "",
+                "",
+                "",
+                "sam",
+                "full",
+                "vit_b",
+                0.25,
+                0.3,
+                0,
+                False,
+                "v2.6",
+                1,
+                0.618,
+                0,
+                False,
+                False,
+                "",
+                "",
+                "",
+                "sam",
+                "full",
+                "vit_b",
+                0.25,
+                0.3,
+                0,
+                False,
+                "v2.6",
+                1,
+                0.618,
+                0,
+                False,
+                fn_index=67,
             )
             if self.__verbose__:
-                typer.echo(f"Picture saved as: {save_picture}")
-            return os.path.join(self.output_dir, save_picture)
+                typer.echo("Generating picture...")
+            # Generate picture
+            with tracing.span("fooocus.diffusion"):
+                result = self.__client__.predict(fn_index=68)[3]["value"]
+            result = result[0] if upscale_mode == UpscaleMode.DISABLED else result[1]
+            if self.__verbose__:
+                typer.echo(f"Picture generated! Result: {result}")
+            for i in range(69, 73):
+                self.__client__.predict(fn_index=i)  # ???
+            if not result["is_file"]:
+                return False
+
+            if save_picture:
+                if not save_picture.endswith(f".{image_type.value}"):
+                    save_picture += f".{image_type.value}"
+
+                SettingsManager(session_id=SessionID.NONE).blob_store.put(
+                    result["name"],
+                    os.path.join(self.output_dir, save_picture),
+                )
+                if self.__verbose__:
+                    typer.echo(f"Picture saved as: {save_picture}")
+                return os.path.join(self.output_dir, save_picture)
 
-        return result["name"]
+            return result["name"]
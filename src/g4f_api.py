@@ -14,7 +14,8 @@ from g4f.cookies import read_cookie_files, set_cookies_dir
 from g4f.errors import MissingAuthError, RateLimitError
 from g4f.requests.raise_for_status import CloudflareError
 
-from config.config import SessionID, SettingsManager, Singleton
+from config.config import SessionID, SettingsManager, Singleton, context_verbose
+from src import tracing
 
 
 class MessageSender(Enum):
@@ -54,6 +55,8 @@ class Message:
 
 @Singleton
 class G4FAPI:
+    __verbose__ = context_verbose()
+
     def __init__(
         self,
         model: str = "gpt-4o",
@@ -73,12 +76,13 @@ class G4FAPI:
         read_cookie_files(cookies_dir)
         atexit.register(self.__encrypt_cookies__, cookies_dir)
 
-        self.__provider__ = provider
-        self.__client__ = Client(provider=self.__provider__)  # type: ignore
+        self.__default_provider__ = provider
+        self.__client__ = Client(provider=provider)  # type: ignore
         self.__model__ = model
         self.__backup_model__ = backup_model
-        self.__using_backup_model__ = False
-        self.__messages__: list[dict[str, str]] = []
+        # The history and the fallbacks of every session, dropped with the session
+        self.__sessions__: dict[str, dict] = {}
+        self.__settings_manager__.on_release(self.drop_session)
 
     def __decrypt_cookies__(self, cookies_dir: str) -> None:
         for file in os.listdir(cookies_dir):
@@ -127,6 +131,17 @@ class G4FAPI:
     def backup_model(self, backup_model: str) -> None:
         self.__backup_model__ = backup_model
 
+    @property
+    def __session__(self) -> dict:
+        return self.__sessions__.setdefault(
+            self.__settings_manager__.session_id,
+            {
+                "messages": [],
+                "provider": self.__default_provider__,
+                "using_backup_model": False,
+            },
+        )
+
     @property
     def using_backup_model(self) -> bool:
         return self.__using_backup_model__
@@ -135,6 +150,14 @@ class G4FAPI:
     def using_backup_model(self, using_backup_model: bool) -> None:
         self.__using_backup_model__ = using_backup_model
 
+    @property
+    def __using_backup_model__(self) -> bool:
+        return self.__session__["using_backup_model"]
+
+    @__using_backup_model__.setter
+    def __using_backup_model__(self, using_backup_model: bool) -> None:
+        self.__session__["using_backup_model"] = using_backup_model
+
     @property
     def provider(self) -> Provider.ProviderType | None:
         return self.__provider__
@@ -143,6 +166,22 @@ class G4FAPI:
     def provider(self, provider: Provider.ProviderType | None) -> None:
         self.__provider__ = provider
 
+    @property
+    def __provider__(self) -> Provider.ProviderType | None:
+        return self.__session__["provider"]
+
+    @__provider__.setter
+    def __provider__(self, provider: Provider.ProviderType | None) -> None:
+        self.__session__["provider"] = provider
+
+    @property
+    def __messages__(self) -> list[dict[str, str]]:
+        return self.__session__["messages"]
+
+    @__messages__.setter
+    def __messages__(self, messages: list[dict[str, str]]) -> None:
+        self.__session__["messages"] = messages
+
     @property
     def messages(self, as_dict: bool = False) -> list[Message] | list[dict[str, str]]:
         return (
@@ -154,15 +193,26 @@ class G4FAPI:
     def add_message(self, message: Message) -> None:
         self.__messages__.append(message.to_dict())
 
-    def clear_messages(self) -> None:
-        self.__messages__ = []
+    def conversation(self) -> list[dict[str, str]]:
+        return list(self.__messages__)
+
+    def clear_messages(self, session_id: str | None = None) -> None:
+        if session_id is None:
+            self.__messages__ = []
+        else:
+            self.__sessions__.get(session_id, {})["messages"] = []
+
+    def drop_session(self, session_id: str) -> None:
+        self.__sessions__.pop(session_id, None)
 
+    @tracing.traced("g4f.get_response")
     def get_response(
         self,
         message: Message,
         as_str: bool = False,
         retries: int = 0,
         save_response: str | None = None,
+        history: list[dict[str, str]] | None = None,
     ) -> Message | str:
         if not message.sender == MessageSender.USER:
             raise ValueError("The first message must be from the user")
@@ -170,8 +220,15 @@ class G4FAPI:
         model = (
             self.__model__ if not self.__using_backup_model__ else self.__backup_model__
         )
+        tracing.annotate(
+            model=model,
+            provider=self.__provider__.__name__ if self.__provider__ else "Auto",
+            retries=retries,
+        )
 
-        self.__messages__.append(message.to_dict())
+        # A given history forks the conversation instead of extending it
+        messages = list(history) if history is not None else self.__messages__
+        messages.append(message.to_dict())
         try:
             if self.__verbose__:
                 typer.echo(
@@ -180,7 +237,7 @@ class G4FAPI:
             response = (
                 self.__client__.chat.completions.create(
                     model=model,
-                    messages=self.__messages__,  # type: ignore
+                    messages=messages,  # type: ignore
                     provider=self.__provider__,  # type: ignore
                 )
                 .choices[0]  # type: ignore
@@ -190,16 +247,18 @@ class G4FAPI:
             if retries > 3:
                 raise e
 
-            self.__messages__.pop()
+            messages.pop()
             if self.__verbose__:
                 typer.echo(f"Missing authentication for provider {self.__provider__.__name__}. Retrying with automatic provider...")  # type: ignore
             self.__provider__ = None
-            return self.get_response(message, as_str, retries + 1)
+            return self.get_response(
+                message, as_str, retries + 1, save_response, history
+            )
         except RateLimitError as e:
             if retries > 3:
                 raise e
 
-            self.__messages__.pop()
+            messages.pop()
             if self.__using_backup_model__:
                 self.__using_backup_model__ = False
                 raise e
@@ -208,12 +267,14 @@ class G4FAPI:
                     f"Rate limit for model {model} reached. Retrying with backup model {self.__backup_model__}..."
                 )
             self.__using_backup_model__ = True
-            return self.get_response(message, as_str, retries + 1)
+            return self.get_response(
+                message, as_str, retries + 1, save_response, history
+            )
         except CloudflareError as e:
             if retries > 3:
                 raise e
 
-            self.__messages__.pop()
+            messages.pop()
             if self.__verbose__:
                 if self.__provider__:
                     typer.echo(
@@ -224,27 +285,26 @@ class G4FAPI:
                         "Cloudflare detected. Retrying with automatic provider..."
                     )
             self.__provider__ = None
-            return self.get_response(message, as_str, retries + 1)
+            return self.get_response(
+                message, as_str, retries + 1, save_response, history
+            )
         except Exception as e:
-            self.__messages__.pop()
+            messages.pop()
             raise e
 
-        self.__messages__.append(Message(MessageSender.ASSISTANT, response).to_dict())  # type: ignore
+        tracing.annotate(chars=len(response or ""))
+        messages.append(Message(MessageSender.ASSISTANT, response).to_dict())  # type: ignore
         if save_response and isinstance(response, str):
             if not save_response.endswith(".txt"):
                 save_response += ".txt"
-            os.makedirs(
-                os.path.join(self.__settings_manager__.build_dir, "responses"),
-                exist_ok=True,
+            responses_dir = os.path.join(
+                self.__settings_manager__.build_dir, "responses"
             )
-            with open(
-                os.path.join(
-                    self.__settings_manager__.build_dir, "responses", save_response
-                ),
-                "w",
-                encoding="utf-8",
-            ) as f:
+            os.makedirs(responses_dir, exist_ok=True)
+            temp_response = os.path.join(responses_dir, f".{save_response}.tmp")
+            with open(temp_response, "w", encoding="utf-8") as f:
                 f.write(response)
+            os.replace(temp_response, os.path.join(responses_dir, save_response))
         if self.__verbose__:
             typer.echo("Received response from provider.")
         return response if as_str else Message(MessageSender.ASSISTANT, response)  # type: ignore
@@ -0,0 +1,31 @@
+ALWAYS_INCLUDE = (
+    "#aiexplained",
+    "#ai",
+    "#simplifiedscience",
+    "#quickfacts",
+    "#learnin60seconds",
+    "#knowledgenuggets",
+    "#mindblown",
+    "#didyouknow",
+    "#funfacts",
+    "#brainboost",
+    "#dailylearning",
+    "#techexplained",
+    "#smartshorts",
+    "#curiosity",
+    "#learneveryday",
+    "#factcheck",
+    "#viral",
+    "#trending",
+)
+
+
+def generate_hashtags(keywords: list[str]) -> tuple[str, ...]:
+    hashtags = tuple(
+        map(
+            lambda keyword: f"#{keyword.lower().replace(' ', '').strip()}",
+            ",".join(keywords).strip().replace("#", "").split(","),
+        )
+    )
+    hashtags = tuple(set(hashtags + ALWAYS_INCLUDE))
+    return hashtags
@@ -0,0 +1,340 @@
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+from urllib.parse import parse_qs, urlparse
+
+from config.job_queue import JobQueue
+from src.daemon import output_routing, routed_output, run_command
+from src.errors import QueueFullError
+from src.progress import Progress, listen
+
+JOB_ID_PATTERN = re.compile(r"[0-9]+-[0-9a-f]{8}")
+# Click exits with 2 on usage errors, running them again can't help
+USAGE_ERROR = 2
+RETRY_AFTER = 30
+LOG_TAIL = 2000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "JobServer"
+
+    def __respond__(self, status: int, body, headers: dict | None = None) -> None:
+        if isinstance(body, str):
+            data, content_type = body.encode("utf-8"), "text/plain; charset=utf-8"
+        else:
+            data, content_type = json.dumps(body).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def __authorized__(self) -> bool:
+        if self.server.token is None:
+            return True
+        scheme, _, token = self.headers.get("Authorization", "").partition(" ")
+        if scheme == "Bearer" and secrets.compare_digest(token, self.server.token):
+            return True
+        self.__respond__(401, {"error": "Invalid token!"})
+        return False
+
+    def do_GET(self) -> None:
+        if not self.__authorized__():
+            return
+
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if parts == ["health"]:
+                self.__respond__(200, self.server.status())
+            elif parts == ["jobs"]:
+                state = query.get("state")
+                if state is not None and state not in JobQueue.STATES:
+                    self.__respond__(400, {"error": f"Unknown state: {state}"})
+                    return
+                self.__respond__(200, self.server.jobs(state))
+            elif len(parts) in (2, 3) and parts[0] == "jobs":
+                if not JOB_ID_PATTERN.fullmatch(parts[1]):
+                    self.__respond__(404, {"error": "Job not found!"})
+                elif len(parts) == 2:
+                    job = self.server.job(parts[1])
+                    if job is None:
+                        self.__respond__(404, {"error": "Job not found!"})
+                    else:
+                        self.__respond__(200, job)
+                elif parts[2] == "log":
+                    log = self.server.log(parts[1])
+                    if log is None:
+                        self.__respond__(404, {"error": "Log not found!"})
+                    else:
+                        self.__respond__(200, log)
+                else:
+                    self.__respond__(404, {"error": "Not found!"})
+            elif parts == ["sessions"]:
+                limit = int(query["limit"]) if "limit" in query else None
+                offset = int(query.get("offset", 0))
+                if (limit is not None and limit < 0) or offset < 0:
+                    raise ValueError("Limit and offset must not be negative!")
+                self.__respond__(200, self.server.sessions(limit, offset))
+            elif len(parts) == 2 and parts[0] == "sessions":
+                session = self.server.session(parts[1])
+                if session is None:
+                    self.__respond__(404, {"error": "Session not found!"})
+                else:
+                    self.__respond__(200, session)
+            else:
+                self.__respond__(404, {"error": "Not found!"})
+        except ValueError as e:
+            self.__respond__(400, {"error": str(e)})
+
+    def do_POST(self) -> None:
+        if not self.__authorized__():
+            return
+
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            self.__respond__(404, {"error": "Not found!"})
+            return
+
+        try:
+            body = json.loads(
+                self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}"
+            )
+            if not isinstance(body, dict) or not isinstance(
+                body.get("options", {}), dict
+            ):
+                raise ValueError("Expected an object with 'command' and 'options'!")
+            job_id = self.server.submit(
+                str(body.get("command")), body.get("options", {})
+            )
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self.__respond__(400, {"error": f"Invalid JSON: {e}"})
+        except ValueError as e:
+            self.__respond__(400, {"error": str(e)})
+        except QueueFullError as e:
+            self.__respond__(
+                429, {"error": e.message}, {"Retry-After": str(RETRY_AFTER)}
+            )
+        else:
+            self.__respond__(
+                202, {"id": job_id, "state": "pending"}, {"Location": f"/jobs/{job_id}"}
+            )
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class JobServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        job_queue: JobQueue,
+        run: Callable[[list[str]], int],
+        admit: Callable[[str, dict], list[str]],
+        sessions: Callable[[int | None, int], list[dict]],
+        session: Callable[[str], dict | None],
+        workers: int = 1,
+        single_attempt: tuple[str, ...] = (),
+        max_pending: int | None = None,
+        token: str | None = None,
+        poll_interval: float = 1,
+        verbose: bool = False,
+    ) -> None:
+        self.__job_queue__ = job_queue
+        self.__run__ = run
+        self.__admit__ = admit
+        self.__sessions__ = sessions
+        self.__session__ = session
+        self.__workers__ = max(1, workers)
+        self.__single_attempt__ = single_attempt
+        self.__max_pending__ = max_pending
+        self.__token__ = token or None
+        self.__poll_interval__ = poll_interval
+        self.__verbose__ = verbose
+        self.__started_at__ = time.time()
+        # Job ID -> (worker ID, progress, command) of the jobs running in this process
+        self.__running__: dict[str, tuple[str, Progress, str]] = {}
+        self.__lock__ = threading.Lock()
+        self.__stopped__ = threading.Event()
+        os.makedirs(self.logs_dir, exist_ok=True)
+        super().__init__(address, _Handler)
+
+    @property
+    def token(self) -> str | None:
+        return self.__token__
+
+    @property
+    def verbose(self) -> bool:
+        return self.__verbose__
+
+    @property
+    def logs_dir(self) -> str:
+        return os.path.join(self.__job_queue__.queue_dir, "logs")
+
+    def __log_path__(self, job_id: str) -> str:
+        return os.path.join(self.logs_dir, f"{job_id}.log")
+
+    def status(self) -> dict:
+        with self.__lock__:
+            running = len(self.__running__)
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.__started_at__,
+            "workers": self.__workers__,
+            "running": running,
+            "max_pending": self.__max_pending__,
+            "counts": self.__job_queue__.counts(),
+        }
+
+    def submit(self, command: str, options: dict) -> str:
+        # The same admission as the CLI: the argv is validated against the command
+        argv = self.__admit__(command, options)
+        return self.__job_queue__.submit(
+            {"command": command, "options": options, "argv": argv},
+            max_pending=self.__max_pending__,
+            max_attempts=1 if command in self.__single_attempt__ else None,
+        )
+
+    def job(self, job_id: str) -> dict | None:
+        job = self.__job_queue__.get(job_id)
+        if job is None:
+            return None
+        with self.__lock__:
+            running = self.__running__.get(job_id)
+        if running is not None:
+            job["progress"] = running[1].to_dict()
+        return job
+
+    def jobs(self, state: str | None = None) -> list[dict]:
+        return [
+            {
+                key: job.get(key)
+                for key in ("id", "state", "attempts", "submitted_at", "worker")
+            }
+            | {"command": job["spec"].get("command")}
+            for job in self.__job_queue__.jobs(state)
+        ]
+
+    def log(self, job_id: str) -> str | None:
+        try:
+            with open(self.__log_path__(job_id), "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def sessions(self, limit: int | None, offset: int) -> list[dict]:
+        return self.__sessions__(limit, offset)
+
+    def session(self, session_id: str) -> dict | None:
+        return self.__session__(session_id)
+
+    def __execute__(self, job: dict, worker_id: str) -> None:
+        job_id = job["id"]
+        progress = Progress()
+        with self.__lock__:
+            self.__running__[job_id] = (
+                worker_id,
+                progress,
+                job["spec"].get("command"),
+            )
+        try:
+            with open(
+                self.__log_path__(job_id), "a", encoding="utf-8"
+            ) as log, routed_output(log, log), listen(progress):
+                exit_code = run_command(self.__run__, job["spec"]["argv"])
+        except Exception as e:
+            # The job didn't run, e.g. because its log couldn't be opened
+            self.__job_queue__.fail(
+                job_id, worker_id, f"The job could not be run: {e}", retry=True
+            )
+            return
+        finally:
+            with self.__lock__:
+                del self.__running__[job_id]
+
+        if exit_code == 0:
+            self.__job_queue__.complete(
+                job_id,
+                worker_id,
+                {
+                    "exit_code": exit_code,
+                    **progress.to_dict(),
+                    "log": self.__log_path__(job_id),
+                },
+            )
+        else:
+            self.__job_queue__.fail(
+                job_id,
+                worker_id,
+                f"Exited with code {exit_code}: {(self.log(job_id) or '')[-LOG_TAIL:]}",
+                retry=exit_code != USAGE_ERROR,
+            )
+
+    def __work__(self) -> None:
+        worker_id = JobQueue.worker_id()
+        while not self.__stopped__.is_set():
+            try:
+                job = self.__job_queue__.claim(worker_id)
+                if job is None:
+                    self.__stopped__.wait(self.__poll_interval__)
+                    continue
+                self.__execute__(job, worker_id)
+            except Exception:
+                # A job this worker can't settle is reaped once its lease expires
+                traceback.print_exc()
+                self.__stopped__.wait(self.__poll_interval__)
+
+    def __heartbeat__(self) -> None:
+        while not self.__stopped__.wait(self.__job_queue__.lease_seconds / 4):
+            with self.__lock__:
+                running = [
+                    (job_id, worker_id)
+                    for job_id, (worker_id, _, _) in self.__running__.items()
+                ]
+            for job_id, worker_id in running:
+                self.__job_queue__.heartbeat(job_id, worker_id)
+            # Jobs of workers that stopped heartbeating go back to the queue
+            self.__job_queue__.reap(JobQueue.worker_id())
+
+    def serve(self) -> None:
+        threads = [
+            threading.Thread(target=self.__work__, daemon=True)
+            for _ in range(self.__workers__)
+        ]
+        threads.append(threading.Thread(target=self.__heartbeat__, daemon=True))
+        try:
+            with output_routing():
+                for thread in threads:
+                    thread.start()
+                self.serve_forever()
+        finally:
+            self.__stopped__.set()
+            self.server_close()
+            # Jobs that didn't finish go back to the queue for the next server,
+            # unless they may have had side effects already
+            with self.__lock__:
+                running = [
+                    (job_id, worker_id, command)
+                    for job_id, (worker_id, _, command) in self.__running__.items()
+                ]
+            for job_id, worker_id, command in running:
+                if command in self.__single_attempt__:
+                    self.__job_queue__.fail(
+                        job_id,
+                        worker_id,
+                        "The server stopped while the job was running.",
+                        retry=False,
+                    )
+                else:
+                    self.__job_queue__.release(job_id, worker_id)
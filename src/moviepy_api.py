@@ -1,20 +1,26 @@
+import bisect
+import itertools
+import json
 import os
+import platform
 import random as rd
 import shutil
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from enum import Enum
 
 import captametropolis
 import ffmpeg
 import moviepy.editor as mp
+import numpy as np
 import selenium
 import selenium.webdriver
 import typer
 from moviepy.audio.fx.audio_fadeout import audio_fadeout
 from moviepy.audio.fx.volumex import volumex
 from moviepy.video.fx.crop import crop
-from moviepy.video.fx.resize import resize
+from moviepy.video.fx.resize import resize, resizer
 from selenium.common.exceptions import (
     ElementNotInteractableException,
     NoSuchDriverException,
@@ -24,9 +30,23 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from config.config import SessionID, SettingsManager, Singleton
+from config.config import SessionID, SettingsManager, Singleton, context_verbose
+from src import tracing
 from src.errors import BensoundDownloadError
 
+# ffprobe's names of the H.264 profiles x264 can encode
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+# The x264 settings that end up in the parameter sets of a stream
+SPLICE_X264_OPTIONS = ("cabac", "ref", "bframes", "b_pyramid", "weightp", "8x8dct")
+
 
 class SubtitleOptions:
     def __init__(
@@ -70,7 +90,7 @@ class BackgroundMusic:
     ):
         if not audio_path:
             settings_manager = SettingsManager(session_id=SessionID.NONE)
-            audio_assets = os.path.join(settings_manager.assets_dir, "project", "music")
+            audio_assets = os.path.join(settings_manager.channel_assets_dir, "music")
             try:
                 audio_path = rd.choice(
                     [
@@ -183,7 +203,7 @@ class BensoundBackgroundMusic(BackgroundMusic):
         if not files:
             raise BensoundDownloadError(track_name)
 
-        file = files[-1]
+        file = settings_manager.blob_store.put(files[-1], files[-1], move=True)
 
         super().__init__(
             audio_path=file,
@@ -258,9 +278,8 @@ class Overlay:
     def overlay_type(self) -> OverlayType:
         return (
             OverlayType.VIDEO
-            if any(
-                overlay_type.value in self.overlay_path for overlay_type in VideoType
-            )
+            if os.path.splitext(self.overlay_path)[1].lstrip(".").lower()
+            in (video_type.value for video_type in VideoType)
             else OverlayType.IMAGE
         )
 
@@ -307,21 +326,232 @@ class AudioBitrate(Enum):
     B_320K = "320k"
 
 
+class RenderStage:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.frames = 0
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.wall_time if self.frames and self.wall_time else 0
+
+    def to_dict(self) -> dict[str, str | float | int]:
+        return {
+            "name": self.name,
+            "wall_time": round(self.wall_time, 4),
+            "cpu_time": round(self.cpu_time, 4),
+            "frames": self.frames,
+            "fps": round(self.fps, 2),
+        }
+
+
+class RenderResult:
+    def __init__(self, parameters: dict | None = None) -> None:
+        self.video_path: str | None = None
+        self.stats_path: str | None = None
+        self.parameters = parameters or {}
+        self.stages: list[RenderStage] = []
+
+    @staticmethod
+    def __cpu_time__() -> float:
+        # Includes reaped child processes, i.e. the ffmpeg encoders spawned by moviepy
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+    @contextmanager
+    def stage(self, name: str, frames: int = 0):
+        stage = RenderStage(name)
+        stage.frames = frames
+        wall_start, cpu_start = time.perf_counter(), self.__cpu_time__()
+        try:
+            with tracing.span(f"moviepy.{name}", frames=frames):
+                yield stage
+        finally:
+            stage.wall_time = time.perf_counter() - wall_start
+            stage.cpu_time = self.__cpu_time__() - cpu_start
+            self.stages.append(stage)
+
+    @property
+    def wall_time(self) -> float:
+        return sum(stage.wall_time for stage in self.stages)
+
+    @property
+    def cpu_time(self) -> float:
+        return sum(stage.cpu_time for stage in self.stages)
+
+    def to_dict(self) -> dict:
+        return {
+            "video_path": self.video_path,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "host": {
+                "node": platform.node(),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "cpu_count": os.cpu_count(),
+            },
+            "parameters": self.parameters,
+            "wall_time": round(self.wall_time, 4),
+            "cpu_time": round(self.cpu_time, 4),
+            "stages": [stage.to_dict() for stage in self.stages],
+        }
+
+    def save(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4)
+        self.stats_path = path
+        return path
+
+
+class _PictureMotion:
+    MAX_ZOOM = 1.75
+
+    def __init__(
+        self,
+        picture: np.ndarray,
+        resolution: tuple[int, int],
+        duration: float,
+        speed: float = 10,
+        zoom_enabled: bool = False,
+        zoom_speed: float = 0,
+    ) -> None:
+        self.picture = picture
+        self.resolution = resolution
+        self.duration = duration
+        self.speed = speed
+        self.zoom_enabled = zoom_enabled
+
+        height, width = picture.shape[:2]
+        self.min_zoom = max(1.35, max(resolution[0] / width, resolution[1] / height))
+        self.zoom_factor = (
+            rd.uniform(self.min_zoom, self.MAX_ZOOM) if zoom_enabled else 1
+        )
+        zoom_speed = abs(zoom_speed)
+        self.zoom_speed = (
+            -zoom_speed
+            if self.zoom_factor >= ((self.MAX_ZOOM + self.min_zoom) / 2)
+            else zoom_speed
+        )
+
+        dx = rd.uniform(-1, 1)
+        dy = rd.uniform(-1, 1)
+        norm = (dx**2 + dy**2) ** 0.5
+        self.dx = dx / norm
+        self.dy = dy / norm
+
+    def zoom(self, t: float) -> float:
+        if not self.zoom_enabled:
+            return 1
+        return min(
+            max(self.min_zoom, self.zoom_factor + self.zoom_speed * t), self.MAX_ZOOM
+        )
+
+    def position(self, t: float) -> tuple[float, float]:
+        current_zoom = self.zoom(t)
+        zoomed_width = self.picture.shape[1] * current_zoom
+        zoomed_height = self.picture.shape[0] * current_zoom
+
+        if self.zoom_speed < 0:
+            x_movement, y_movement = 0, 0
+        else:
+            x_movement, y_movement = self.dx * self.speed * t, self.dy * self.speed * t
+
+        # Keep the picture within the frame
+        x_pos = max(min(0, self.resolution[0] - zoomed_width), min(0, -x_movement))
+        y_pos = max(min(0, self.resolution[1] - zoomed_height), min(0, -y_movement))
+        return (x_pos, y_pos)
+
+    def get_frame(self, t: float) -> np.ndarray:
+        width, height = self.resolution
+        current_zoom = self.zoom(t)
+        x_pos, y_pos = self.position(t)
+
+        # Only resample the part of the picture that ends up inside the frame
+        left, top = int(-x_pos / current_zoom), int(-y_pos / current_zoom)
+        right = min(self.picture.shape[1], int((width - x_pos) / current_zoom) + 2)
+        bottom = min(self.picture.shape[0], int((height - y_pos) / current_zoom) + 2)
+        region = resizer(
+            self.picture[top:bottom, left:right],
+            (
+                max(1, round((right - left) * current_zoom)),
+                max(1, round((bottom - top) * current_zoom)),
+            ),
+        )
+        x_offset = int(-x_pos - left * current_zoom)
+        y_offset = int(-y_pos - top * current_zoom)
+        frame = region[y_offset : y_offset + height, x_offset : x_offset + width]
+        if frame.shape[:2] == (height, width):
+            return frame
+
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        canvas[: frame.shape[0], : frame.shape[1]] = frame
+        return canvas
+
+
+class _CrossfadeVideoClip(mp.VideoClip):
+    def __init__(
+        self,
+        motions: list[_PictureMotion],
+        crossfade_duration: float = 1,
+        background: np.ndarray | None = None,
+    ) -> None:
+        self.motions = motions
+        self.crossfade_duration = crossfade_duration
+        self.starts = list(
+            itertools.accumulate(
+                (motion.duration for motion in motions[:-1]), initial=0
+            )
+        )
+        width, height = motions[0].resolution
+        self.background = (
+            background
+            if background is not None
+            else np.zeros((height, width, 3), dtype=np.uint8)
+        )
+        super().__init__(
+            make_frame=self.__make_frame__,
+            duration=self.starts[-1] + motions[-1].duration,
+        )
+
+    @staticmethod
+    def blend(
+        background: np.ndarray, foreground: np.ndarray, alpha: float
+    ) -> np.ndarray:
+        blended = foreground.astype(np.float32) * alpha
+        blended += background.astype(np.float32) * (1 - alpha)
+        return blended.astype(np.uint8)
+
+    def __make_frame__(self, t: float) -> np.ndarray:
+        index = max(0, bisect.bisect_right(self.starts, t) - 1)
+        local_t = min(t - self.starts[index], self.motions[index].duration)
+        frame = self.motions[index].get_frame(local_t)
+
+        # Frames outside of a transition window are passed through untouched
+        if index == 0 or local_t >= self.crossfade_duration:
+            return frame
+        return self.blend(self.background, frame, local_t / self.crossfade_duration)
+
+
 @Singleton
 class MoviepyAPI:
+    __verbose__ = context_verbose()
+
     def __init__(self, verbose: bool = False) -> None:
         self.__verbose__ = verbose
         self.__settings_manager__ = SettingsManager(session_id=SessionID.NONE)
-        os.makedirs(self.build_dir, exist_ok=True)
 
     @property
     def build_dir(self) -> str:
-        return os.path.join(self.__settings_manager__.build_dir, "video")
+        build_dir = os.path.join(self.__settings_manager__.build_dir, "video")
+        os.makedirs(build_dir, exist_ok=True)
+        return build_dir
 
     @property
     def output_dir(self) -> str:
         return self.__settings_manager__.output_dir
 
+    @tracing.traced("moviepy.inject_metadata")
     def inject_metadata(
         self,
         video_path: str,
@@ -350,9 +580,189 @@ class MoviepyAPI:
             raise ValueError("Metadata not injected!")
 
         shutil.move(temp_video_path, video_path)
+        self.__settings_manager__.session_index.update(video_path, probe=p)
         if verbose:
             typer.echo("Metadata injected!")
 
+    def __keyframes__(self, video_path: str) -> list[float]:
+        probe = ffmpeg.probe(
+            video_path,
+            select_streams="v:0",
+            skip_frame="nokey",
+            show_frames=None,
+            show_entries="frame=pts_time,best_effort_timestamp_time",
+        )
+        keyframes = []
+        for frame in probe.get("frames", []):
+            timestamp = frame.get("pts_time", frame.get("best_effort_timestamp_time"))
+            if timestamp not in (None, "N/A"):
+                keyframes.append(float(timestamp))
+        return sorted(keyframes)
+
+    @staticmethod
+    def __x264_options__(video_path: str) -> dict[str, str]:
+        # x264 stores its settings in an SEI message near the start of the stream
+        with open(video_path, "rb") as f:
+            head = f.read(1 << 20)
+        start = head.find(b"x264 - core")
+        if start < 0:
+            return {}
+        info = head[start : head.find(b"\x00", start)].decode("ascii", "ignore")
+        _, _, options = info.partition("options: ")
+        return dict(option.split("=", 1) for option in options.split() if "=" in option)
+
+    def __encoder_params__(self, video_path: str) -> list[str]:
+        # The re-encoded range must produce the same parameter sets as the
+        # stream-copied parts, otherwise the spliced stream isn't decodable
+        stream = ffmpeg.probe(video_path, select_streams="v:0")["streams"][0]
+        params = ["-pix_fmt", stream["pix_fmt"]]
+        profile = X264_PROFILES.get(stream.get("profile", ""))
+        if profile is not None:
+            params += ["-profile:v", profile]
+        if stream.get("level", 0) > 0:
+            params += ["-level", f"{stream['level'] / 10:.1f}"]
+        options = self.__x264_options__(video_path)
+        x264_params = ":".join(
+            f"{key}={options[key]}" for key in SPLICE_X264_OPTIONS if key in options
+        )
+        if x264_params:
+            params += ["-x264-params", x264_params]
+        return params
+
+    @staticmethod
+    def __video_duration__(video_path: str) -> float | None:
+        stream = ffmpeg.probe(video_path, select_streams="v:0")["streams"][0]
+        if stream.get("duration") not in (None, "N/A"):
+            return float(stream["duration"])
+        return None
+
+    def __overlay_range__(
+        self,
+        video_path: str,
+        overlays: list[Overlay],
+        duration: float,
+        video_codec: VideoCodec,
+    ) -> tuple[float, float] | None:
+        # Splicing relies on annex B transport streams, so only H.264 is supported
+        if not overlays or video_codec != VideoCodec.LIBX264:
+            return None
+        try:
+            stream = ffmpeg.probe(video_path, select_streams="v:0")["streams"][0]
+            if stream.get("codec_name") != "h264":
+                return None
+            keyframes = self.__keyframes__(video_path)
+        except (ffmpeg.Error, IndexError, KeyError):
+            return None
+        if not keyframes:
+            return None
+
+        start = max(0, min(overlay.clip.start for overlay in overlays))
+        end = min(
+            duration,
+            max(
+                overlay.clip.end if overlay.clip.end is not None else duration
+                for overlay in overlays
+            ),
+        )
+        range_start = max((frame for frame in keyframes if frame <= start), default=0)
+        range_end = min(
+            (frame for frame in keyframes if frame >= end), default=duration
+        )
+
+        # Splicing only pays off while most of the video can be stream-copied
+        if range_end <= range_start or range_end - range_start > duration * 0.6:
+            return None
+        return (range_start, range_end)
+
+    def __splice_overlays__(
+        self,
+        video_path: str,
+        audio_path: str,
+        output_path: str,
+        overlays: list[Overlay],
+        overlay_range: tuple[float, float],
+        duration: float,
+        result: RenderResult,
+        fps: int = 30,
+        video_codec: VideoCodec = VideoCodec.LIBX264,
+        num_threads: int = 4,
+    ) -> bool:
+        range_start, range_end = overlay_range
+        loglevel = "info" if self.__verbose__ else "quiet"
+        segment_path = os.path.join(self.build_dir, "temp_overlay.mp4")
+        concat_list = os.path.join(self.build_dir, "temp_concat.txt")
+        parts = []
+
+        def to_transport_stream(input_path: str, name: str, **input_kwargs) -> None:
+            part_path = os.path.join(self.build_dir, f"{name}.ts")
+            parts.append(part_path)
+            ffmpeg.input(input_path, **input_kwargs).output(
+                part_path,
+                loglevel=loglevel,
+                map="0:v:0",
+                c="copy",
+                f="mpegts",
+                **{"bsf:v": "h264_mp4toannexb"},
+            ).run(overwrite_output=True)
+
+        try:
+            with result.stage(
+                "overlay_pass", frames=int((range_end - range_start) * fps)
+            ):
+                video = mp.VideoFileClip(video_path, audio=False)
+                segment = video.subclip(range_start, range_end).set_fps(fps)
+                overlay_clips = [
+                    overlay.clip.set_start(overlay.clip.start - range_start).set_fps(
+                        fps
+                    )
+                    for overlay in overlays
+                ]
+                segment = mp.CompositeVideoClip([segment] + overlay_clips).set_duration(
+                    segment.duration
+                )
+                segment.write_videofile(
+                    segment_path,
+                    codec=video_codec.value,
+                    audio=False,
+                    verbose=self.__verbose__,
+                    logger=None if not self.__verbose__ else "bar",
+                    fps=fps,
+                    threads=num_threads,
+                    ffmpeg_params=self.__encoder_params__(video_path),
+                )
+                video.close()
+
+            with result.stage("splice"):
+                if range_start > 0:
+                    to_transport_stream(video_path, "temp_head", t=range_start)
+                to_transport_stream(segment_path, "temp_overlay")
+                if range_end < duration:
+                    to_transport_stream(video_path, "temp_tail", ss=range_end)
+
+                with open(concat_list, "w", encoding="utf-8") as f:
+                    for part in parts:
+                        f.write("file '{0}'\n".format(part.replace("'", "'\\''")))
+
+                ffmpeg.output(
+                    ffmpeg.input(concat_list, f="concat", safe=0).video,
+                    ffmpeg.input(audio_path).audio,
+                    output_path,
+                    loglevel=loglevel,
+                    c="copy",
+                ).run(overwrite_output=True)
+
+                # A splice that dropped or repeated frames is rendered in full instead
+                expected = self.__video_duration__(video_path) or duration
+                spliced = self.__video_duration__(output_path)
+                return spliced is not None and abs(spliced - expected) <= 2 / fps
+        except (ffmpeg.Error, OSError, IndexError, KeyError):
+            return False
+        finally:
+            for path in parts + [segment_path, concat_list]:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @tracing.traced("moviepy.generate_video")
     def generate_video(
         self,
         audio_paths: list[str],
@@ -370,196 +780,207 @@ class MoviepyAPI:
         subtitle_options: SubtitleOptions | None = None,
         fps: int = 30,
         num_threads: int = 4,
-    ) -> str:
+        save_stats: bool = False,
+        smart_overlays: bool = True,
+        output_dir: str | None = None,
+    ) -> RenderResult:
         if self.__verbose__:
             typer.echo("Generating video...")
 
-        def picture_motion(
-            picture: mp.ImageClip,
-            duration: float,
-            speed: float = 10,
-            zoom_enabled: bool = False,
-            zoom_speed: float = 0,
-        ) -> mp.ImageClip:
-            MIN_ZOOM = max(
-                1.35,
-                max(resolution[0] / picture.size[0], resolution[1] / picture.size[1]),
-            )
-            MAX_ZOOM = 1.75
-            zoom_factor = rd.uniform(MIN_ZOOM, MAX_ZOOM) if zoom_enabled else 1
-            zoom_speed = abs(zoom_speed)
-            zoom_speed = (
-                -zoom_speed
-                if zoom_factor >= ((MAX_ZOOM + MIN_ZOOM) / 2)
-                else zoom_speed
-            )
-
-            dx = rd.uniform(-1, 1)
-            dy = rd.uniform(-1, 1)
-
-            norm = (dx**2 + dy**2) ** 0.5
-            dx /= norm
-            dy /= norm
-
-            def direction(t):
-                if zoom_speed < 0:
-                    return (0, 0)
-
-                x_movement = dx * speed * t
-                y_movement = dy * speed * t
-                return (x_movement, y_movement)
-
-            def zoom(t):
-                if zoom_enabled:
-                    cal_zoom = zoom_factor + zoom_speed * t
-                    return min(max(MIN_ZOOM, cal_zoom), MAX_ZOOM)
-                else:
-                    return 1
-
-            def position(t):
-                current_zoom = zoom(t)
-                picture_size = picture.size
-                zoomed_width = picture_size[0] * current_zoom
-                zoomed_height = picture_size[1] * current_zoom
-
-                x_movement, y_movement = direction(t)
-
-                # Calculate limits to prevent going beyond the frame
-                x_min = min(0, resolution[0] - zoomed_width)
-                x_max = 0
-                y_min = min(0, resolution[1] - zoomed_height)
-                y_max = 0
-
-                # Ensure position stays within bounds
-                x_pos = max(x_min, min(x_max, -x_movement))
-                y_pos = max(y_min, min(y_max, -y_movement))
-
-                return (x_pos, y_pos)
-
-            picture = resize(picture, zoom)
-            return picture.set_position(position).set_duration(duration)
-
-        clips = []
-        total_duration = 0
-        for audio_path, picture_path in zip(audio_paths, picture_paths):
-            audio = audio_fadeout(mp.AudioFileClip(audio_path), 0.5)
-            picture = mp.ImageClip(picture_path)
-            picture = picture_motion(
-                picture,
-                audio.duration,
-                speed=rd.uniform(10, 15),
-                zoom_enabled=True,
-                zoom_speed=rd.uniform(0.01, 0.03),
-            )
-            total_duration += audio.duration
-            if total_duration > max_length:
-                break
-            clip = mp.CompositeVideoClip([picture.set_audio(audio)])
-            clips.append(clip)
+        result = RenderResult(
+            parameters={
+                "segments": min(len(audio_paths), len(picture_paths)),
+                "overlays": len(overlays),
+                "background_music": background_music is not None,
+                "resolution": list(resolution),
+                "max_length": max_length,
+                "crossfade_duration": crossfade_duration,
+                "video_codec": video_codec.value,
+                "audio_codec": audio_codec.value,
+                "audio_bitrate": audio_bitrate.value,
+                "captions": subtitle_options is not None,
+                "fps": fps,
+                "num_threads": num_threads,
+            }
+        )
 
-        if not clips:
+        segments = []
+        with result.stage("segment_load"):
+            total_duration = 0
+            for audio_path, picture_path in zip(audio_paths, picture_paths):
+                audio = audio_fadeout(mp.AudioFileClip(audio_path), 0.5)
+                total_duration += audio.duration
+                if max_length is not None and total_duration > max_length:
+                    break
+                segments.append((audio, mp.ImageClip(picture_path).img))
+
+        if not segments:
             raise ValueError("No clips generated!")
 
-        video = mp.concatenate_videoclips(
-            [
-                clip if index == 0 else clip.crossfadein(crossfade_duration)
-                for index, clip in enumerate(clips)
-            ],
-            method="compose",
-        )
-
-        if max_length and video.duration > max_length:
-            video = video.subclip(0, max_length)
-        if video.w >= resolution[0] or video.h >= resolution[1]:
-            video = crop(
-                video,
-                width=resolution[0],
-                height=resolution[1],
-                x_center=video.w / 2,
-                y_center=video.h / 2,
-            )
+        with result.stage("motion_compose"):
+            motions = [
+                _PictureMotion(
+                    picture,
+                    resolution,
+                    audio.duration,
+                    speed=rd.uniform(10, 15),
+                    zoom_enabled=True,
+                    zoom_speed=rd.uniform(0.01, 0.03),
+                )
+                for audio, picture in segments
+            ]
+            video = _CrossfadeVideoClip(
+                motions,
+                crossfade_duration=crossfade_duration,
+            ).set_audio(mp.concatenate_audioclips([audio for audio, _ in segments]))
+
+            if max_length and video.duration > max_length:
+                video = video.subclip(0, max_length)
         if self.__verbose__:
             typer.echo("Video generated! Saving video...")
-        os.makedirs(self.output_dir, exist_ok=True)
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
         file_title = metadata["title"].translate(str.maketrans("", "", '/\\:*?"<>|'))  # type: ignore
         temp_video_path = os.path.join(
             self.build_dir, f"{file_title}.{output_fileext.value}"
         )
         final_video_path = os.path.join(
-            self.output_dir, f"{file_title}.{output_fileext.value}"
+            output_dir, f"{file_title}.{output_fileext.value}"
         )
         temp_audiofileext = (
             audio_codec.name.lower()
             if audio_codec not in [AudioCodec.WAV_16, AudioCodec.WAV_32]
             else "wav"
         )
-        video.write_videofile(
-            temp_video_path if subtitle_options is not None else final_video_path,
-            codec=video_codec.value,
-            audio_codec=audio_codec.value,
-            audio_bitrate=audio_bitrate.value,
-            verbose=self.__verbose__,
-            logger=None if not self.__verbose__ else "bar",
-            fps=fps,
-            temp_audiofile=os.path.join(
-                self.build_dir, f"temp_audio.{temp_audiofileext}"
-            ),
-            threads=num_threads,
-        )
-
-        if subtitle_options is not None:
-            if self.__verbose__:
-                typer.echo("Adding captions to video...")
-            captametropolis.add_captions(
-                temp_video_path,
-                final_video_path,
-                font_path=subtitle_options.fontpath,
-                font_size=subtitle_options.fontsize,
-                font_color=subtitle_options.color,
-                stroke_color=subtitle_options.stroke_color,
-                stroke_width=subtitle_options.stroke_width,
-                rel_height_pos=subtitle_options.rel_height_pos,
-                rel_width=subtitle_options.rel_width,
-                line_count=1,
-                highlight_current_word=subtitle_options.highlight_current_word,
-                highlight_color=subtitle_options.highlight_color,
-                shadow_strength=subtitle_options.shadow_strength,
-                shadow_blur=subtitle_options.shadow_blur,
+        with result.stage("first_encode", frames=int(video.duration * fps)):
+            video.write_videofile(
+                temp_video_path if subtitle_options is not None else final_video_path,
+                codec=video_codec.value,
+                audio_codec=audio_codec.value,
+                audio_bitrate=audio_bitrate.value,
+                verbose=self.__verbose__,
+                logger=None if not self.__verbose__ else "bar",
+                fps=fps,
                 temp_audiofile=os.path.join(
                     self.build_dir, f"temp_audio.{temp_audiofileext}"
                 ),
-                verbose=self.__verbose__,
+                threads=num_threads,
             )
 
-        final_video = mp.VideoFileClip(final_video_path).set_fps(fps)
-        overlay_clips = [overlay.clip.set_fps(fps) for overlay in overlays]
-        final_video = mp.CompositeVideoClip([final_video] + overlay_clips).set_duration(
-            final_video.duration
-        )
+        if subtitle_options is not None:
+            if self.__verbose__:
+                typer.echo("Adding captions to video...")
+            with result.stage("captions", frames=int(video.duration * fps)):
+                captametropolis.add_captions(
+                    temp_video_path,
+                    final_video_path,
+                    font_path=subtitle_options.fontpath,
+                    font_size=subtitle_options.fontsize,
+                    font_color=subtitle_options.color,
+                    stroke_color=subtitle_options.stroke_color,
+                    stroke_width=subtitle_options.stroke_width,
+                    rel_height_pos=subtitle_options.rel_height_pos,
+                    rel_width=subtitle_options.rel_width,
+                    line_count=1,
+                    highlight_current_word=subtitle_options.highlight_current_word,
+                    highlight_color=subtitle_options.highlight_color,
+                    shadow_strength=subtitle_options.shadow_strength,
+                    shadow_blur=subtitle_options.shadow_blur,
+                    temp_audiofile=os.path.join(
+                        self.build_dir, f"temp_audio.{temp_audiofileext}"
+                    ),
+                    verbose=self.__verbose__,
+                )
+
+        captioned_video = mp.VideoFileClip(final_video_path)
         background_music_clip = (
-            [background_music.clip.subclip(0, final_video.duration)]
+            [background_music.clip.subclip(0, captioned_video.duration)]
             if background_music
             else []
         )
-        final_audio = audio_fadeout(
-            mp.CompositeAudioClip([final_video.audio] + background_music_clip),
-            0.5,
-        )
-        final_video = final_video.set_audio(final_audio)
-        final_video.write_videofile(
-            temp_video_path,
-            codec=video_codec.value,
-            audio_codec=audio_codec.value,
-            audio_bitrate=audio_bitrate.value,
-            verbose=self.__verbose__,
-            logger=None if not self.__verbose__ else "bar",
-            fps=fps,
-            temp_audiofile=os.path.join(
-                self.build_dir, f"temp_audio.{temp_audiofileext}"
-            ),
-            threads=num_threads,
+        overlay_range = (
+            self.__overlay_range__(
+                final_video_path, overlays, captioned_video.duration, video_codec
+            )
+            if smart_overlays
+            else None
         )
-        shutil.move(temp_video_path, final_video_path)
+        spliced = False
+        if overlay_range is not None:
+            if self.__verbose__:
+                typer.echo(
+                    f"Re-encoding overlay range {overlay_range[0]:.2f}s - {overlay_range[1]:.2f}s only..."
+                )
+            with result.stage("audio_mix"):
+                overlay_audios = [
+                    overlay.clip.audio for overlay in overlays if overlay.clip.audio
+                ]
+                final_audio = audio_fadeout(
+                    mp.CompositeAudioClip(
+                        [captioned_video.audio] + overlay_audios + background_music_clip
+                    ).set_duration(captioned_video.duration),
+                    0.5,
+                )
+                audio_path = os.path.join(
+                    self.build_dir, f"temp_audio_mix.{temp_audiofileext}"
+                )
+                final_audio.write_audiofile(
+                    audio_path,
+                    fps=44100,
+                    codec=audio_codec.value,
+                    bitrate=audio_bitrate.value,
+                    verbose=self.__verbose__,
+                    logger=None if not self.__verbose__ else "bar",
+                )
+            spliced = self.__splice_overlays__(
+                final_video_path,
+                audio_path,
+                temp_video_path,
+                overlays,
+                overlay_range,
+                captioned_video.duration,
+                result,
+                fps=fps,
+                video_codec=video_codec,
+                num_threads=num_threads,
+            )
+            os.remove(audio_path)
+            if spliced:
+                final_video = captioned_video
+                captioned_video.close()
+                shutil.move(temp_video_path, final_video_path)
+            elif self.__verbose__:
+                typer.echo(
+                    "Splicing the overlays failed, re-encoding the whole video..."
+                )
+
+        if not spliced:
+            with result.stage("overlay_pass"):
+                final_video = captioned_video.set_fps(fps)
+                overlay_clips = [overlay.clip.set_fps(fps) for overlay in overlays]
+                final_video = mp.CompositeVideoClip(
+                    [final_video] + overlay_clips
+                ).set_duration(final_video.duration)
+                final_audio = audio_fadeout(
+                    mp.CompositeAudioClip([final_video.audio] + background_music_clip),
+                    0.5,
+                )
+                final_video = final_video.set_audio(final_audio)
+            with result.stage("second_encode", frames=int(final_video.duration * fps)):
+                final_video.write_videofile(
+                    temp_video_path,
+                    codec=video_codec.value,
+                    audio_codec=audio_codec.value,
+                    audio_bitrate=audio_bitrate.value,
+                    verbose=self.__verbose__,
+                    logger=None if not self.__verbose__ else "bar",
+                    fps=fps,
+                    temp_audiofile=os.path.join(
+                        self.build_dir, f"temp_audio.{temp_audiofileext}"
+                    ),
+                    threads=num_threads,
+                )
+                shutil.move(temp_video_path, final_video_path)
 
         final_video.close()
         background_music.close() if background_music else None
@@ -574,11 +995,21 @@ class MoviepyAPI:
         metadata["episode_id"] = SettingsManager(session_id=SessionID.NONE).session_id
         if background_music and background_music.credits:
             metadata["album"] = background_music.credits
-        self.inject_metadata(final_video_path, metadata, verbose=self.__verbose__)
+        with result.stage("metadata_injection"):
+            self.inject_metadata(final_video_path, metadata, verbose=self.__verbose__)
+
+        result.video_path = final_video_path
+        if save_stats:
+            result.save(f"{os.path.splitext(final_video_path)[0]}.render.json")
 
         if self.__verbose__:
             typer.echo(
                 f"{'Captions added! ' if subtitle_options is not None else ''}Final video saved as: {final_video_path}"
             )
+            for stage in result.stages:
+                typer.echo(
+                    f"{stage.name}: {stage.wall_time:.2f}s wall, {stage.cpu_time:.2f}s CPU"
+                    + (f", {stage.fps:.1f} fps" if stage.frames else "")
+                )
 
-        return final_video_path
+        return result
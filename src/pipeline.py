@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from contextvars import copy_context
+from typing import Any, Callable, Iterable
+
+
+class PipelineJob:
+    def __init__(self, index: int, payload: Any) -> None:
+        self.__index__ = index
+        self.__payload__ = payload
+        self.__error__: Exception | None = None
+        self.__failed_stage__: str | None = None
+        self.__timings__: dict[str, float] = {}
+
+    @property
+    def index(self) -> int:
+        return self.__index__
+
+    @property
+    def payload(self) -> Any:
+        return self.__payload__
+
+    @payload.setter
+    def payload(self, payload: Any) -> None:
+        self.__payload__ = payload
+
+    @property
+    def error(self) -> Exception | None:
+        return self.__error__
+
+    @property
+    def failed_stage(self) -> str | None:
+        return self.__failed_stage__
+
+    @property
+    def succeeded(self) -> bool:
+        return self.__error__ is None
+
+    @property
+    def timings(self) -> dict[str, float]:
+        return self.__timings__
+
+    def fail(self, stage: str, error: Exception) -> None:
+        self.__failed_stage__ = stage
+        self.__error__ = error
+
+
+class PipelineStage:
+    def __init__(
+        self, name: str, fn: Callable[[Any], Any], concurrency: int = 1
+    ) -> None:
+        self.__name__ = name
+        self.__fn__ = fn
+        self.__concurrency__ = max(1, concurrency)
+        self.__busy_time__ = 0.0
+        self.__processed__ = 0
+        self.__lock__ = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.__name__
+
+    @property
+    def concurrency(self) -> int:
+        return self.__concurrency__
+
+    @property
+    def busy_time(self) -> float:
+        return self.__busy_time__
+
+    @property
+    def processed(self) -> int:
+        return self.__processed__
+
+    def __call__(self, payload: Any) -> Any:
+        return self.__fn__(payload)
+
+    def record(self, elapsed: float) -> None:
+        with self.__lock__:
+            self.__busy_time__ += elapsed
+            self.__processed__ += 1
+
+
+class Pipeline:
+    def __init__(
+        self,
+        stages: list[PipelineStage],
+        queue_size: int = 1,
+        on_done: Callable[[PipelineJob], None] | None = None,
+    ) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage!")
+
+        self.__stages__ = stages
+        self.__queue_size__ = max(1, queue_size)
+        self.__on_done__ = on_done
+        self.__wall_time__ = 0.0
+        self.__jobs__: list[PipelineJob] = []
+
+    @property
+    def stages(self) -> list[PipelineStage]:
+        return self.__stages__
+
+    @property
+    def wall_time(self) -> float:
+        return self.__wall_time__
+
+    @property
+    def jobs(self) -> list[PipelineJob]:
+        return sorted(self.__jobs__, key=lambda job: job.index)
+
+    def __work__(
+        self,
+        index: int,
+        queues: list[queue.Queue],
+        remaining: list[int],
+        lock: threading.Lock,
+    ) -> None:
+        stage = self.__stages__[index]
+        is_last = index == len(self.__stages__) - 1
+        while True:
+            job = queues[index].get()
+            if job is None:
+                break
+
+            started = time.perf_counter()
+            try:
+                job.payload = stage(job.payload)
+            except Exception as e:
+                job.fail(stage.name, e)
+            elapsed = time.perf_counter() - started
+            stage.record(elapsed)
+            job.timings[stage.name] = elapsed
+
+            if is_last or not job.succeeded:
+                self.__jobs__.append(job)
+                if self.__on_done__ is not None:
+                    self.__on_done__(job)
+            else:
+                # Blocks while the next stage is saturated
+                queues[index + 1].put(job)
+
+        with lock:
+            remaining[index] -= 1
+            drained = remaining[index] == 0
+        if drained and not is_last:
+            for _ in range(self.__stages__[index + 1].concurrency):
+                queues[index + 1].put(None)
+
+    def run(self, payloads: Iterable[Any]) -> list[PipelineJob]:
+        queues = [queue.Queue(maxsize=self.__queue_size__) for _ in self.__stages__]
+        remaining = [stage.concurrency for stage in self.__stages__]
+        lock = threading.Lock()
+        self.__jobs__ = []
+
+        started = time.perf_counter()
+        threads = []
+        for index, stage in enumerate(self.__stages__):
+            for worker in range(stage.concurrency):
+                # Every worker gets its own copy of the caller's context (e.g. the channel)
+                thread = threading.Thread(
+                    target=copy_context().run,
+                    args=(self.__work__, index, queues, remaining, lock),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        for index, payload in enumerate(payloads):
+            queues[0].put(PipelineJob(index, payload))
+        for _ in range(self.__stages__[0].concurrency):
+            queues[0].put(None)
+
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+        self.__wall_time__ = time.perf_counter() - started
+        return self.jobs
+
+    def report(self) -> dict:
+        completed = sum(job.succeeded for job in self.__jobs__)
+        return {
+            "wall_time": self.__wall_time__,
+            "completed": completed,
+            "failed": len(self.__jobs__) - completed,
+            "videos_per_hour": (
+                completed / self.__wall_time__ * 3600 if self.__wall_time__ else 0.0
+            ),
+            "stages": [
+                {
+                    "name": stage.name,
+                    "concurrency": stage.concurrency,
+                    "processed": stage.processed,
+                    "busy_time": stage.busy_time,
+                    "utilization": (
+                        stage.busy_time / (self.__wall_time__ * stage.concurrency)
+                        if self.__wall_time__
+                        else 0.0
+                    ),
+                }
+                for stage in self.__stages__
+            ],
+        }
@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from src.tracing import Span, Tracer
+
+DEFAULT_INTERVAL = 0.005
+# Span name prefixes and the stage their samples are reported under, first match wins
+STAGES = (
+    ("g4f.", "prompting"),
+    ("elevenlabs.", "tts"),
+    ("fooocus.", "image_generation"),
+    ("moviepy.captions", "caption"),
+    ("moviepy.", "render"),
+    ("upload.", "upload"),
+    ("stage.script", "prompting"),
+    ("stage.render", "render"),
+    ("stage.upload", "upload"),
+)
+
+
+class SamplingProfiler:
+    def __init__(self, tracer: Tracer, interval: float = DEFAULT_INTERVAL) -> None:
+        self.__tracer__ = tracer
+        self.__interval__ = interval
+        # Session ID -> stage -> collapsed stack -> samples
+        self.__samples__: dict[str | None, dict[str, Counter]] = defaultdict(
+            lambda: defaultdict(Counter)
+        )
+        self.__ticks__ = 0
+        self.__elapsed__ = 0.0
+        self.__stopped__ = threading.Event()
+        self.__thread__: threading.Thread | None = None
+
+    @property
+    def interval(self) -> float:
+        return self.__interval__
+
+    @property
+    def effective_interval(self) -> float:
+        # Sampling competes for the GIL, so it is slower than asked for under load
+        return (
+            self.__elapsed__ / self.__ticks__ if self.__ticks__ else self.__interval__
+        )
+
+    @property
+    def sessions(self) -> list[str | None]:
+        return list(self.__samples__)
+
+    @staticmethod
+    def __stage__(spans: list[Span]) -> str:
+        for span in reversed(spans):
+            for prefix, stage in STAGES:
+                if span.name.startswith(prefix):
+                    return stage
+        return "other"
+
+    @staticmethod
+    def __session__(spans: list[Span]) -> str | None:
+        for span in reversed(spans):
+            if span.attributes.get("session_id"):
+                return span.attributes["session_id"]
+        return None
+
+    @staticmethod
+    def __stack__(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def __sample__(self) -> None:
+        active = self.__tracer__.active_spans()
+        for ident, frame in sys._current_frames().items():
+            # Threads outside of any span (e.g. idle pool workers) are not sampled
+            spans = active.get(ident)
+            if not spans or ident == threading.get_ident():
+                continue
+            self.__samples__[self.__session__(spans)][self.__stage__(spans)][
+                self.__stack__(frame)
+            ] += 1
+
+    def __run__(self) -> None:
+        started = time.perf_counter()
+        while not self.__stopped__.wait(self.__interval__):
+            self.__sample__()
+            self.__ticks__ += 1
+        self.__elapsed__ = time.perf_counter() - started
+
+    def start(self) -> None:
+        self.__thread__ = threading.Thread(
+            target=self.__run__, name="profiler", daemon=True
+        )
+        self.__thread__.start()
+
+    def stop(self) -> None:
+        self.__stopped__.set()
+        if self.__thread__ is not None:
+            self.__thread__.join()
+
+    def summary(self, stage: str, samples: Counter, top: int = 30) -> str:
+        total = sum(samples.values())
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            # A recursive function is only counted once per sample
+            for frame in set(frames):
+                cumulative[frame] += count
+
+        interval = self.effective_interval
+        lines = [
+            f"Stage: {stage}",
+            f"Samples: {total} (every {interval * 1000:.1f} ms, about {total * interval:.2f}s)",
+        ]
+        for title, counter in (("Own", own), ("Cumulative", cumulative)):
+            lines += ["", f"{title:>10} {'%':>7}  Function"]
+            for frame, count in counter.most_common(top):
+                lines.append(f"{count:>10} {count / total:>7.1%}  {frame}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, session_id: str | None, directory: str) -> list[str]:
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for stage, samples in sorted(self.__samples__.get(session_id, {}).items()):
+            collapsed_file = os.path.join(directory, f"{stage}.collapsed")
+            with open(collapsed_file, "w", encoding="utf-8") as f:
+                for stack, count in sorted(samples.items()):
+                    f.write(f"{stack} {count}\n")
+            summary_file = os.path.join(directory, f"{stage}.txt")
+            with open(summary_file, "w", encoding="utf-8") as f:
+                f.write(self.summary(stage, samples))
+            files += [collapsed_file, summary_file]
+        return files
+
+
+@contextmanager
+def sample(tracer: Tracer, interval: float = DEFAULT_INTERVAL):
+    profiler = SamplingProfiler(tracer, interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
@@ -0,0 +1,98 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+from src import tracing
+
+_listener: ContextVar[Callable[[dict], None] | None] = ContextVar(
+    "progress_listener", default=None
+)
+
+
+def report(event: str, **data) -> None:
+    # Commands report their progress, whoever started them may listen
+    listener = _listener.get()
+    if listener is not None:
+        listener({"event": event, "at": time.time(), **data})
+
+
+@contextmanager
+def listen(callback: Callable[[dict], None]):
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+@contextmanager
+def stage(session_id: str, name: str):
+    started = time.perf_counter()
+    report("stage", session_id=session_id, stage=name, state="running")
+    try:
+        with tracing.span(f"stage.{name}", session_id=session_id):
+            yield
+    except BaseException as e:
+        report(
+            "stage",
+            session_id=session_id,
+            stage=name,
+            state="failed",
+            elapsed=time.perf_counter() - started,
+            error=str(e),
+        )
+        raise
+    report(
+        "stage",
+        session_id=session_id,
+        stage=name,
+        state="done",
+        elapsed=time.perf_counter() - started,
+    )
+
+
+class Progress:
+    def __init__(self) -> None:
+        self.__sessions__: list[str] = []
+        self.__stages__: dict[str, dict[str, dict]] = {}
+        self.__videos__: list[dict] = []
+        self.__lock__ = threading.Lock()
+
+    def __call__(self, event: dict) -> None:
+        with self.__lock__:
+            if event["event"] == "session":
+                self.__sessions__.append(event["session_id"])
+            elif event["event"] == "stage":
+                stages = self.__stages__.setdefault(event["session_id"], {})
+                stages[event["stage"]] = {
+                    key: value
+                    for key, value in event.items()
+                    if key not in ("event", "session_id", "stage")
+                }
+            elif event["event"] == "video":
+                self.__videos__.append(
+                    {key: value for key, value in event.items() if key != "event"}
+                )
+
+    @property
+    def sessions(self) -> list[str]:
+        with self.__lock__:
+            return list(self.__sessions__)
+
+    @property
+    def videos(self) -> list[dict]:
+        with self.__lock__:
+            return list(self.__videos__)
+
+    def to_dict(self) -> dict:
+        with self.__lock__:
+            return {
+                "sessions": list(self.__sessions__),
+                "stages": {
+                    session_id: dict(stages)
+                    for session_id, stages in self.__stages__.items()
+                },
+                "videos": list(self.__videos__),
+            }
@@ -1,38 +1,32 @@
 import os
 
-from config.config import SessionID, SettingsManager, Singleton
+from config.config import ROOT_DIR, SessionID, SettingsManager, Singleton
 
 
 @Singleton
 class PromptManager:
     def __init__(self):
         self.__settings_manager__ = SettingsManager(session_id=SessionID.NONE)
-        self.__prompts_dir__ = os.path.join(
-            self.__settings_manager__.root_dir,
-            "prompts",
-        )
+        self.__prompts_dir__ = os.path.join(ROOT_DIR, "prompts")
         self.reinit()
 
     def reinit(self):
-        self.__initialized__ = False
-        topics = list(self.__settings_manager__.get("past_topics", {}).values() or [])  # type: ignore
+        object.__setattr__(self, "__initialized__", False)
         for root, _, files in os.walk(self.__prompts_dir__):
             for file in files:
                 with open(os.path.join(root, file), "r") as f:
                     prompt_name = os.path.splitext(file)[0]
-                    content = f.read()
-                    prompt = (
-                        content.format(
-                            topics=topics,
-                        )
-                        if r"{topics}" in content
-                        else content
-                    )
-                    setattr(self, prompt_name, prompt)
+                    setattr(self, prompt_name, f.read())
         self.__initialized__ = True
 
     def get_prompt(self, prompt_name: str) -> str:
-        return getattr(self, prompt_name)
+        content = getattr(self, prompt_name)
+        if r"{topics}" not in content:
+            return content
+
+        # Topics change between sessions of the same process
+        topics = list(self.__settings_manager__.topic_history.iter_titles())
+        return content.format(topics=topics)
 
     def __setattr__(self, name, value):
         if hasattr(self, "__initialized__") and self.__initialized__:
@@ -0,0 +1,164 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Any, Callable, Iterable
+
+from src import tracing
+
+
+class Task:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        deps: Iterable[str] = (),
+        resource: str | None = None,
+    ) -> None:
+        self.__name__ = name
+        self.__fn__ = fn
+        self.__deps__ = tuple(deps)
+        self.__resource__ = resource
+        self.__result__: Any = None
+        self.__started_at__: float | None = None
+        self.__finished_at__: float | None = None
+
+    @property
+    def name(self) -> str:
+        return self.__name__
+
+    @property
+    def deps(self) -> tuple[str, ...]:
+        return self.__deps__
+
+    @property
+    def resource(self) -> str | None:
+        return self.__resource__
+
+    @property
+    def result(self) -> Any:
+        return self.__result__
+
+    @property
+    def started_at(self) -> float | None:
+        return self.__started_at__
+
+    @property
+    def finished_at(self) -> float | None:
+        return self.__finished_at__
+
+    def __call__(self) -> Any:
+        self.__started_at__ = time.perf_counter()
+        try:
+            with tracing.span(f"task.{self.__name__}", resource=self.__resource__):
+                self.__result__ = self.__fn__()
+        finally:
+            self.__finished_at__ = time.perf_counter()
+        return self.__result__
+
+
+class TaskGraph:
+    def __init__(self, max_workers: int = 8, limits: dict[str, int] | None = None):
+        self.__max_workers__ = max(1, max_workers)
+        self.__limits__ = limits or {}
+        self.__tasks__: dict[str, Task] = {}
+        self.__lock__ = threading.Lock()
+        self.__started_at__: float | None = None
+        self.__finished_at__: float | None = None
+
+    @property
+    def tasks(self) -> list[Task]:
+        with self.__lock__:
+            return list(self.__tasks__.values())
+
+    @property
+    def wall_time(self) -> float:
+        if self.__started_at__ is None or self.__finished_at__ is None:
+            return 0.0
+        return self.__finished_at__ - self.__started_at__
+
+    def add(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        deps: Iterable[str] = (),
+        resource: str | None = None,
+    ) -> str:
+        # Tasks may add further tasks while the graph is running
+        with self.__lock__:
+            if name in self.__tasks__:
+                raise ValueError(f"Task {name} already exists!")
+            self.__tasks__[name] = Task(name, fn, deps, resource)
+        return name
+
+    def result(self, name: str) -> Any:
+        with self.__lock__:
+            return self.__tasks__[name].result
+
+    def __ready__(self, done: set[str], running: dict[Future, Task]) -> list[Task]:
+        usage: dict[str, int] = {}
+        for task in running.values():
+            if task.resource is not None:
+                usage[task.resource] = usage.get(task.resource, 0) + 1
+
+        started = {task.name for task in running.values()} | done
+        ready = []
+        for task in self.tasks:
+            # Unknown dependencies may still be added by a running task
+            if task.name in started or not all(dep in done for dep in task.deps):
+                continue
+
+            if task.resource is not None:
+                limit = self.__limits__.get(task.resource)
+                if limit is not None and usage.get(task.resource, 0) >= limit:
+                    continue
+                usage[task.resource] = usage.get(task.resource, 0) + 1
+            ready.append(task)
+        return ready
+
+    def run(self) -> dict[str, Any]:
+        self.__started_at__ = time.perf_counter()
+        done: set[str] = set()
+        running: dict[Future, Task] = {}
+        error: BaseException | None = None
+        with ThreadPoolExecutor(max_workers=self.__max_workers__) as executor:
+            while True:
+                if error is None:
+                    for task in self.__ready__(done, running):
+                        # Each task runs in a copy of the caller's context (session, channel)
+                        running[executor.submit(copy_context().run, task)] = task
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    if future.exception() is not None:
+                        # Let running tasks finish, but don't start new ones
+                        error = error or future.exception()
+                        continue
+                    done.add(task.name)
+
+        self.__finished_at__ = time.perf_counter()
+        if error is not None:
+            raise error
+
+        with self.__lock__:
+            pending = [name for name in self.__tasks__ if name not in done]
+        if pending:
+            raise RuntimeError(f"Tasks {pending} could not be scheduled!")
+        return {task.name: task.result for task in self.tasks}
+
+    def critical_path(self) -> list[Task]:
+        tasks = {task.name: task for task in self.tasks}
+        path: list[Task] = []
+        candidates = [task for task in tasks.values() if task.finished_at is not None]
+        while candidates:
+            # Follow the dependency that finished last back to the first task
+            task = max(candidates, key=lambda task: task.finished_at)  # type: ignore
+            path.append(task)
+            candidates = [
+                tasks[dep] for dep in task.deps if tasks[dep].finished_at is not None
+            ]
+        return list(reversed(path))
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+_tracer: ContextVar["Tracer | None"] = ContextVar("tracer", default=None)
+_span: ContextVar["Span | None"] = ContextVar("span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, category: str, attributes: dict) -> None:
+        self.__name__ = name
+        self.__category__ = category
+        self.__attributes__ = attributes
+        self.__started_at__ = time.perf_counter_ns()
+        self.__thread__ = threading.current_thread()
+
+    @property
+    def name(self) -> str:
+        return self.__name__
+
+    @property
+    def attributes(self) -> dict:
+        return self.__attributes__
+
+    def set(self, **attributes) -> None:
+        self.__attributes__.update(attributes)
+
+    def to_event(self, origin: int, ended_at: int) -> dict:
+        # A complete event; Perfetto nests the spans of a thread by their times
+        return {
+            "name": self.__name__,
+            "cat": self.__category__,
+            "ph": "X",
+            "ts": (self.__started_at__ - origin) / 1000,
+            "dur": (ended_at - self.__started_at__) / 1000,
+            "pid": os.getpid(),
+            "tid": self.__thread__.native_id,
+            "args": {
+                key: __serializable__(value)
+                for key, value in self.__attributes__.items()
+            },
+        }
+
+
+def __serializable__(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [__serializable__(item) for item in value]
+    return str(value)
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.__origin__ = time.perf_counter_ns()
+        self.__events__: list[dict] = []
+        self.__threads__: dict[int, str] = {}
+        # Thread ident -> open spans, innermost last (read by the profiler)
+        self.__active__: dict[int, list[Span]] = {}
+        self.__lock__ = threading.Lock()
+
+    @property
+    def events(self) -> list[dict]:
+        with self.__lock__:
+            return list(self.__events__)
+
+    def active_spans(self) -> dict[int, list[Span]]:
+        with self.__lock__:
+            return {ident: list(spans) for ident, spans in self.__active__.items()}
+
+    def enter(self, span: Span) -> None:
+        with self.__lock__:
+            self.__active__.setdefault(threading.get_ident(), []).append(span)
+
+    def record(self, span: Span) -> None:
+        event = span.to_event(self.__origin__, time.perf_counter_ns())
+        with self.__lock__:
+            spans = self.__active__.get(threading.get_ident(), [])
+            if span in spans:
+                spans.remove(span)
+                if not spans:
+                    del self.__active__[threading.get_ident()]
+            self.__events__.append(event)
+            self.__threads__.setdefault(event["tid"], threading.current_thread().name)
+
+    def to_dict(self) -> dict:
+        with self.__lock__:
+            threads = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self.__threads__.items()
+            ]
+            return {
+                "traceEvents": threads + self.__events__,
+                "displayTimeUnit": "ms",
+            }
+
+    def save(self, path: str) -> str:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+
+def active_tracer() -> Tracer | None:
+    return _tracer.get()
+
+
+@contextmanager
+def record():
+    tracer = Tracer()
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+
+
+@contextmanager
+def span(name: str, category: str = "quickclip", **attributes):
+    tracer = _tracer.get()
+    if tracer is None:
+        yield None
+        return
+
+    current = Span(name, category, attributes)
+    token = _span.set(current)
+    tracer.enter(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _span.reset(token)
+        tracer.record(current)
+
+
+def annotate(**attributes) -> None:
+    # Adds attributes (e.g. retries, bytes or frames) to the innermost span
+    current = _span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def traced(name: str, category: str = "quickclip"):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Without a tracer a call costs a single context variable lookup
+            if _tracer.get() is None:
+                return fn(*args, **kwargs)
+            with span(name, category):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -25,7 +25,15 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from config.config import SessionID, SettingsManager, Singleton, classproperty
+from config.config import (
+    SessionID,
+    SettingsManager,
+    Singleton,
+    classproperty,
+    context_verbose,
+)
+from src import tracing
+from src.hashtags import generate_hashtags
 
 RETRIABLE_STATUS_CODES = [500, 502, 503, 504]
 MAX_RETRIES = 10
@@ -34,6 +42,8 @@ httplib2.RETRIES = 1
 
 @Singleton
 class UploadAPI:
+    __verbose__ = context_verbose()
+
     def __init__(self, verbose: bool = False):
         self.__verbose__ = verbose
         self.__settings_manager__ = SettingsManager(
@@ -80,37 +90,9 @@ class UploadAPI:
         )
         return build("youtube", "v3", credentials=credentials)
 
-    @staticmethod
-    def generate_hashtags(keywords: list[str]) -> tuple[str, ...]:
-        always_include = (
-            "#aiexplained",
-            "#ai",
-            "#simplifiedscience",
-            "#quickfacts",
-            "#learnin60seconds",
-            "#knowledgenuggets",
-            "#mindblown",
-            "#didyouknow",
-            "#funfacts",
-            "#brainboost",
-            "#dailylearning",
-            "#techexplained",
-            "#smartshorts",
-            "#curiosity",
-            "#learneveryday",
-            "#factcheck",
-            "#viral",
-            "#trending",
-        )
-        hashtags = tuple(
-            map(
-                lambda keyword: f"#{keyword.lower().replace(" ", "").strip()}",
-                ",".join(keywords).strip().replace("#", "").split(","),
-            )
-        )
-        hashtags = tuple(set(hashtags + always_include))
-        return hashtags
+    generate_hashtags = staticmethod(generate_hashtags)
 
+    @tracing.traced("upload.upload")
     def upload(
         self,
         session_id: str,
@@ -126,30 +108,23 @@ class UploadAPI:
                 )
             )
 
-        def file_filter(file) -> bool:
-            if not os.path.isfile(file) or not file.endswith(".mp4"):
-                return False
-
-            probe = ffmpeg.probe(file)
-            if not probe:
-                return False
-
-            return probe["format"]["tags"]["episode_id"] == session_id
-
-        file_to_upload = os.path.join(
-            self.__settings_manager__.output_dir,
-            tuple(
-                filter(
-                    lambda file: file_filter(
-                        os.path.join(self.__settings_manager__.output_dir, file)
-                    ),
-                    os.listdir(self.__settings_manager__.output_dir),
+        file_to_upload = self.__settings_manager__.get_video_path(session_id)
+        tracing.annotate(
+            session_id=session_id,
+            platforms=[
+                platform
+                for platform, enabled in (
+                    ("youtube", youtube),
+                    ("instagram", instagram),
+                    ("tiktok", tiktok),
                 )
-            )[0],
-        )
-        info = self.__settings_manager__.get_metadata(
-            self.__settings_manager__.get_video_path(session_id) or ""
+                if enabled
+            ],
+            bytes=os.path.getsize(file_to_upload) if file_to_upload else 0,
         )
+        info = self.__settings_manager__.session_index.get_tags(
+            session_id
+        ) or self.__settings_manager__.get_metadata(file_to_upload or "")
         error: bool = False
 
         if not thumbnail_path or not os.path.isfile(thumbnail_path):
@@ -219,6 +194,7 @@ class UploadAPI:
                         if self.__verbose__:
                             typer.echo(error)
                         retry += 1
+                        tracing.annotate(retries=retry)
                         if retry > MAX_RETRIES:
                             if self.__verbose__:
                                 typer.echo("No longer attempting to retry.")
@@ -233,6 +209,7 @@ class UploadAPI:
                             )
                         time.sleep(sleep_seconds)
 
+            @tracing.traced("upload.youtube")
             def initialize_upload(youtube_instance):
                 tags = None
                 if info.get("comment"):
@@ -259,6 +236,7 @@ class UploadAPI:
 
                 resumable_upload(insert_request)
 
+            @tracing.traced("upload.youtube_thumbnail")
             def insert_thumbnail(youtube_instance):
                 if not video_id:
                     return
@@ -589,4 +567,6 @@ class UploadAPI:
                 else typer.echo("Upload failed.")
             )
 
+        if not error:
+            self.__settings_manager__.build_collector.mark_uploaded(session_id)
         return not error
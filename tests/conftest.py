@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture
+def settings_manager(tmp_path, monkeypatch):
+    from config.config import SessionID, SettingsManager
+
+    # Every test gets its own instance, rooted in a temporary directory instead
+    # of the repository
+    monkeypatch.delenv("ENCRYPTION_KEY", raising=False)
+    settings_manager = SettingsManager.__wrapped__(
+        session_id=SessionID.TEMP, root_dir=str(tmp_path)
+    )
+    yield settings_manager
+    settings_manager.flush()
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from config.blob_store import BlobStore
+
+
+@pytest.fixture
+def blob_store(tmp_path):
+    return BlobStore(str(tmp_path / "store"))
+
+
+def write(path, data: bytes) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_add_stores_the_file_by_its_digest(blob_store, tmp_path):
+    path = write(tmp_path / "picture.jpeg", b"picture")
+
+    blob_path = blob_store.add(path)
+
+    digest = BlobStore.digest_file(path)
+    assert blob_path == blob_store.blob_path(digest)
+    assert os.path.basename(os.path.dirname(blob_path)) == digest[:2]
+    with open(blob_path, "rb") as f:
+        assert f.read() == b"picture"
+    assert os.path.exists(path)
+
+
+def test_add_deduplicates_and_moves(blob_store, tmp_path):
+    first = write(tmp_path / "a.mp3", b"voiceover")
+    second = write(tmp_path / "b.mp3", b"voiceover")
+
+    assert blob_store.add(first) == blob_store.add(second, move=True)
+    assert not os.path.exists(second)
+    assert len(os.listdir(os.path.dirname(blob_store.add(first)))) == 1
+
+
+def test_put_links_the_destination_to_the_blob(blob_store, tmp_path):
+    path = write(tmp_path / "audio.mp3", b"voiceover")
+
+    first = blob_store.put(path, str(tmp_path / "build" / "a" / "0.mp3"))
+    second = blob_store.put(path, str(tmp_path / "build" / "b" / "0.mp3"))
+
+    blob_path = blob_store.blob_path(BlobStore.digest_file(path))
+    assert os.path.samefile(first, blob_path)
+    assert os.path.samefile(second, blob_path)
+    assert blob_store.refcount(blob_path) == 2
+
+
+def test_put_replaces_an_existing_destination(blob_store, tmp_path):
+    destination = str(tmp_path / "build" / "0.mp3")
+    old = blob_store.put(write(tmp_path / "old.mp3", b"old"), destination)
+    old_blob = blob_store.blob_path(BlobStore.digest_file(old))
+
+    blob_store.put(write(tmp_path / "new.mp3", b"new"), destination)
+
+    with open(destination, "rb") as f:
+        assert f.read() == b"new"
+    # The shared blob is never written through the link
+    with open(old_blob, "rb") as f:
+        assert f.read() == b"old"
+    assert blob_store.refcount(old_blob) == 0
+
+
+def test_put_leaves_no_temporary_files(blob_store, tmp_path):
+    path = write(tmp_path / "audio.mp3", b"voiceover")
+    destination = str(tmp_path / "build" / "0.mp3")
+
+    blob_store.put(path, destination)
+    blob_store.put(path, destination)
+
+    assert os.listdir(tmp_path / "build") == ["0.mp3"]
+
+
+def test_put_bytes(blob_store, tmp_path):
+    destination = blob_store.put_bytes(b"text", str(tmp_path / "build" / "info.txt"))
+
+    with open(destination, "rb") as f:
+        assert f.read() == b"text"
+    assert (
+        blob_store.refcount(blob_store.blob_path(BlobStore.digest_file(destination)))
+        == 1
+    )
+
+
+def test_collect_removes_unreferenced_blobs(blob_store, tmp_path):
+    kept = blob_store.put(
+        write(tmp_path / "kept.mp3", b"kept"), str(tmp_path / "build" / "kept.mp3")
+    )
+    dropped = blob_store.put(
+        write(tmp_path / "dropped.mp3", b"dropped!"),
+        str(tmp_path / "build" / "dropped.mp3"),
+    )
+    dropped_blob = blob_store.blob_path(BlobStore.digest_file(dropped))
+    os.remove(dropped)
+
+    assert blob_store.collect(dry_run=True) == (1, len(b"dropped!"))
+    assert os.path.exists(dropped_blob)
+    assert blob_store.collect() == (1, len(b"dropped!"))
+    assert not os.path.exists(dropped_blob)
+    assert os.path.exists(blob_store.blob_path(BlobStore.digest_file(kept)))
+    assert blob_store.collect() == (0, 0)
+
+
+def test_collect_skips_blobs_being_added(blob_store, tmp_path):
+    blob_store.add(write(tmp_path / "a.mp3", b"a"))
+    # A temporary file of a blob that is still being copied into the store
+    write(os.path.join(blob_store.store_dir, "objects", "ab", "tmpabcdef"), b"partial")
+
+    assert blob_store.collect() == (1, 1)
+    assert os.path.exists(
+        os.path.join(blob_store.store_dir, "objects", "ab", "tmpabcdef")
+    )
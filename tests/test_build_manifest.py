@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+from config.build_manifest import BuildManifest
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return BuildManifest(str(tmp_path / "build"))
+
+
+def write(manifest: BuildManifest, artifact: str, content: str) -> None:
+    path = manifest.path(artifact)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def test_inputs_hash_ignores_the_order_of_the_inputs():
+    assert BuildManifest.hash_inputs(text="a", voice_id="v") == (
+        BuildManifest.hash_inputs(voice_id="v", text="a")
+    )
+    assert BuildManifest.hash_inputs(text="a") != BuildManifest.hash_inputs(text="b")
+
+
+def test_artifacts_are_fresh_until_their_inputs_change(manifest):
+    inputs = manifest.hash_inputs(text="Hello", voice_id="voice")
+    write(manifest, "audios/0.mp3", "audio")
+    manifest.record("audios/0.mp3", inputs)
+
+    assert manifest.is_fresh("audios/0.mp3", inputs)
+    assert not manifest.is_fresh(
+        "audios/0.mp3", manifest.hash_inputs(text="Hello", voice_id="other")
+    )
+
+
+def test_missing_artifacts_are_never_fresh(manifest):
+    inputs = manifest.hash_inputs(prompt="a cat")
+    write(manifest, "pictures/0.jpeg", "picture")
+    manifest.record("pictures/0.jpeg", inputs)
+    os.remove(manifest.path("pictures/0.jpeg"))
+
+    assert not manifest.is_fresh("pictures/0.jpeg", inputs)
+
+
+def test_unrecorded_files_are_adopted_once(manifest):
+    inputs = manifest.hash_inputs(prompt="a cat")
+    write(manifest, "pictures/0.jpeg", "picture")
+
+    assert not manifest.is_fresh("pictures/0.jpeg", inputs, adopt=False)
+    assert manifest.is_fresh("pictures/0.jpeg", inputs)
+    assert manifest.artifacts["pictures/0.jpeg"]["inputs"] == inputs
+    assert not manifest.is_fresh(
+        "pictures/0.jpeg", manifest.hash_inputs(prompt="a dog")
+    )
+
+
+def test_dependents_follow_the_digest_of_their_inputs(manifest):
+    write(manifest, "responses/voiceover.txt", "First version")
+    inputs = manifest.hash_inputs(voiceover=manifest.digest("responses/voiceover.txt"))
+    write(manifest, "responses/video_info.txt", "Title")
+    manifest.record("responses/video_info.txt", inputs)
+
+    # An edit by hand changes the digest, so the video info is made again
+    write(manifest, "responses/voiceover.txt", "Second version")
+
+    assert not manifest.is_fresh(
+        "responses/video_info.txt",
+        manifest.hash_inputs(voiceover=manifest.digest("responses/voiceover.txt")),
+    )
+
+
+def test_forgotten_artifacts_are_not_fresh(manifest):
+    inputs = manifest.hash_inputs(prompt="a cat")
+    write(manifest, "pictures/0.jpeg", "picture")
+    manifest.record("pictures/0.jpeg", inputs)
+
+    manifest.forget("pictures/0.jpeg")
+
+    assert "pictures/0.jpeg" not in manifest.artifacts
+    assert not manifest.is_fresh("pictures/0.jpeg", inputs, adopt=False)
+
+
+def test_checkpoints_survive_a_crash_before_compaction(manifest):
+    for index in range(3):
+        write(manifest, f"pictures/{index}.jpeg", "picture")
+        manifest.record(f"pictures/{index}.jpeg", manifest.hash_inputs(index=index))
+
+    # A new process only has the journal
+    resumed = BuildManifest(manifest.build_dir)
+
+    assert sorted(resumed.artifacts) == [f"pictures/{i}.jpeg" for i in range(3)]
+    assert not os.path.exists(os.path.join(manifest.build_dir, BuildManifest.FILE))
+
+
+def test_a_torn_checkpoint_costs_only_its_own_item(manifest):
+    write(manifest, "audios/0.mp3", "audio")
+    manifest.record("audios/0.mp3", manifest.hash_inputs(index=0))
+    journal = os.path.join(manifest.build_dir, BuildManifest.JOURNAL)
+    with open(journal, "ab") as f:
+        f.write(b'{"artifact": "audios/1.mp3", "ent')
+
+    assert list(manifest.artifacts) == ["audios/0.mp3"]
+
+    write(manifest, "audios/2.mp3", "audio")
+    manifest.record("audios/2.mp3", manifest.hash_inputs(index=2))
+    assert list(manifest.artifacts) == ["audios/0.mp3", "audios/2.mp3"]
+
+
+def test_compaction_folds_the_journal_into_the_manifest(manifest):
+    for index in range(2):
+        write(manifest, f"audios/{index}.mp3", "audio")
+        manifest.record(f"audios/{index}.mp3", manifest.hash_inputs(index=index))
+    manifest.forget("audios/1.mp3")
+
+    manifest.compact()
+
+    assert not os.path.exists(os.path.join(manifest.build_dir, BuildManifest.JOURNAL))
+    assert list(BuildManifest(manifest.build_dir).artifacts) == ["audios/0.mp3"]
+    assert manifest.is_fresh("audios/0.mp3", manifest.hash_inputs(index=0))
+
+
+def test_outputs_are_listed_in_index_order_without_partial_files(tmp_path):
+    from main import list_outputs
+
+    for file in ("10.mp3", "2.mp3", "0.mp3", ".3.tmp", "1.mp3.tmp", "thumbnail.jpeg"):
+        (tmp_path / file).write_text("data")
+
+    assert list_outputs(str(tmp_path)) == [
+        "0.mp3",
+        "2.mp3",
+        "10.mp3",
+        "thumbnail.jpeg",
+    ]
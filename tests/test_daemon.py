@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src import daemon
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = ("generate", "build", "settings", "farm submit")
+
+
+@pytest.fixture
+def daemon_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "INFO_FILE", str(tmp_path / "daemon.json"))
+    monkeypatch.setattr(daemon, "SOCKET_FILE", str(tmp_path / "daemon.sock"))
+    monkeypatch.delenv(daemon.NO_DAEMON_ENV, raising=False)
+    jobs = []
+
+    def run(argv: list[str]) -> int:
+        jobs.append({"argv": argv, "cwd": daemon.client_path(".")})
+        print(f"running {' '.join(argv)}")
+        return 3
+
+    server = daemon.DaemonServer(run)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    while daemon.read_info() is None:
+        time.sleep(0.01)
+    yield jobs
+    server.shutdown()
+    thread.join(timeout=5)
+
+
+def test_command_skips_the_options_of_the_main_callback():
+    argv = ["--channel", "build", "-v", "build", "sessions", "--all"]
+
+    assert daemon.__command__(argv, ("--channel", "-ch")) == ["build", "sessions"]
+    assert daemon.__command__(["farm", "worker", "-qd", "q"], ()) == ["farm", "worker"]
+    assert daemon.__command__(["--help"], ()) == []
+
+
+def test_commands_outside_the_allowlist_run_in_process(daemon_server):
+    assert daemon.forward_to_daemon(["farm", "worker"], COMMANDS) is None
+    assert daemon.forward_to_daemon(["daemon", "stop"], COMMANDS) is None
+    assert daemon.forward_to_daemon([], COMMANDS) is None
+    assert daemon_server == []
+
+
+def test_forwarding_falls_back_without_a_daemon(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "INFO_FILE", str(tmp_path / "daemon.json"))
+    monkeypatch.delenv(daemon.NO_DAEMON_ENV, raising=False)
+
+    assert daemon.forward_to_daemon(["build", "sessions"], COMMANDS) is None
+
+
+def test_build_sessions_from_the_repository_root(daemon_server, monkeypatch, capsys):
+    # "build" exists in the repository root, but it is a command, not a path
+    monkeypatch.chdir(ROOT_DIR)
+
+    exit_code = daemon.forward_to_daemon(["build", "sessions"], COMMANDS)
+
+    assert exit_code == 3
+    assert daemon_server == [
+        {"argv": ["build", "sessions"], "cwd": os.path.join(ROOT_DIR, ".")}
+    ]
+    assert capsys.readouterr().out == "running build sessions\n"
+
+
+def test_option_values_are_forwarded_unchanged(daemon_server, tmp_path, monkeypatch):
+    (tmp_path / "config").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    daemon.forward_to_daemon(["settings", "get", "config"], COMMANDS)
+    daemon.forward_to_daemon(["farm", "submit", "-qd", "config"], COMMANDS)
+
+    assert [job["argv"] for job in daemon_server] == [
+        ["settings", "get", "config"],
+        ["farm", "submit", "-qd", "config"],
+    ]
+
+
+def test_paths_resolve_against_the_client_directory(tmp_path):
+    import main
+
+    with daemon.routed_cwd(str(tmp_path)):
+        assert daemon.client_path("queue") == str(tmp_path / "queue")
+        assert daemon.client_path("/srv/queue") == "/srv/queue"
+        assert main.resolve_client_path(Path("thumb.png")) == tmp_path / "thumb.png"
+        assert main.resolve_client_path("queue") == str(tmp_path / "queue")
+        assert main.resolve_client_path(None) is None
+
+    assert daemon.client_path("queue") == os.path.join(os.getcwd(), "queue")
+
+
+def test_status_counts_the_served_jobs(daemon_server):
+    daemon.forward_to_daemon(["generate"], COMMANDS)
+
+    status = daemon.request("status")
+
+    assert status["served"] == 1
+    assert status["running"] == 0
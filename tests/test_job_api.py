@@ -0,0 +1,189 @@
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from config.job_queue import JobQueue
+from src.job_api import JobServer
+
+TOKEN = "secret"
+
+
+def admit(command: str, options: dict) -> list[str]:
+    if command not in ("generate", "upload"):
+        raise ValueError(f"Unknown command: {command}")
+    return [command, *(f"--{key}={value}" for key, value in options.items())]
+
+
+class Runner:
+    def __init__(self) -> None:
+        self.exit_codes: list[int] = []
+        self.calls: list[list[str]] = []
+
+    def __call__(self, argv: list[str]) -> int:
+        self.calls.append(argv)
+        print(f"running {' '.join(argv)}")
+        return self.exit_codes.pop(0) if self.exit_codes else 0
+
+
+@pytest.fixture
+def runner():
+    return Runner()
+
+
+@pytest.fixture
+def start_server(tmp_path, runner):
+    servers = []
+
+    def start(workers: bool = True, max_pending: int | None = None) -> JobServer:
+        job_queue = JobQueue(str(tmp_path / "jobs"), lease_seconds=60, max_attempts=2)
+        server = JobServer(
+            ("127.0.0.1", 0),
+            job_queue,
+            runner,
+            admit,
+            sessions=lambda limit, offset: [],
+            session=lambda session_id: None,
+            max_pending=max_pending,
+            token=TOKEN,
+            poll_interval=0.01,
+            single_attempt=("upload",),
+        )
+        target = server.serve if workers else server.serve_forever
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.shutdown()
+        thread.join(timeout=5)
+        server.server_close()
+
+
+def call(
+    server: JobServer, method: str, path: str, body=None, token: str | None = TOKEN
+) -> tuple[int, dict, object]:
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body)
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.server_address[1]}{path}",
+        data=data.encode("utf-8") if isinstance(data, str) else data,
+        method=method,
+        headers={"Authorization": f"Bearer {token}"} if token else {},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            status, headers, payload = (
+                response.status,
+                response.headers,
+                response.read(),
+            )
+    except urllib.error.HTTPError as e:
+        status, headers, payload = e.code, e.headers, e.read()
+    content_type = headers.get("Content-Type", "")
+    return (
+        status,
+        dict(headers),
+        json.loads(payload) if content_type == "application/json" else payload.decode(),
+    )
+
+
+def wait_for(server: JobServer, job_id: str, state: str) -> dict:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        job = server.job(job_id)
+        if job is not None and job["state"] == state:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} is not {state}: {server.job(job_id)}")
+
+
+def test_requests_need_the_token(start_server):
+    server = start_server(workers=False)
+
+    assert call(server, "GET", "/health", token=None)[0] == 401
+    assert call(server, "GET", "/health", token="wrong")[0] == 401
+    assert call(server, "GET", "/health")[0] == 200
+
+
+def test_submitted_jobs_run_and_complete(start_server, runner):
+    server = start_server()
+
+    status, headers, body = call(
+        server, "POST", "/jobs", {"command": "generate", "options": {"topic": "cats"}}
+    )
+
+    assert status == 202
+    assert body["state"] == "pending"
+    assert headers["Location"] == f"/jobs/{body['id']}"
+    job = wait_for(server, body["id"], "done")
+    assert job["result"]["exit_code"] == 0
+    assert runner.calls == [["generate", "--topic=cats"]]
+    assert call(server, "GET", f"/jobs/{body['id']}/log")[2] == (
+        "running generate --topic=cats\n"
+    )
+
+
+def test_invalid_jobs_are_rejected(start_server):
+    server = start_server(workers=False)
+
+    assert call(server, "POST", "/jobs", b"{not json")[0] == 400
+    assert call(server, "POST", "/jobs", [])[0] == 400
+    status, _, body = call(server, "POST", "/jobs", {"command": "delete"})
+    assert (status, body) == (400, {"error": "Unknown command: delete"})
+    assert call(server, "GET", "/jobs")[2] == []
+
+
+def test_a_full_queue_asks_to_retry_later(start_server):
+    server = start_server(workers=False, max_pending=1)
+
+    assert call(server, "POST", "/jobs", {"command": "generate"})[0] == 202
+    status, headers, body = call(server, "POST", "/jobs", {"command": "generate"})
+
+    assert status == 429
+    assert int(headers["Retry-After"]) > 0
+    assert "full" in body["error"]
+
+
+def test_failed_jobs_are_retried(start_server, runner):
+    runner.exit_codes = [1, 0]
+    server = start_server()
+
+    job_id = call(server, "POST", "/jobs", {"command": "generate"})[2]["id"]
+
+    job = wait_for(server, job_id, "done")
+    assert job["attempts"] == 2
+    assert len(runner.calls) == 2
+
+
+def test_usage_errors_and_single_attempt_jobs_are_not_retried(start_server, runner):
+    runner.exit_codes = [2, 1]
+    server = start_server()
+
+    usage_error = call(server, "POST", "/jobs", {"command": "generate"})[2]["id"]
+    assert wait_for(server, usage_error, "failed")["attempts"] == 1
+    upload = call(server, "POST", "/jobs", {"command": "upload"})[2]["id"]
+    assert wait_for(server, upload, "failed")["attempts"] == 1
+
+
+def test_workers_survive_jobs_that_cannot_run(start_server, runner):
+    server = start_server()
+    # Without the logs directory the log of the job can't be opened
+    shutil.rmtree(server.logs_dir)
+    job_id = call(server, "POST", "/jobs", {"command": "generate"})[2]["id"]
+
+    job = wait_for(server, job_id, "failed")
+
+    assert "could not be run" in job["error"]
+    assert job["attempts"] == 2
+    assert runner.calls == []
+
+    os.makedirs(server.logs_dir)
+    job_id = call(server, "POST", "/jobs", {"command": "generate"})[2]["id"]
+    assert wait_for(server, job_id, "done")["attempts"] == 1
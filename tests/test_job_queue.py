@@ -0,0 +1,163 @@
+import os
+
+import pytest
+
+from config.job_queue import JobQueue
+from src.errors import QueueFullError
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / "queue"), lease_seconds=60, max_attempts=2)
+
+
+def expire(job_queue: JobQueue, job_id: str) -> None:
+    # Backdate the claim and its leases past the lease time
+    claimed = os.path.join(job_queue.queue_dir, "claimed")
+    for file in os.listdir(claimed):
+        if file.startswith(job_id):
+            past = os.stat(os.path.join(claimed, file)).st_mtime - 600
+            os.utime(os.path.join(claimed, file), (past, past))
+
+
+def test_claim_takes_the_oldest_pending_job(job_queue):
+    first = job_queue.submit({"argv": ["generate"]})
+    second = job_queue.submit({"argv": ["upload"]})
+
+    job = job_queue.claim("worker-a")
+
+    assert job["id"] == first
+    assert job["state"] == "claimed"
+    assert job["attempts"] == 1
+    assert job["worker"] == "worker-a"
+    assert job_queue.counts() == {"pending": 1, "claimed": 1, "done": 0, "failed": 0}
+    assert job_queue.claim("worker-b")["id"] == second
+    assert job_queue.claim("worker-c") is None
+
+
+def test_complete_stores_the_result(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+
+    assert job_queue.complete(job_id, "worker-a", {"exit_code": 0})
+    job = job_queue.get(job_id)
+    assert job["state"] == "done"
+    assert job["result"] == {"exit_code": 0}
+    assert [event["event"] for event in job["history"]] == ["claimed", "done"]
+    assert not job_queue.complete(job_id, "worker-a", {"exit_code": 0})
+
+
+def test_complete_by_another_worker_is_rejected(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+
+    assert not job_queue.complete(job_id, "worker-b", {})
+    assert job_queue.get(job_id)["state"] == "claimed"
+
+
+def test_fail_retries_until_max_attempts(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+
+    job_queue.claim("worker-a")
+    assert job_queue.fail(job_id, "worker-a", "boom")
+    assert job_queue.get(job_id)["state"] == "pending"
+
+    job_queue.claim("worker-a")
+    assert job_queue.fail(job_id, "worker-a", "boom again")
+    job = job_queue.get(job_id)
+    assert job["state"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"] == "boom again"
+
+
+def test_fail_without_retry_fails_for_good(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+
+    job_queue.fail(job_id, "worker-a", "usage error", retry=False)
+
+    assert job_queue.get(job_id)["state"] == "failed"
+
+
+def test_single_attempt_jobs_are_not_retried(job_queue):
+    job_id = job_queue.submit({"argv": ["upload"]}, max_attempts=1)
+    job_queue.claim("worker-a")
+
+    job_queue.fail(job_id, "worker-a", "boom")
+
+    assert job_queue.get(job_id)["state"] == "failed"
+
+
+def test_release_does_not_count_as_an_attempt(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+
+    assert job_queue.release(job_id, "worker-a")
+    job = job_queue.get(job_id)
+    assert job["state"] == "pending"
+    assert job["attempts"] == 0
+
+
+def test_submit_rejects_a_full_queue(job_queue):
+    job_queue.submit({"argv": ["generate"]}, max_pending=1)
+
+    with pytest.raises(QueueFullError):
+        job_queue.submit({"argv": ["generate"]}, max_pending=1)
+    assert job_queue.counts()["pending"] == 1
+
+
+def test_heartbeat_keeps_the_claim(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+    expire(job_queue, job_id)
+
+    assert job_queue.heartbeat(job_id, "worker-a")
+    assert job_queue.reap("worker-b") == []
+    assert job_queue.get(job_id)["state"] == "claimed"
+
+
+def test_reap_requeues_expired_claims(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+    expire(job_queue, job_id)
+
+    assert job_queue.reap("worker-b") == [job_id]
+    job = job_queue.get(job_id)
+    assert job["state"] == "pending"
+    assert job["history"][-1] == {
+        "event": "expired",
+        "worker": "worker-a",
+        "reaper": "worker-b",
+        "at": job["history"][-1]["at"],
+    }
+    # The worker that lost the claim can't complete the job anymore
+    assert not job_queue.heartbeat(job_id, "worker-a")
+    assert not job_queue.complete(job_id, "worker-a", {})
+
+
+def test_reap_fails_jobs_out_of_attempts(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    for _ in range(2):
+        job_queue.claim("worker-a")
+        expire(job_queue, job_id)
+        job_queue.reap("worker-b")
+
+    assert job_queue.get(job_id)["state"] == "failed"
+
+
+def test_reap_recovers_half_finished_transitions(job_queue):
+    job_id = job_queue.submit({"argv": ["generate"]})
+    job_queue.claim("worker-a")
+    # A worker that crashed right after taking the job for a transition
+    claimed = os.path.join(job_queue.queue_dir, "claimed")
+    os.rename(
+        os.path.join(claimed, f"{job_id}.json"),
+        os.path.join(claimed, f".{job_id}.json.worker-a.taken"),
+    )
+
+    assert job_queue.reap("worker-b") == []
+    # The change time of the file can't be backdated, so the lease runs out
+    reaper = JobQueue(job_queue.queue_dir, lease_seconds=0, max_attempts=2)
+    assert reaper.reap("worker-b") == [job_id]
+    assert job_queue.get(job_id)["state"] == "pending"
+    assert os.listdir(claimed) == []
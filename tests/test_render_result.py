@@ -0,0 +1,52 @@
+import json
+import time
+
+import pytest
+
+# The render stack is only installed with the full requirements
+pytest.importorskip("moviepy.editor")
+pytest.importorskip("captametropolis")
+pytest.importorskip("selenium")
+
+from src.moviepy_api import RenderResult
+
+
+def test_stages_record_their_times_and_frames():
+    result = RenderResult(parameters={"fps": 30})
+
+    with result.stage("segment_load"):
+        time.sleep(0.01)
+    with result.stage("first_encode", frames=300) as stage:
+        time.sleep(0.01)
+
+    assert [stage.name for stage in result.stages] == ["segment_load", "first_encode"]
+    assert all(stage.wall_time >= 0.01 for stage in result.stages)
+    assert stage.fps == pytest.approx(300 / stage.wall_time)
+    assert result.wall_time == pytest.approx(sum(s.wall_time for s in result.stages))
+
+
+def test_failed_stages_are_recorded_too():
+    result = RenderResult()
+
+    with pytest.raises(RuntimeError):
+        with result.stage("captions"):
+            raise RuntimeError("boom")
+
+    assert [stage.name for stage in result.stages] == ["captions"]
+
+
+def test_stats_are_saved_as_json(tmp_path):
+    result = RenderResult(parameters={"fps": 30})
+    result.video_path = str(tmp_path / "video.mp4")
+    with result.stage("metadata_injection"):
+        pass
+
+    path = result.save(str(tmp_path / "video.render.json"))
+
+    with open(path, "r", encoding="utf-8") as f:
+        stats = json.load(f)
+    assert result.stats_path == path
+    assert stats["video_path"] == result.video_path
+    assert stats["parameters"] == {"fps": 30}
+    assert [stage["name"] for stage in stats["stages"]] == ["metadata_injection"]
+    assert set(stats["host"]) == {"node", "platform", "python", "cpu_count"}
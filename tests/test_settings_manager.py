@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from contextvars import copy_context
+
+import pytest
+
+from config.config import activate_channel
+
+
+def read_config(settings_manager) -> dict:
+    try:
+        with open(
+            os.path.join(settings_manager.config_dir, "config.json"),
+            "r",
+            encoding="utf-8",
+        ) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def test_set_writes_through(settings_manager):
+    settings_manager.set("owner", "AppSolves")
+
+    assert settings_manager.get("owner") == "AppSolves"
+    assert read_config(settings_manager)["owner"] == "AppSolves"
+
+
+def test_batch_writes_once_at_the_end(settings_manager):
+    with settings_manager.batch():
+        settings_manager.set("owner", "AppSolves")
+        settings_manager.set("genre", 27)
+        assert settings_manager.get("genre") == 27
+        assert "owner" not in read_config(settings_manager)
+
+    config = read_config(settings_manager)
+    assert (config["owner"], config["genre"]) == ("AppSolves", 27)
+
+
+def test_batch_rolls_back_on_errors(settings_manager):
+    settings_manager.set("owner", "AppSolves")
+
+    with pytest.raises(RuntimeError):
+        with settings_manager.batch():
+            settings_manager.set("owner", "Someone else")
+            settings_manager.set("genre", 27)
+            settings_manager.delete("voice_id")
+            raise RuntimeError("boom")
+
+    assert settings_manager.get("owner") == "AppSolves"
+    assert settings_manager.get("genre") is None
+    assert read_config(settings_manager).get("owner") == "AppSolves"
+    assert "genre" not in read_config(settings_manager)
+
+
+def test_nested_batches_roll_back_as_a_whole(settings_manager):
+    with pytest.raises(RuntimeError):
+        with settings_manager.batch():
+            settings_manager.set("owner", "AppSolves")
+            with settings_manager.batch():
+                settings_manager.set("genre", 27)
+            raise RuntimeError("boom")
+
+    assert settings_manager.get("owner") is None
+    assert settings_manager.get("genre") is None
+    assert "owner" not in read_config(settings_manager)
+
+
+def test_update_is_atomic(settings_manager):
+    settings_manager.set("counter", 1)
+
+    assert settings_manager.update("counter", lambda value: value + 1) == 2
+    assert settings_manager.update("missing", lambda value: value + 1, 0) == 1
+    assert read_config(settings_manager)["counter"] == 2
+
+
+def test_changes_of_other_processes_are_picked_up(settings_manager):
+    settings_manager.set("owner", "AppSolves")
+    config_file = os.path.join(settings_manager.config_dir, "config.json")
+    config = read_config(settings_manager) | {"genre": 27}
+    with open(config_file + ".new", "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    os.replace(config_file + ".new", config_file)
+
+    assert settings_manager.get("genre") == 27
+    # Writes merge into the file instead of overwriting the other change
+    settings_manager.set("voice_id", "voice")
+    assert read_config(settings_manager) == config | {"voice_id": "voice"}
+
+
+def write_from_another_process(settings_manager, changes: dict) -> None:
+    config_file = os.path.join(settings_manager.config_dir, "config.json")
+    with open(config_file + ".new", "w", encoding="utf-8") as f:
+        json.dump(read_config(settings_manager) | changes, f)
+    os.replace(config_file + ".new", config_file)
+
+
+def test_updates_of_a_batch_merge_with_other_processes(settings_manager):
+    settings_manager.set("counter", 1)
+
+    with settings_manager.batch():
+        assert settings_manager.update("counter", lambda value: value + 1) == 2
+        settings_manager.set("owner", "AppSolves")
+        write_from_another_process(settings_manager, {"counter": 10, "genre": 27})
+        settings_manager.update("counter", lambda value: value * 2)
+
+    assert settings_manager.get("counter") == 22
+    assert read_config(settings_manager) == {
+        "counter": 22,
+        "genre": 27,
+        "owner": "AppSolves",
+    }
+
+
+def test_writes_after_an_update_of_a_batch_win(settings_manager):
+    settings_manager.set("counter", 1)
+
+    with settings_manager.batch():
+        settings_manager.update("counter", lambda value: value + 1)
+        settings_manager.set("counter", 5)
+        write_from_another_process(settings_manager, {"counter": 10})
+
+    assert read_config(settings_manager)["counter"] == 5
+
+
+def test_write_behind_defers_the_write(settings_manager):
+    settings_manager.write_behind_ms = 60000
+    settings_manager.set("owner", "AppSolves")
+
+    assert "owner" not in read_config(settings_manager)
+    assert settings_manager.flush()
+    assert read_config(settings_manager)["owner"] == "AppSolves"
+
+
+def test_channel_scoped_keys_are_written_per_channel(settings_manager):
+    settings_manager.set("owner", "Default")
+    with settings_manager.use_channel("kids"):
+        settings_manager.set("owner", "Kids")
+        # Keys that aren't channel scoped stay global
+        settings_manager.set("farm_max_pending", 5)
+        assert settings_manager.channel == "kids"
+        assert settings_manager.get("owner") == "Kids"
+
+    assert settings_manager.channel is None
+    assert settings_manager.get("owner") == "Default"
+    assert settings_manager.get("owner", channel="kids") == "Kids"
+    assert settings_manager.channels == ["kids"]
+    config = read_config(settings_manager)
+    assert config["owner"] == "Default"
+    assert config["channels"] == {"kids": {"owner": "Kids"}}
+    assert config["farm_max_pending"] == 5
+
+
+def test_channels_fall_back_to_the_global_settings(settings_manager):
+    settings_manager.set("voice_id", "default-voice")
+    settings_manager.set("genre", 28)
+
+    with settings_manager.use_channel("science"):
+        assert settings_manager.get("voice_id") == "default-voice"
+        settings_manager.set("genre", 27, channel="science")
+        assert settings_manager.get("genre") == 27
+        assert settings_manager.has("genre")
+        settings_manager.delete("genre", channel="science")
+        assert settings_manager.get("genre") == 28
+
+
+def test_channels_are_scoped_to_the_context(settings_manager):
+    seen = {}
+
+    def run(channel: str) -> None:
+        activate_channel(channel)
+        seen[channel] = settings_manager.channel
+
+    threads = [
+        threading.Thread(target=copy_context().run, args=(run, channel))
+        for channel in ("kids", "science")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == {"kids": "kids", "science": "science"}
+    assert settings_manager.channel is None
+
+
+def test_jobs_start_without_the_previous_channel(settings_manager):
+    with settings_manager.use_channel("kids"):
+        with settings_manager.job():
+            assert settings_manager.channel is None
+            activate_channel("science")
+            assert settings_manager.channel == "science"
+        assert settings_manager.channel == "kids"
+
+
+def test_jobs_release_their_sessions(settings_manager):
+    released = []
+    settings_manager.on_release(released.append)
+
+    with settings_manager.job():
+        session_id = settings_manager.activate("job-session")
+        with settings_manager.session("scoped-session"):
+            assert released == []
+        assert released == ["scoped-session"]
+        assert settings_manager.session_id == session_id
+
+    assert released == ["scoped-session", "job-session"]
+
+
+def test_the_root_directory_can_be_set_by_the_environment(tmp_path, monkeypatch):
+    from config.config import ROOT_DIR_ENV, SessionID, SettingsManager
+
+    monkeypatch.setenv(ROOT_DIR_ENV, str(tmp_path / "root"))
+    settings_manager = SettingsManager.__wrapped__(session_id=SessionID.TEMP)
+    settings_manager.set("owner", "AppSolves")
+
+    assert settings_manager.config_dir == str(tmp_path / "root" / "config")
+    assert settings_manager.build_dir == str(tmp_path / "root" / "build" / "temp")
+    assert read_config(settings_manager) == {"owner": "AppSolves"}
@@ -0,0 +1,115 @@
+import threading
+import time
+from contextvars import ContextVar
+
+import pytest
+
+from src.task_graph import TaskGraph
+
+
+def test_tasks_run_after_their_dependencies():
+    graph = TaskGraph()
+    order = []
+    graph.add("render", lambda: order.append("render"), deps=("audio", "pictures"))
+    graph.add("pictures", lambda: order.append("pictures"), deps=("prompts",))
+    graph.add("prompts", lambda: order.append("prompts"))
+    graph.add("audio", lambda: order.append("audio"))
+
+    graph.run()
+
+    assert order.index("prompts") < order.index("pictures")
+    assert order[-1] == "render"
+    assert [task.name for task in graph.critical_path()][-1] == "render"
+
+
+def test_run_returns_the_results():
+    graph = TaskGraph()
+    graph.add("a", lambda: 1)
+    graph.add("b", lambda: graph.result("a") + 1, deps=("a",))
+
+    assert graph.run() == {"a": 1, "b": 2}
+    assert graph.wall_time > 0
+
+
+def test_resource_limits():
+    graph = TaskGraph(max_workers=8, limits={"gpu": 2})
+    lock = threading.Lock()
+    running, peak = 0, 0
+
+    def task():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    for index in range(6):
+        graph.add(f"picture-{index}", task, resource="gpu")
+    graph.run()
+
+    assert peak == 2
+
+
+def test_unlimited_resources_run_concurrently():
+    graph = TaskGraph(max_workers=4)
+    barrier = threading.Barrier(4, timeout=5)
+    for index in range(4):
+        graph.add(f"voiceover-{index}", barrier.wait, resource="tts")
+
+    graph.run()
+
+
+def test_tasks_may_add_tasks():
+    graph = TaskGraph()
+
+    def plan():
+        for index in range(3):
+            graph.add(f"picture-{index}", lambda index=index: index, deps=("plan",))
+
+    graph.add("plan", plan)
+    # Depends on a task that doesn't exist until "plan" ran
+    graph.add("done", lambda: graph.result("picture-2"), deps=("picture-2",))
+
+    assert graph.run()["done"] == 2
+
+
+def test_a_failed_task_stops_the_graph():
+    graph = TaskGraph(max_workers=1)
+    ran = []
+
+    def fail():
+        raise ValueError("boom")
+
+    graph.add("fail", fail)
+    graph.add("after", lambda: ran.append("after"), deps=("fail",))
+
+    with pytest.raises(ValueError, match="boom"):
+        graph.run()
+    assert ran == []
+
+
+def test_unschedulable_tasks():
+    graph = TaskGraph()
+    graph.add("a", lambda: None, deps=("missing",))
+
+    with pytest.raises(RuntimeError, match="could not be scheduled"):
+        graph.run()
+
+
+def test_duplicate_tasks():
+    graph = TaskGraph()
+    graph.add("a", lambda: None)
+
+    with pytest.raises(ValueError):
+        graph.add("a", lambda: None)
+
+
+def test_tasks_run_in_the_callers_context():
+    session: ContextVar[str | None] = ContextVar("session", default=None)
+    session.set("session-1")
+    graph = TaskGraph()
+    graph.add("a", session.get)
+
+    assert graph.run() == {"a": "session-1"}
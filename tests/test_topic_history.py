@@ -0,0 +1,109 @@
+import sqlite3
+
+import pytest
+
+from config.topic_history import TopicHistory
+
+
+@pytest.fixture
+def topic_history(tmp_path):
+    return TopicHistory(str(tmp_path / "sessions.db"))
+
+
+@pytest.fixture
+def topics(topic_history):
+    for index in range(10):
+        topic_history.add(f"session-{index}", f"Topic {index}")
+    return topic_history
+
+
+def test_add_rejects_duplicate_titles(topic_history):
+    assert topic_history.add("a", "Why Cats Purr")
+    assert not topic_history.add("b", "  why cats   PURR ")
+    # The same session may rename its topic
+    assert topic_history.add("a", "Why Cats Purr Loudly")
+    assert topic_history.get("a") == "Why Cats Purr Loudly"
+    assert topic_history.add("b", "why cats purr")
+
+
+def test_page(topics):
+    assert topics.page(limit=3) == [
+        ("session-0", "Topic 0"),
+        ("session-1", "Topic 1"),
+        ("session-2", "Topic 2"),
+    ]
+    assert topics.page(limit=2, offset=8) == [
+        ("session-8", "Topic 8"),
+        ("session-9", "Topic 9"),
+    ]
+    assert topics.page(limit=5, offset=20) == []
+    assert len(topics.page()) == 10
+    assert topics.page(limit=0) == []
+
+
+def test_iter_pages_through_all_topics(topics):
+    assert list(topics.iter(batch_size=3)) == topics.page()
+    assert list(topics.iter_titles(batch_size=4)) == [
+        f"Topic {index}" for index in range(10)
+    ]
+
+
+def test_prefix(topic_history):
+    topic_history.add("a", "Space Facts")
+    topic_history.add("b", "space travel")
+    topic_history.add("c", "Ocean Facts")
+
+    assert topic_history.count(prefix="SPACE") == 2
+    assert topic_history.page(prefix="space ") == [
+        ("a", "Space Facts"),
+        ("b", "space travel"),
+    ]
+    assert list(topic_history.iter(prefix="ocean")) == [("c", "Ocean Facts")]
+
+
+def test_remove_is_a_soft_delete(topics):
+    assert topics.remove("session-1") == "Topic 1"
+    assert topics.remove("session-1") is None
+    assert topics.remove_at(0) == ("session-0", "Topic 0")
+    assert topics.remove_at(-1) is None
+    assert topics.remove_at(100) is None
+
+    assert topics.count() == 8
+    assert topics.get("session-0") is None
+    assert topics.page(limit=1) == [("session-2", "Topic 2")]
+    assert "Topic 1" not in list(topics.iter_titles())
+    # A deleted topic may be used again, and re-adding a session restores it
+    assert topics.add("session-x", "Topic 1")
+    assert topics.add("session-0", "Topic 0")
+    assert topics.get("session-0") == "Topic 0"
+
+    with sqlite3.connect(topics.database_file) as connection:
+        assert connection.execute("SELECT COUNT(*) FROM topics").fetchone()[0] == 11
+
+
+def test_pending_topics(topic_history):
+    topic_history.add("a", "Done")
+    topic_history.add("b", "Rendering", pending=True)
+
+    # Pending topics are avoided, but not listed
+    assert list(topic_history.iter_titles()) == ["Done", "Rendering"]
+    assert not topic_history.add("c", "rendering")
+    assert topic_history.page() == [("a", "Done")]
+    assert topic_history.count() == 1
+    assert topic_history.get("b") is None
+
+    topic_history.commit("b")
+    assert topic_history.get("b") == "Rendering"
+
+    topic_history.add("c", "Failed", pending=True)
+    topic_history.discard("c")
+    topic_history.discard("b")
+    assert topic_history.page() == [("a", "Done"), ("b", "Rendering")]
+    assert list(topic_history.iter_titles()) == ["Done", "Rendering"]
+
+
+def test_import_topics(topic_history):
+    topic_history.add("a", "Kept")
+    topic_history.import_topics({"a": "Overwritten", "b": "Imported", "c": None})
+
+    assert topic_history.page() == [("a", "Kept"), ("b", "Imported")]